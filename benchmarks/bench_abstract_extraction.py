@@ -0,0 +1,193 @@
+"""Benchmark of abstract extraction from landing pages: the previous
+BeautifulSoup heuristics (parse the whole page into a BeautifulSoup tree,
+then search headings, class="abstract" and the readable text) against the
+AbstractExtractorRegistry (lxml parse, publisher XPath selectors and
+embedded metadata, the heuristics only as fallback), and the registry fed
+with the page in chunks (StreamingAbstractExtractor), which stops parsing
+once an abstract is confirmed.
+
+Reports the parse and extraction time per page (mean and median of the
+best of all repetitions) and the hit rate (pages for which an abstract was
+found), and which extractors found them. Large pages without an abstract
+(the worst case of streaming: everything is parsed, nothing confirmed) are
+timed separately, without the heuristics fallback, against a single parse.
+
+The corpus is a directory of saved landing pages with an index.json that
+maps file names to the url the page was saved from:
+    {"sciencedirect_1.html": "https://www.sciencedirect.com/science/article/pii/...", ...}
+Without a corpus, synthetic pages in the layout of the registered
+publishers (padded with navigation, scripts and references to the size of
+real landing pages, most of it after the abstract) are used.
+
+Usage:
+    python -m benchmarks.bench_abstract_extraction [corpus_directory] [repetitions]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from sources.data_processing.abstract_extraction import \
+    StreamingAbstractExtractor, default_extractors, extract_abstract, \
+    parse_html
+
+abstract = ("Artificial light at night changes the activity of many bat species. "
+            "We compared 40 urban sites with and without dark corridors and found "
+            "that corridors restore foraging activity of light-averse species.")
+
+layouts = {
+    "https://www.sciencedirect.com/science/article/pii/S0006320719000001":
+        "<div class='Abstracts'><div class='abstract author' id='ab1'>"
+        "<h2>Abstract</h2><div id='abs0010'><p>{abstract}</p></div></div></div>",
+    "https://link.springer.com/article/10.1007/s10531-019-00001-1":
+        "<section data-title='Abstract'><h2>Abstract</h2>"
+        "<div class='c-article-section__content' id='Abs1-content'><p>{abstract}</p></div></section>",
+    "https://besjournals.onlinelibrary.wiley.com/doi/10.1111/1365-2664.13001":
+        "<section class='article-section article-section__abstract'><h2>Abstract</h2>"
+        "<div class='article-section__content en main'><p>{abstract}</p></div></section>",
+    "https://www.tandfonline.com/doi/full/10.1080/21513732.2019.000001":
+        "<div class='hlFld-Abstract'><div class='abstractSection abstractInFull'>"
+        "<p>{abstract}</p></div></div>",
+    "https://journals.plos.org/plosone/article?id=10.1371/journal.pone.0200001":
+        "<div class='abstract toc-section'><h2>Abstract</h2>"
+        "<div class='abstract-content'><p>{abstract}</p></div></div>",
+    # A publisher without selectors that embeds the abstract in its meta tags only
+    "https://www.conservationevidencejournal.com/reference/pdf/0001":
+        "<div class='summary-box'><span>Summary of the study</span>{abstract}</div>",
+}
+
+
+def pad(rng_seed: int, size: int) -> str:
+    """Navigation, references and inline scripts as found on real landing pages."""
+    parts = ["<script>window.dataLayer = [" + ",".join(
+        f'{{"event": "e{i}", "value": {i * rng_seed}}}' for i in range(200)) + "];</script>"]
+    i = 0
+    while sum(len(part) for part in parts) < size:
+        parts.append(f"<li class='ref'><span class='author'>Author {i}</span> "
+                     f"<a href='/doi/10.1000/{rng_seed}.{i}'>Related study number {i} on "
+                     f"biodiversity and land use</a></li>")
+        i += 1
+    return "<nav><ul>" + "".join(parts[1:]) + "</ul></nav>" + parts[0]
+
+
+def synthetic_corpus(page_size: int = 200_000):
+    corpus = []
+    for seed, (url, layout) in enumerate(layouts.items()):
+        meta = f'<meta name="citation_abstract" content="{abstract}">' \
+            if "conservationevidence" in url else ""
+        corpus.append((url, f"<html><head><title>Study {seed}</title>{meta}</head><body>"
+                            f"{pad(seed, page_size // 5)}<h1>Study {seed}</h1>"
+                            f"{layout.format(abstract=abstract)}"
+                            f"{pad(seed + 1, page_size * 4 // 5)}</body></html>"))
+    # A page without abstract (e.g. a paywall)
+    corpus.append(("https://example.org/paywall",
+                   f"<html><head><title>Sign in</title></head><body>{pad(99, page_size)}"
+                   "</body></html>"))
+    return corpus
+
+
+def large_miss_pages(page_size: int = 550_000):
+    """Pages of nested <div>s (the anchor tag of most publisher selectors) without an abstract."""
+    parts, i = [], 0
+    while sum(len(part) for part in parts) < page_size:
+        parts.append(f"<div class='teaser'><div class='author'>Author {i}</div>"
+                     f"<div class='title'>Related study number {i} on biodiversity</div></div>")
+        i += 1
+    page = f"<html><head><title>No abstract</title></head><body>{''.join(parts)}</body></html>"
+    return [("https://www.sciencedirect.com/science/article/pii/S0006320719009999", page),
+            ("https://example.org/no-abstract", page)]
+
+
+def load_corpus(directory: Path):
+    index = json.loads((directory / "index.json").read_text())
+    return [(url, (directory / name).read_text(errors="replace"))
+            for name, url in index.items()]
+
+
+def previous_extraction(url, page):
+    return extract_abstract(BeautifulSoup(page, features="lxml"))
+
+
+def registry_extraction(registry):
+    def extract(url, page):
+        return registry.extract(parse_html(page), url)
+    return extract
+
+
+def streaming_extraction(registry, chunk_size=16 * 1024):
+    def extract(url, page):
+        data = page.encode("utf-8")
+        extractor = StreamingAbstractExtractor(registry, url, "utf-8")
+        for start in range(0, len(data), chunk_size):
+            if extractor.feed(data[start:start + chunk_size]) is not None:
+                streaming_extraction.parsed_bytes += extractor.parsed_bytes
+                return extractor.abstract
+        streaming_extraction.parsed_bytes += extractor.parsed_bytes
+        return registry.extract(extractor.close(), url)
+    return extract
+
+
+streaming_extraction.parsed_bytes = 0
+
+
+def candidate_extraction(registry):
+    def extract(url, page):
+        return registry.extract_candidate(parse_html(page), url)
+    return extract
+
+
+def streaming_candidate_extraction(registry, chunk_size=16 * 1024):
+    def extract(url, page):
+        data = page.encode("utf-8")
+        extractor = StreamingAbstractExtractor(registry, url, "utf-8")
+        for start in range(0, len(data), chunk_size):
+            if extractor.feed(data[start:start + chunk_size]) is not None:
+                return extractor.abstract
+        return registry.extract_candidate(extractor.close(), url)
+    return extract
+
+
+def run(name, extract, corpus, repetitions):
+    times = [[] for _ in corpus]
+    for _ in range(repetitions):
+        results = []
+        for i, (url, page) in enumerate(corpus):
+            start = time.perf_counter()
+            results.append(extract(url, page))
+            times[i].append(time.perf_counter() - start)
+    per_page = sorted(min(page_times) for page_times in times)
+    hits = sum(1 for result in results if result)
+    print(f"{name:<30} mean {sum(per_page) / len(per_page) * 1e3:>7.2f} ms/page, "
+          f"median {per_page[len(per_page) // 2] * 1e3:>7.2f} ms/page, "
+          f"hit rate {hits}/{len(corpus)}")
+    return results
+
+
+def main(corpus_directory=None, repetitions=3):
+    corpus = load_corpus(Path(corpus_directory)) if corpus_directory \
+        else synthetic_corpus()
+    size = sum(len(page) for _, page in corpus) / len(corpus)
+    print(f"--- {len(corpus)} pages, {size / 1000:.0f} kB on average")
+    run("BeautifulSoup heuristics", previous_extraction, corpus, repetitions)
+    default_extractors.hits.clear()
+    run("extractor registry", registry_extraction(default_extractors), corpus,
+        repetitions)
+    print("hits by extractor (all repetitions):", dict(default_extractors.hits))
+    run("streaming extractor registry", streaming_extraction(default_extractors),
+        corpus, repetitions)
+    total_bytes = sum(len(page.encode("utf-8")) for _, page in corpus) * repetitions
+    print(f"parsed {streaming_extraction.parsed_bytes / total_bytes:.0%} of the bytes")
+
+    misses = large_miss_pages()
+    print(f"--- {len(misses)} pages without abstract, "
+          f"{len(misses[0][1]) / 1000:.0f} kB each (no fallback)")
+    run("parse and candidates", candidate_extraction(default_extractors), misses,
+        repetitions)
+    run("streaming and candidates",
+        streaming_candidate_extraction(default_extractors), misses, repetitions)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2], *(int(arg) for arg in sys.argv[2:3]))
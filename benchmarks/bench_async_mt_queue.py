@@ -0,0 +1,88 @@
+"""Microbenchmark comparing the enqueue-to-dequeue latency and throughput of
+AsyncMTQueue against the previous executor based implementation.
+
+A producer thread puts timestamped items on the queue while a coroutine in a
+separate event loop consumes them with async_get.
+
+Usage:
+    python -m benchmarks.bench_async_mt_queue [num_items]
+"""
+import asyncio
+import functools
+import statistics
+import sys
+import threading
+import time
+from queue import Queue
+
+from sources.data_processing.async_mt_queue import AsyncMTQueue
+
+
+class ExecutorAsyncMTQueue:
+    """The previous AsyncMTQueue, which parks an executor thread on a blocking
+    Queue.get for every async_get.
+    """
+
+    def __init__(self, max_size=0):
+        self._queue = Queue(maxsize=max_size)
+
+    async def async_get(self):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.get_blocking)
+
+    def get_blocking(self, timeout=None):
+        return self._queue.get(block=True, timeout=timeout)
+
+    def put(self, val, block=True):
+        self._queue.put(val, block=block)
+
+    async def async_put(self, val):
+        func = functools.partial(self.put, val=val, block=True)
+        asyncio.get_running_loop().run_in_executor(None, func)
+
+
+def run_trial(queue, num_items, producer_delay):
+    latencies = []
+
+    async def consume():
+        for _ in range(num_items):
+            sent = await queue.async_get()
+            latencies.append(time.perf_counter() - sent)
+
+    def produce():
+        for _ in range(num_items):
+            queue.put(time.perf_counter())
+            if producer_delay > 0:
+                time.sleep(producer_delay)
+
+    loop = asyncio.new_event_loop()
+    producer = threading.Thread(target=produce)
+    start = time.perf_counter()
+    producer.start()
+    loop.run_until_complete(consume())
+    elapsed = time.perf_counter() - start
+    producer.join()
+    loop.close()
+    return elapsed, latencies
+
+
+def report(name, num_items, elapsed, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1e6
+    p99 = latencies[int(0.99 * (len(latencies) - 1))] * 1e6
+    print(f"{name:<28} {num_items / elapsed:>12.0f} items/s "
+          f"{p50:>10.1f} us p50 {p99:>10.1f} us p99")
+
+
+def main(num_items=20000):
+    for label, delay in [("burst", 0), ("paced (0.1ms)", 0.0001)]:
+        n = num_items if delay == 0 else num_items // 10
+        print(f"--- {label}, {n} items")
+        for name, queue_cls in [("executor (previous)", ExecutorAsyncMTQueue),
+                                ("AsyncMTQueue", AsyncMTQueue)]:
+            elapsed, latencies = run_trial(queue_cls(), n, delay)
+            report(name, n, elapsed, latencies)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
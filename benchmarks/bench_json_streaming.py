@@ -0,0 +1,80 @@
+"""Microbenchmark comparing the memory and time needed to turn a Crossref
+journal-works page into ArticleMetadata: decoding the whole page and mapping
+it afterwards (previous) against JsonArrayStreamParser, which maps every work
+as soon as it has been received.
+
+The page is generated (works with long abstracts) and fed in 64 KiB chunks,
+as received from the network. Peak memory is measured with tracemalloc (in a
+separate run, as tracing slows the parsers down) and excludes the raw page
+itself.
+
+Usage:
+    python -m benchmarks.bench_json_streaming [num_works]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from sources.data_processing.json_streaming import JsonArrayStreamParser
+from sources.data_processing.repositories import CrossrefRepository
+from sources.data_processing.response_decoding import decode_json
+
+chunk_size = 64 * 1024
+
+
+def make_page(num_works):
+    words = ("species habitat restoration biodiversity forest population "
+             "conservation management landscape ").split()
+    items = [{"DOI": f"10.1111/abc.{i}",
+              "title": [" ".join(words[(i + j) % len(words)] for j in range(12))],
+              "abstract": "<jats:p>" + " ".join(
+                  words[(i * j) % len(words)] for j in range(1500)) + "</jats:p>",
+              "author": [{"given": f"Given{j}", "family": f"Family{j}"}
+                         for j in range(6)],
+              "issued": {"date-parts": [[2020, 1, 1]]},
+              "ISSN": ["1061-2971"], "publisher": "Wiley", "volume": "28",
+              "issue": "1", "URL": f"http://dx.doi.org/10.1111/abc.{i}"}
+             for i in range(num_works)]
+    return json.dumps({"status": "ok", "message": {
+        "next-cursor": "DnF1ZXJ5VGhlbkZldGNo", "items": items}}).encode("utf-8")
+
+
+def buffered(page, repo):
+    body = b"".join(page[i:i + chunk_size] for i in range(0, len(page), chunk_size))
+    response = decode_json(body, "application/json")
+    return [repo._map_response_item_to_metadata(item)
+            for item in response["message"]["items"]]
+
+
+def streamed(page, repo):
+    parser = JsonArrayStreamParser(("message", "items"))
+    return [repo._map_response_item_to_metadata(item) for item in
+            parser.iter_items(page[i:i + chunk_size]
+                              for i in range(0, len(page), chunk_size))]
+
+
+def measure(parse, page, repo):
+    start = time.perf_counter()
+    articles = parse(page, repo)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    parse(page, repo)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(articles), elapsed, peak
+
+
+def main(num_works=1000):
+    page = make_page(num_works)
+    repo = CrossrefRepository()
+    print(f"--- {num_works} works, page of {len(page) / 1e6:.1f} MB")
+    for name, parse in [("decode page, then map (previous)", buffered),
+                        ("JsonArrayStreamParser", streamed)]:
+        count, elapsed, peak = measure(parse, page, repo)
+        print(f"{name:<34} {elapsed * 1e3:>8.1f} ms "
+              f"{peak / 1e6:>8.1f} MB peak ({count} works)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
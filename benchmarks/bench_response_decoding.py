@@ -0,0 +1,106 @@
+"""Microbenchmark comparing the previous OpenAIRE decoding path (text, then
+json.loads with a YAML fallback) against response_decoding.decode_json.
+
+Recorded payloads are read from the given files (e.g. the *.body files of the
+HTTP response cache); without arguments, payloads shaped like OpenAIRE search
+results are generated. Every payload is decoded well formed and with a stray
+LaTeX backslash in an abstract (the malformation that used to hit YAML).
+
+The previous path needs PyYAML, which is no longer a requirement; without
+it (pip install PyYAML), only decode_json is timed.
+
+Usage:
+    python -m benchmarks.bench_response_decoding [payload_file ...]
+"""
+import json
+import random
+import statistics
+import sys
+import time
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from sources.data_processing import response_decoding
+from sources.data_processing.response_decoding import decode_json, \
+    repair_openaire_json
+
+
+def openaire_result(i, rng):
+    words = ["species", "habitat", "restoration", "biodiversity", "forest",
+             "population", "conservation", "management", "landscape"]
+    return {"metadata": {"oaf:entity": {"oaf:result": {
+        "creator": [{"$": f"Author {i}-{j}", "@rank": str(j)}
+                    for j in range(rng.randint(1, 8))],
+        "title": [{"$": " ".join(rng.choices(words, k=10)),
+                   "@classid": "main title"}],
+        "description": {"$": " ".join(rng.choices(words, k=250))},
+        "pid": [{"$": f"10.1111/abc.{i}", "@classid": "doi"}],
+        "publisher": {"$": "Wiley"},
+        "relevantdate": [{"$": "2020-01-01", "@classid": "published-print"}],
+        "journal": {"$": "Restoration Ecology", "issn": "1061-2971",
+                    "vol": "28", "iss": "1"},
+    }}}}
+
+
+def generated_payloads(num_payloads=20, results_per_payload=40):
+    rng = random.Random(0)
+    return [json.dumps({"response": {"results": {"result": [
+        openaire_result(p * results_per_payload + i, rng)
+        for i in range(results_per_payload)]}}}).encode("utf-8")
+        for p in range(num_payloads)]
+
+
+def malformed(payload: bytes) -> bytes:
+    return payload.replace(b'"description": {"$": "',
+                           b'"description": {"$": "\\alpha ', 1)
+
+
+def previous_decode(body: bytes):
+    text = body.decode("utf-8")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return yaml.load(text, yaml.SafeLoader)
+
+
+def current_decode(body: bytes):
+    return decode_json(body, "application/json;charset=UTF-8",
+                       repair_openaire_json)
+
+
+def time_decoder(decode, payloads, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(paths):
+    payloads = [open(path, "rb").read() for path in paths] if paths \
+        else generated_payloads()
+    size = sum(len(payload) for payload in payloads) / 1e6
+    backend = "orjson" if response_decoding.orjson is not None else "json"
+    print(f"{len(payloads)} payloads, {size:.1f} MB, decode_json uses {backend}")
+    if yaml is None:
+        print("PyYAML is not installed, the previous path is skipped")
+    for label, batch, repeat in [("well formed", payloads, 5),
+                                 ("malformed", [malformed(p) for p in payloads],
+                                  1)]:
+        print(f"--- {label}")
+        decoders = [("decode_json", current_decode)]
+        if yaml is not None:
+            decoders.insert(0, ("json + YAML fallback (previous)", previous_decode))
+        for name, decode in decoders:
+            elapsed = time_decoder(decode, batch, repeat)
+            print(f"{name:<34} {elapsed * 1e3:>10.1f} ms "
+                  f"{size / elapsed:>8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
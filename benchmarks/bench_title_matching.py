@@ -0,0 +1,66 @@
+"""Microbenchmark comparing best-fit title selection with a full
+Damerau-Levenshtein distance for every candidate (the previous
+get_metadata_best_fit_by_title) against TitleMatcher.
+
+Every query title is compared against a candidate list as returned by a
+repository search: a few near duplicates and many unrelated titles.
+
+Usage:
+    python -m benchmarks.bench_title_matching [num_queries]
+"""
+import random
+import sys
+import time
+
+import jellyfish
+
+from sources.data_processing.title_matching import TitleMatcher
+
+words = ["species", "habitat", "restoration", "biodiversity", "forest", "bats",
+         "population", "conservation", "management", "landscape", "of", "the",
+         "in", "a", "effects", "on", "grassland", "pollinator"]
+
+
+def previous_best_fit(titles, real_title):
+    distances = [jellyfish.damerau_levenshtein_distance(
+        title.strip().lower(), real_title.strip().lower()) for title in titles]
+    candidates = [(i, d) for i, d in enumerate(distances)
+                  if d < 2 + len(titles[i]) // 20]
+    return min(candidates, key=lambda pair: pair[1])[0] if candidates else None
+
+
+def current_best_fit(titles, real_title):
+    return TitleMatcher(real_title).best_fit(titles)
+
+
+def make_trials(num_queries, num_candidates, rng):
+    trials = []
+    for _ in range(num_queries):
+        title = " ".join(rng.choices(words, k=rng.randint(6, 16)))
+        candidates = [" ".join(rng.choices(words, k=rng.randint(6, 16)))
+                      for _ in range(num_candidates - 2)]
+        candidates.insert(rng.randrange(len(candidates)), title.upper() + ".")
+        candidates.insert(rng.randrange(len(candidates)), title[:-3])
+        trials.append((title, candidates))
+    return trials
+
+
+def main(num_queries=2000):
+    rng = random.Random(0)
+    for num_candidates in [5, 20, 100]:
+        trials = make_trials(num_queries, num_candidates, rng)
+        print(f"--- {num_queries} titles, {num_candidates} candidates each")
+        results = []
+        for name, best_fit in [("full distance (previous)", previous_best_fit),
+                               ("TitleMatcher", current_best_fit)]:
+            start = time.perf_counter()
+            results.append([best_fit(candidates, title)
+                            for title, candidates in trials])
+            elapsed = time.perf_counter() - start
+            print(f"{name:<26} {elapsed * 1e3:>10.1f} ms "
+                  f"{elapsed / num_queries * 1e6:>10.1f} us/title")
+        assert results[0] == results[1]
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -1,9 +1,12 @@
+import collections
 import datetime
 import itertools
 import math
 import random
 import threading
+import uuid
 from datetime import timedelta
+from queue import Full
 from typing import Iterator, List, Dict, Generator, Set, Callable, Optional
 
 from sources.data_processing.paper_scraper_api import PaperScraper
@@ -205,7 +208,8 @@ class QueryDispatcher:
             self._scrape_queries_with_paperscraper(queries,
                                                    g_query_id,
                                                    fetch_article_cb,
-                                                   fetch_article_cb_freq)
+                                                   fetch_article_cb_freq,
+                                                   uuid.uuid4().hex)
 
         # Now that we have all queries use the ML Model to judge them and
         # store them as Article_DB_Format
@@ -273,7 +277,8 @@ class QueryDispatcher:
     @staticmethod
     def _scrape_queries_with_paperscraper(queries: List[ISSNTimeIntervalQuery], query_id: Iterator[int],
                                           fetch_article_cb: Optional[Callable[[int, float], None]],
-                                          fetch_article_cb_freq: int):
+                                          fetch_article_cb_freq: int,
+                                          sync_id: Optional[str] = None):
         """Delegates all queries using the Paperscraper.
 
         Args:
@@ -281,6 +286,7 @@ class QueryDispatcher:
             query_id (Iterator[int]): A query_id generator
             fetch_article_cb (Optional[Callable[[int, float], None]]): A callback to call after fetch_article_cb_freq iterations or none.
             fetch_article_cb_freq (int): The frequency of the calling of the callback.
+            sync_id (Optional[str]): Identifies the synchronisation job; the PaperScraper schedules jobs fairly. Defaults to None.
 
         Returns:
             List[Response]: The scraped articles.
@@ -292,10 +298,21 @@ class QueryDispatcher:
         tot = len(queries)
         sum = 0
         num = 0
+        for query in queries:
+            query.set_sync_id(sync_id)
+        # Queries waiting for the PaperScraper to take them. It refuses them (Full) once it buffered too many
+        # responses, so the responses it buffered are polled before delegating again
+        to_delegate = collections.deque(queries)
         with PaperScraper() as ps:
-            for query in queries:
-                ps.delegate_query(query)
-            while not ps.processed_all_queries:
+            while len(to_delegate) > 0 or not ps.processed_all_queries:
+                while len(to_delegate) > 0 and ps.buffered_qsize() == 0:
+                    try:
+                        ps.delegate_query(to_delegate[0])
+                    except Full:
+                        break
+                    to_delegate.popleft()
+                if ps.processed_all_queries:
+                    continue
                 response = ps.poll_response()
 
                 if isinstance(response, FailedQueryResponse):
@@ -310,7 +327,8 @@ class QueryDispatcher:
 
                     # scraped_articles.extend(articles_w_abstract)
                     cnt += len(articles_w_abstract)
-                    num += 1
+                    # Intervals arrive page by page, count each one once
+                    num += 1 if response.final else 0
                     sum += len(articles_w_abstract) + len(articles_wo_abstract)
                     for article in articles_wo_abstract:
                         if article.doi is not None and article.doi != "":
@@ -323,7 +341,8 @@ class QueryDispatcher:
                                     journal_volume=article.journal_volume,
                                     issn=article.issn
                                 ))
-                            ps.delegate_query(q)
+                            q.set_sync_id(sync_id)
+                            to_delegate.append(q)
                         else:
                             q = KeywordQuery(next(query_id),
                                              article.authors,
@@ -336,7 +355,8 @@ class QueryDispatcher:
                                     journal_issue=article.journal_issue,
                                     journal_volume=article.journal_volume,
                                     issn=article.issn))
-                            ps.delegate_query(q)
+                            q.set_sync_id(sync_id)
+                            to_delegate.append(q)
 
                 elif isinstance(response, Response):
                     cnt = cnt + 1
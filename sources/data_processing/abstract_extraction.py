@@ -0,0 +1,476 @@
+import collections
+import json
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import lxml.html
+from bs4 import BeautifulSoup
+from lxml import etree
+
+from .scrape_scheduling import domain_of
+
+# An extractor takes a parsed page (lxml.html) and returns the abstract or None
+Extractor = Callable[[lxml.html.HtmlElement], Optional[str]]
+
+whitespace_pattern = re.compile(r"\s+")
+heading_prefix_pattern = re.compile(r"^(abstract|summary)\s*[:.]?\s*", flags=re.IGNORECASE)
+
+# Shorter texts are no abstract (e.g. a lone heading or a truncated description)
+min_abstract_length = 50
+
+# Strings are parsed from their UTF-8 encoding, lxml refuses strings with an encoding declaration
+utf8_html_parser = lxml.html.HTMLParser(encoding="utf-8")
+
+
+def parse_html(page: Union[str, bytes]) -> lxml.html.HtmlElement:
+    """Parses a landing page with lxml.
+
+    Args:
+        page (Union[str, bytes]): The page, undecoded bytes are decoded by the charset the page declares.
+
+    Returns:
+        lxml.html.HtmlElement: The html element of the page.
+    """
+    if isinstance(page, str):
+        page = page.encode("utf-8")
+        parser = utf8_html_parser
+    else:
+        parser = None
+    if len(page.strip()) == 0:
+        page = b"<html></html>"
+    return lxml.html.document_fromstring(page, parser=parser)
+
+
+def clean_text(text: str) -> str:
+    """Collapses whitespace and removes a leading Abstract/Summary heading."""
+    return heading_prefix_pattern.sub("", whitespace_pattern.sub(" ", text).strip())
+
+
+def page_text_length(tree: lxml.html.HtmlElement) -> int:
+    """Returns the length of the readable text of a page (without scripts and style sheets)."""
+    return sum(len(text) for text in tree.xpath(
+        "//text()[not(ancestor::script) and not(ancestor::style)]"))
+
+
+def markup_text(content: str) -> str:
+    """Returns the text of content, which may contain markup (e.g. <p> in citation_abstract)."""
+    if "<" not in content:
+        return content
+    return lxml.html.fragment_fromstring(content, create_parent="div").text_content()
+
+
+def _split_top_level(expression: str, separator: str) -> List[str]:
+    """Splits an XPath expression at separator outside of predicates and string literals."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(expression):
+        if quote is not None:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif depth == 0 and expression.startswith(separator, i):
+            parts.append(expression[start:i])
+            start = i + len(separator)
+    parts.append(expression[start:])
+    return parts
+
+
+anchor_step_pattern = re.compile(r"^([\w-]+)(\[.*\])?$", flags=re.DOTALL)
+string_literal_pattern = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+predicate_token_pattern = re.compile(r"@?[\w-]+\(?")
+# Functions that keep a literal intact, so that the attribute value has to contain it
+literal_preserving_functions = {"contains(", "concat(", "normalize-space(", "starts-with("}
+
+
+def required_literals(step: str) -> Optional[List[str]]:
+    """Returns the strings that an element's attribute values must contain to match step, if its predicates
+        only compare attributes with string literals (joined by and), else None.
+    """
+    literals = [(single or double).strip()
+                for single, double in string_literal_pattern.findall(step)]
+    tokens = predicate_token_pattern.findall(string_literal_pattern.sub("", step))[1:]
+    if not all(token.startswith("@") or token == "and" or token in literal_preserving_functions
+               for token in tokens):
+        return None
+    return [literal for literal in literals if len(literal) > 0]
+
+
+def anchor_branches(expression: str) -> Optional[List[tuple]]:
+    """Splits an expression of the form //tag[predicates]rest (or a union of those) at its first step, the
+        anchor: once an anchor element is complete, so is everything rest selects inside it.
+
+    Args:
+        expression (str): The XPath expression.
+
+    Returns:
+        List[tuple]: (anchor tag, strings the anchor's attribute values contain (see required_literals), XPath
+            testing whether an element is an anchor, XPath of rest relative to the anchor) per branch of the
+            union or None if a branch has another form.
+    """
+    branches = []
+    for branch in _split_top_level(expression, "|"):
+        branch = branch.strip()
+        if not branch.startswith("//"):
+            return None
+        step = _split_top_level(branch[2:], "/")[0]
+        match = anchor_step_pattern.match(step)
+        if match is None:
+            return None
+        branches.append((match.group(1), required_literals(step), etree.XPath("self::" + step),
+                         etree.XPath("." + branch[2 + len(step):])))
+    return branches
+
+
+class XPathExtractor:
+    """Extracts the joined text of the elements (or attribute values) a precompiled XPath expression selects."""
+
+    def __init__(self, expression: str, name: Optional[str] = None):
+        """
+        Args:
+            expression (str): The XPath expression.
+            name (str, optional): The name under which hits are counted. Defaults to the expression.
+        """
+        self.expression = expression
+        self.name = expression if name is None else name
+        self._xpath = etree.XPath(expression)
+        # Used to confirm an abstract while the page is still being parsed (see StreamingAbstractExtractor)
+        self.anchors = anchor_branches(expression)
+
+    def select(self, tree: lxml.html.HtmlElement) -> list:
+        """Returns the elements (or attribute values) the expression selects."""
+        return self._xpath(tree)
+
+    @staticmethod
+    def text_of(results: list) -> Optional[str]:
+        """Returns the joined text of selected elements (or attribute values) or None if there is none."""
+        parts = [markup_text(str(result)) if isinstance(result, str)
+                 else result.text_content()
+                 for result in results]
+        text = clean_text(" ".join(parts))
+        return text if len(text) > 0 else None
+
+    def __call__(self, tree: lxml.html.HtmlElement) -> Optional[str]:
+        return self.text_of(self.select(tree))
+
+
+def meta_extractor(*names: str) -> XPathExtractor:
+    """Returns an extractor for the content of the first <meta> tag with one of the (case insensitive) names."""
+    lower = "translate(@name, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+    condition = " or ".join(f"{lower} = '{name.lower()}'" for name in names)
+    return XPathExtractor(f"(//meta[{condition}]/@content)[1]",
+                          name="meta " + "/".join(names))
+
+
+def class_contains(class_name: str) -> str:
+    """Returns an XPath condition matching elements that have class_name among their classes."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+article_types = {"ScholarlyArticle", "Article", "MedicalScholarlyArticle", "Chapter"}
+json_ld_xpath = etree.XPath("//script[@type='application/ld+json']/text()")
+
+
+def _json_ld_objects(document) -> Iterator[dict]:
+    if isinstance(document, list):
+        for element in document:
+            yield from _json_ld_objects(element)
+    elif isinstance(document, dict):
+        yield document
+        yield from _json_ld_objects(document.get("@graph"))
+        yield from _json_ld_objects(document.get("mainEntity"))
+
+
+def json_ld_abstract(tree: lxml.html.HtmlElement) -> Optional[str]:
+    """Extracts the abstract (or the description of an article) from embedded JSON-LD metadata."""
+    for script in json_ld_xpath(tree):
+        try:
+            document = json.loads(script)
+        except ValueError:
+            continue
+        for entity in _json_ld_objects(document):
+            abstract = entity.get("abstract")
+            types = entity.get("@type")
+            types = set(types) if isinstance(types, list) else {types}
+            if abstract is None and len(types & article_types) > 0:
+                abstract = entity.get("description")
+            if isinstance(abstract, str):
+                return clean_text(markup_text(abstract))
+    return None
+
+
+abstract_heading_pattern = re.compile(r"h[1-5]|text|pharos-heading")
+abstract_heading_text_pattern = re.compile(r"Summary|Abstract", flags=re.IGNORECASE)
+abstract_container_pattern = re.compile("section|p|div")
+readable_abstract_pattern = re.compile(
+    r"\n\s*Abstract\s*(.*)\n|\n\s*Summary\s*(.*)\n", flags=re.IGNORECASE
+)
+
+
+def extract_abstract(doi_bs: BeautifulSoup) -> Optional[str]:
+    """Extracts the abstract from a page parsed by BeautifulSoup with the generic heuristics: the element after an
+        Abstract/Summary heading, an element with class abstract or the line after "Abstract" in the readable text.
+
+    Args:
+        doi_bs (BeautifulSoup): The parsed landing page.
+
+    Returns:
+        str: The abstract or None if nothing was found.
+    """
+    doi_bs = doi_bs.body
+    if doi_bs is None:
+        return None
+
+    res3 = doi_bs.find_all(abstract_heading_pattern,
+                           string=abstract_heading_text_pattern)
+    if len(res3) > 0:
+        res3 = res3[0]
+        sibling = res3.next_element
+        while sibling.name not in ["section", "p", "div"]:
+            sibling = sibling.next_element
+        return sibling.get_text().strip()
+
+    # Method 1
+    res1 = doi_bs.find_all(abstract_container_pattern, class_="abstract")
+    if len(res1) > 0:
+        res1 = res1[0]
+        return res1.get_text().strip()
+
+    # Search readable text -- fallback
+    readable_text = doi_bs.get_text()
+    result = readable_abstract_pattern.search(readable_text)
+
+    return result.group(1).strip() if result is not None else None
+
+
+def generic_abstract(tree: lxml.html.HtmlElement) -> Optional[str]:
+    """Runs the generic heuristics (extract_abstract) on a page parsed by lxml."""
+    return extract_abstract(BeautifulSoup(lxml.html.tostring(tree), features="lxml"))
+
+
+class AbstractExtractorRegistry:
+    """Holds the abstract extractors by landing page domain.
+
+    For a page, the extractors registered for its domain (or a parent domain, e.g. springer.com for
+        link.springer.com) are tried first, then the embedded metadata (<meta> tags and JSON-LD) and, only if
+        nothing of at least min_abstract_length characters has been found, the generic heuristics.
+    """
+
+    def __init__(self,
+                 metadata_extractors: Optional[List[Extractor]] = None,
+                 fallback: Optional[Extractor] = generic_abstract):
+        """
+        Args:
+            metadata_extractors (List[Extractor], optional): The extractors for every domain. Defaults to None.
+            fallback (Extractor, optional): Used if no other extractor finds an abstract. Defaults to
+                generic_abstract.
+        """
+        self._extractors: Dict[str, List[Extractor]] = {}
+        self.metadata_extractors = [] if metadata_extractors is None else metadata_extractors
+        self.fallback = fallback
+        self.hits = collections.Counter()
+
+    def register(self, domain: str, *extractors: Extractor):
+        """Adds extractors for the pages of domain (and its subdomains).
+
+        Args:
+            domain (str): The domain without leading www (e.g. tandfonline.com).
+            *extractors (Extractor): The extractors, tried in order.
+        """
+        self._extractors.setdefault(domain, []).extend(extractors)
+
+    def extractors_for(self, url: Optional[str]) -> List[Extractor]:
+        """Returns the extractors registered for the domain of url, those of the most specific domain first."""
+        domain = domain_of(url) if url is not None else None
+        extractors = []
+        while domain:
+            extractors.extend(self._extractors.get(domain, []))
+            domain = domain.partition(".")[2]
+        return extractors
+
+    @staticmethod
+    def extractor_name(extractor: Extractor) -> str:
+        return getattr(extractor, "name", getattr(extractor, "__name__", repr(extractor)))
+
+    def extract_candidate(self, tree: lxml.html.HtmlElement, url: Optional[str] = None) -> Optional[str]:
+        """Returns the abstract found by the domain and metadata extractors, without the fallback.
+
+        Args:
+            tree (lxml.html.HtmlElement): The parsed page.
+            url (str, optional): The url of the page. Defaults to None.
+
+        Returns:
+            str: The abstract or None.
+        """
+        for extractor in self.extractors_for(url) + self.metadata_extractors:
+            abstract = extractor(tree)
+            if abstract is not None and len(abstract) >= min_abstract_length:
+                self.hits[self.extractor_name(extractor)] += 1
+                return abstract
+        return None
+
+    def extract(self, tree: lxml.html.HtmlElement, url: Optional[str] = None) -> Optional[str]:
+        """Extracts the abstract from a landing page.
+
+        Args:
+            tree (lxml.html.HtmlElement): The parsed page.
+            url (str, optional): The url of the page. Defaults to None.
+
+        Returns:
+            str: The abstract or None if nothing was found.
+        """
+        abstract = self.extract_candidate(tree, url)
+        if abstract is not None:
+            return abstract
+        if self.fallback is not None:
+            abstract = self.fallback(tree)
+            if abstract:
+                self.hits["fallback"] += 1
+                return abstract
+        self.hits["miss"] += 1
+        return None
+
+
+default_extractors = AbstractExtractorRegistry(metadata_extractors=[
+    meta_extractor("citation_abstract"),
+    meta_extractor("dcterms.abstract", "dc.description", "dcterms.description"),
+    json_ld_abstract])
+
+default_extractors.register("sciencedirect.com", XPathExtractor(
+    f"//div[{class_contains('abstract')} and {class_contains('author')}]/div",
+    name="sciencedirect"))
+springer_extractor = XPathExtractor(
+    "//section[@data-title='Abstract']//div[@class='c-article-section__content'] | "
+    "//div[@id='Abs1-content']", name="springer nature")
+for springer_domain in ["springer.com", "nature.com", "biomedcentral.com"]:
+    default_extractors.register(springer_domain, springer_extractor)
+default_extractors.register("onlinelibrary.wiley.com", XPathExtractor(
+    f"//section[{class_contains('article-section__abstract')}]"
+    f"//div[{class_contains('article-section__content')}]", name="wiley"))
+default_extractors.register("tandfonline.com", XPathExtractor(
+    f"//div[{class_contains('abstractSection')}]", name="taylor & francis"))
+atypon_extractor = XPathExtractor("//section[@id='abstract']", name="atypon")
+for atypon_domain in ["science.org", "pnas.org", "annualreviews.org"]:
+    default_extractors.register(atypon_domain, atypon_extractor)
+default_extractors.register("journals.plos.org", XPathExtractor(
+    f"//div[{class_contains('abstract-content')}]", name="plos"))
+default_extractors.register("mdpi.com", XPathExtractor(
+    f"//section[{class_contains('html-abstract')}]//div[{class_contains('html-p')}]",
+    name="mdpi"))
+default_extractors.register("cambridge.org", XPathExtractor(
+    f"//div[{class_contains('abstract-content')}]//div[{class_contains('abstract')}]",
+    name="cambridge"))
+default_extractors.register("academic.oup.com", XPathExtractor(
+    f"//section[{class_contains('abstract')}]", name="oxford"))
+default_extractors.register("frontiersin.org", XPathExtractor(
+    f"//div[{class_contains('JournalAbstract')}]/p", name="frontiers"))
+
+
+class StreamingAbstractExtractor:
+    """Parses a landing page incrementally (lxml's pull parser) and confirms an abstract as soon as the elements
+        it comes from are complete, so that the rest of the page neither has to be downloaded nor parsed.
+
+    Only XPathExtractors of the registry are used while streaming: an extractor of the page's domain is
+        evaluated when one of its anchor elements (see anchor_branches) closes, relative to that element only,
+        so that the cost does not grow with the part of the page parsed so far. Metadata extractors (<meta>
+        tags) only confirm if the domain has no extractors of its own, which would take precedence once the
+        whole page has been read; they are evaluated once, when the head is complete. Otherwise (or if nothing
+        is confirmed), close returns the complete tree for the registry.
+    """
+
+    def __init__(self, registry: AbstractExtractorRegistry, url: Optional[str] = None,
+                 encoding: Optional[str] = None):
+        """
+        Args:
+            registry (AbstractExtractorRegistry): The extractors.
+            url (str, optional): The url of the page. Defaults to None.
+            encoding (str, optional): The charset of the page (e.g. from its Content-Type), if None it is detected
+                by lxml. Defaults to None.
+        """
+        domain_extractors = registry.extractors_for(url)
+        self._metadata_only = len(domain_extractors) == 0
+        self._metadata_extractors = [] if not self._metadata_only else \
+            [extractor for extractor in registry.metadata_extractors
+             if isinstance(extractor, XPathExtractor)]
+        # Anchor tag -> [(extractor, required literals, anchor test, relative XPath)]
+        self._anchors: Dict[str, List[tuple]] = {}
+        for extractor in domain_extractors:
+            for tag, *anchor in getattr(extractor, "anchors", None) or []:
+                self._anchors.setdefault(tag, []).append((extractor, *anchor))
+        # Only the elements that can confirm an abstract are reported. lxml closes the head when the body starts,
+        # even if the page omits </head>.
+        self._parser = etree.HTMLPullParser(
+            events=("end",), encoding=encoding, tag=["head", *self._anchors])
+        self._parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        self._root: Optional[lxml.html.HtmlElement] = None
+        self._registry = registry
+        self.abstract: Optional[str] = None
+        self.parsed_bytes = 0
+
+    def _confirm(self, extractor: XPathExtractor, results: list) -> Optional[str]:
+        abstract = extractor.text_of(results)
+        if abstract is not None and len(abstract) >= min_abstract_length:
+            self._registry.hits[extractor.name] += 1
+            return abstract
+        return None
+
+    def _confirm_anchor(self, element: lxml.html.HtmlElement) -> Optional[str]:
+        attribute_text = None
+        for extractor, literals, is_anchor, relative in self._anchors.get(element.tag, []):
+            if literals:
+                # Most elements of the anchor's tag fail this much cheaper test
+                if attribute_text is None:
+                    attribute_text = " ".join(element.attrib.values())
+                if not all(literal in attribute_text for literal in literals):
+                    continue
+            if is_anchor(element):
+                abstract = self._confirm(extractor, relative(element))
+                if abstract is not None:
+                    return abstract
+        return None
+
+    def _confirm_metadata(self, element: lxml.html.HtmlElement) -> Optional[str]:
+        root = element.getroottree().getroot()
+        for extractor in self._metadata_extractors:
+            abstract = self._confirm(extractor, extractor.select(root))
+            if abstract is not None:
+                return abstract
+        return None
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        """Parses the next chunk of the page.
+
+        Args:
+            chunk (bytes): The next bytes of the page.
+
+        Returns:
+            str: The abstract once it is confirmed, None until then.
+        """
+        if self.abstract is not None:
+            return self.abstract
+        self.parsed_bytes += len(chunk)
+        self._parser.feed(chunk)
+        for _, element in self._parser.read_events():
+            if self._root is None:
+                self._root = element.getroottree().getroot()
+            if element.tag == "head":
+                self.abstract = self._confirm_metadata(element)
+            if self.abstract is None:
+                self.abstract = self._confirm_anchor(element)
+            if self.abstract is not None:
+                break
+        return self.abstract
+
+    def close(self) -> lxml.html.HtmlElement:
+        """Ends the input.
+
+        Returns:
+            lxml.html.HtmlElement: The tree of the page (as far as it has been fed).
+        """
+        try:
+            root = self._parser.close()
+        except etree.XMLSyntaxError:
+            root = self._root
+        return root if root is not None else parse_html(b"")
@@ -3,130 +3,342 @@ import random
 import re
 import time
 from concurrent.futures import as_completed, ThreadPoolExecutor
+from typing import Optional, Tuple
 from urllib.parse import unquote
 
+import aiohttp
 import cloudscraper
+import lxml.html
 import pandas as pd
-from bs4 import BeautifulSoup
+from yarl import URL
+
+from sources.databases.abstract_cache_db import AbstractCache
+from .abstract_extraction import AbstractExtractorRegistry, \
+    StreamingAbstractExtractor, default_extractors, page_text_length, parse_html
+from .scrape_scheduling import DomainPolitenessScheduler
 
 urlreg = re.compile(
     r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
 )
 
 
-def get_abstract_from_doi(doi: str) -> str:
-    """Takes a DOI as string and returns an abstract scraped from www.doi.org/doi.
+# Pages with less readable text than this are (JavaScript) redirect pages
+min_page_text_length = 150
+js_redirect_pattern = re.compile(r"\?Redirect=(.*);")
+redirect_id_pattern = re.compile("url|redirect", flags=re.IGNORECASE)
+
+
+def springer_article_url(url: str) -> Optional[str]:
+    """Springer DOIs may resolve to a chapter or reference page instead of the article; returns the url of the
+        article page in that case.
+
+    Args:
+        url (str): The url the DOI resolved to.
+
+    Returns:
+        str: The article url or None if url needs no rewrite.
+    """
+    if url.startswith("https://link.springer.com/") \
+            and not url.startswith("https://link.springer.com/article"):
+        return url.replace("https://link.springer.com/",
+                           "https://link.springer.com/article/")
+    return None
+
+
+def find_redirect_url(tree: lxml.html.HtmlElement) -> Optional[str]:
+    """Finds the target of a JavaScript redirect page (e.g. Elsevier's linkinghub), either in a "?Redirect="
+        parameter in the head or in an attribute of an element with a url/redirect id.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed redirect page.
+
+    Returns:
+        str: The url to continue with or None if there is none.
+    """
+    head = tree.find("head")
+    if head is not None:
+        match = js_redirect_pattern.search(lxml.html.tostring(head, encoding="unicode"))
+        if match is not None:
+            return unquote(match.group(1))
+    for element in tree.xpath("//body//*[@id]"):
+        if redirect_id_pattern.search(element.get("id")) is None:
+            continue
+        for val in element.attrib.values():
+            match = urlreg.search(unquote(val))
+            if match is not None:
+                return match.group(0)
+    return None
+
+
+def scrape_abstract_from_doi(doi: str, extractors: AbstractExtractorRegistry = default_extractors
+                             ) -> Tuple[Optional[str], Optional[str]]:
+    """Scrapes the abstract of a DOI from the page www.doi.org/doi resolves to (with cloudscraper).
 
     Args:
         doi (str): The DOI to query
+        extractors (AbstractExtractorRegistry, optional): Extract the abstract from the landing page. Defaults to
+            default_extractors.
 
     Returns:
-        str: The queried abstract or None if nothing was found.
+        Tuple[Optional[str], Optional[str]]: The abstract (None if nothing was found) and the landing url.
     """
     scraper = cloudscraper.create_scraper()
     doi_data = scraper.get(f"https://www.doi.org/{doi}", timeout=10)
-    doi_bs = BeautifulSoup(doi_data.text, features="lxml")
-
-    if doi_data.url.startswith(
-            "https://link.springer.com/"
-    ) and not doi_data.url.startswith("https://link.springer.com/article"):
-        cleaned_link = doi_data.url.replace(
-            "https://link.springer.com/", "https://link.springer.com/article/"
-        )
+
+    cleaned_link = springer_article_url(doi_data.url)
+    if cleaned_link is not None:
         doi_data = scraper.get(cleaned_link, timeout=10)
-        doi_bs = BeautifulSoup(doi_data.text, features="lxml")
+    tree = parse_html(doi_data.text)
 
     # Check whether we landed at a javascript redirect page
     attempts = 0
-    while len(doi_bs.get_text()) < 150:
+    while page_text_length(tree) < min_page_text_length:
         if attempts > 3:
-            return None
+            return None, doi_data.url
         attempts = attempts + 1
-        pattern = re.compile(r"\?Redirect=(.*);")
-        match = pattern.search(doi_bs.head.__str__())
-        if match is not None:
-            doi_data = scraper.get(unquote(match.group(1)), timeout=10)
-            doi_bs = BeautifulSoup(doi_data.text, features="lxml")
-        else:
-            res = doi_bs.body.find_all(
-                id=re.compile("url|redirect", flags=re.IGNORECASE)
-            )
-            for tag in res:
-                red_url = filter(
-                    lambda v: v is not None,
-                    [
-                        urlreg.search(unquote(val))
-                        for key, val in tag.attrs.items()
-                    ],
-                )
-                red_url = list(red_url)
-                if len(red_url) > 0:
-                    match = red_url[0]
-                    doi_data = scraper.get(unquote(match.group(1)), timeout=10)
-                    doi_bs = BeautifulSoup(doi_data.text, features="lxml")
-                    continue
-
-    doi_bs = doi_bs.body
-
-    res3 = doi_bs.find_all(
-        re.compile(r"h[1-5]|text|pharos-heading"),
-        string=re.compile(r"Summary|Abstract", flags=re.IGNORECASE),
-    )
-    if len(res3) > 0:
-        res3 = res3[0]
-        sibling = res3.next_element
-        while sibling.name not in ["section", "p", "div"]:
-            sibling = sibling.next_element
-        return sibling.get_text().strip()
-
-    # Method 1
-    res1 = doi_bs.find_all(re.compile("section|p|div"), class_="abstract")
-    if len(res1) > 0:
-        res1 = res1[0]
-        return res1.get_text().strip()
-
-    # Search readable text -- fallback
-    readable_text = doi_bs.get_text()
-    pattern = re.compile(
-        r"\n\s*Abstract\s*(.*)\n|\n\s*Summary\s*(.*)\n", flags=re.IGNORECASE
-    )
-    result = pattern.search(readable_text)
-
-    return result.group(1).strip() if result is not None else None
-
-
-async def async_get_abstract_from_doi(doi: str) -> str:
+        redirect_url = find_redirect_url(tree)
+        if redirect_url is None:
+            return None, doi_data.url
+        doi_data = scraper.get(redirect_url, timeout=10)
+        tree = parse_html(doi_data.text)
+
+    return extractors.extract(tree, doi_data.url), doi_data.url
+
+
+def get_abstract_from_doi(doi: str,
+                          extractors: AbstractExtractorRegistry = default_extractors,
+                          cache: Optional[AbstractCache] = None) -> str:
+    """Takes a DOI as string and returns an abstract scraped from www.doi.org/doi.
+
+    Args:
+        doi (str): The DOI to query
+        extractors (AbstractExtractorRegistry, optional): Extract the abstract from the landing page. Defaults to
+            default_extractors.
+        cache (AbstractCache, optional): If given, consulted before and updated after scraping. Defaults to None.
+
+    Returns:
+        str: The queried abstract or None if nothing was found.
+    """
+    if cache is not None:
+        entry = cache.get_entry(doi)
+        if entry is not None:
+            return entry["abstract"]
+    abstract, landing_url = scrape_abstract_from_doi(doi, extractors)
+    if cache is not None:
+        cache.record(doi, abstract, landing_url)
+    return abstract
+
+
+class CloudflareChallengeError(Exception):
+    """Raised when a landing page is hidden behind a Cloudflare browser challenge."""
+
+
+class AbstractScraper:
+    """Scrapes abstracts from the landing pages DOIs resolve to, following the same rules as get_abstract_from_doi
+        (DOI redirect, Springer article rewrite, JavaScript redirect pages), but on aiohttp: connections are kept
+        alive per host and cookies are kept per domain (in the session's cookie jar) across DOIs. Usage must always
+        be done in combination with the (async) context pattern.
+
+    A DomainPolitenessScheduler decides when a DOI may be scraped and spaces out the requests per domain; HTTP
+        redirects are followed one hop at a time, so the publisher a DOI redirects to is limited as well.
+
+    Pages are read and parsed in chunks (StreamingAbstractExtractor); once an abstract is confirmed, the download
+        is stopped.
+
+    With an AbstractCache, DOIs that have been scraped before (successfully or, until the negative entry expires,
+        unsuccessfully) are answered from the cache.
+
+    aiohttp cannot solve Cloudflare's browser challenge. If challenge_fallback is set, a DOI whose landing page
+        answers with one is scraped by get_abstract_from_doi (cloudscraper) in the default executor instead.
+    """
+    doi_resolver = "https://www.doi.org/"
+
+    # Browser-like headers, some publishers refuse requests without them
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                      "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-US,en;q=0.9"}
+
+    # How many JavaScript redirect pages are followed per DOI
+    max_redirect_pages = 4
+    # How many HTTP redirects are followed per page
+    max_http_redirects = 10
+    # The size of the chunks in which pages are read and parsed
+    stream_chunk_size = 16 * 1024
+
+    def __init__(self,
+                 max_concurrency: int = 10,
+                 timeout: float = 10,
+                 challenge_fallback: bool = True,
+                 scheduler: Optional[DomainPolitenessScheduler] = None,
+                 extractors: AbstractExtractorRegistry = default_extractors,
+                 cache: Optional[AbstractCache] = None):
+        """
+        Args:
+            max_concurrency (int, optional): How many DOIs are scraped at once, if no scheduler is given.
+                Defaults to 10.
+            timeout (float, optional): The timeout (in s) of every request. Defaults to 10.
+            challenge_fallback (bool, optional): Whether pages behind a Cloudflare challenge are scraped with
+                cloudscraper. Defaults to True.
+            scheduler (DomainPolitenessScheduler, optional): The per-domain limits. Defaults to None.
+            extractors (AbstractExtractorRegistry, optional): Extract the abstracts from the landing pages.
+                Defaults to default_extractors.
+            cache (AbstractCache, optional): The (entered) cache of scrape outcomes. Defaults to None.
+        """
+        self.timeout = timeout
+        self.challenge_fallback = challenge_fallback
+        self.scheduler = DomainPolitenessScheduler(max_concurrency) \
+            if scheduler is None else scheduler
+        self.extractors = extractors
+        self.cache = cache
+        self.cache_hits = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.scraped_dois = 0
+        self.fetched_pages = 0
+        self.read_bytes = 0
+        self.stopped_downloads = 0
+        self.challenge_fallbacks = 0
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers=self.headers)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._session.close()
+        self._session = None
+
+    async def _read_page(self, resp, url: str) -> Tuple[lxml.html.HtmlElement, Optional[str]]:
+        try:
+            extractor = StreamingAbstractExtractor(self.extractors, url, resp.charset)
+        except LookupError:
+            # An encoding lxml does not know, let it detect the encoding
+            extractor = StreamingAbstractExtractor(self.extractors, url)
+        async for chunk in resp.content.iter_chunked(self.stream_chunk_size):
+            if extractor.feed(chunk) is not None:
+                # Closing drops the connection, the rest of the page is not downloaded
+                resp.close()
+                self.stopped_downloads += 1
+                break
+        self.read_bytes += extractor.parsed_bytes
+        return extractor.close(), extractor.abstract
+
+    async def _fetch(self, url: str) -> Tuple[str, lxml.html.HtmlElement, Optional[str]]:
+        """Returns the final url (after HTTP redirects), the parsed page and the abstract if it could be confirmed
+            while reading (the page is only parsed up to the abstract then).
+        """
+        self.fetched_pages += 1
+        for _ in range(self.max_http_redirects + 1):
+            async with self.scheduler.request_slot(url):
+                async with self._session.get(url, allow_redirects=False) as resp:
+                    location = resp.headers.get("Location")
+                    if resp.status in (301, 302, 303, 307, 308) and location is not None:
+                        url = str(resp.url.join(URL(location)))
+                        continue
+                    if resp.status in (403, 429, 503) and \
+                            "cloudflare" in resp.headers.get("Server", "").lower():
+                        raise CloudflareChallengeError(url)
+                    return (url, *await self._read_page(resp, url))
+        raise aiohttp.TooManyRedirects(resp.request_info, resp.history)
+
+    async def _scrape(self, doi: str) -> Tuple[Optional[str], Optional[str]]:
+        url, tree, abstract = await self._fetch(self.doi_resolver + doi)
+        self.scheduler.record_landing(doi, url)
+
+        cleaned_link = springer_article_url(url)
+        if cleaned_link is not None:
+            url, tree, abstract = await self._fetch(cleaned_link)
+
+        followed_redirects = 0
+        while abstract is None and page_text_length(tree) < min_page_text_length:
+            redirect_url = find_redirect_url(tree)
+            if followed_redirects >= self.max_redirect_pages or redirect_url is None:
+                return None, url
+            followed_redirects += 1
+            url, tree, abstract = await self._fetch(redirect_url)
+
+        if abstract is not None:
+            return abstract, url
+        return self.extractors.extract(tree, url), url
+
+    async def get_abstract(self, doi: str) -> Optional[str]:
+        """Scrapes the abstract of a DOI.
+
+        Args:
+            doi (str): The DOI to scrape.
+
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: If a page cannot be fetched.
+
+        Returns:
+            str: The abstract or None if nothing was found.
+        """
+        if self.cache is not None:
+            entry = self.cache.get_entry(doi)
+            if entry is not None:
+                self.cache_hits += 1
+                return entry["abstract"]
+            landing_url = self.cache.get_landing_url(doi)
+            if landing_url is not None and self.scheduler.predict_domain(doi) is None:
+                # Schedule the DOI by the publisher it resolved to last time
+                self.scheduler.record_landing(doi, landing_url)
+
+        async with self.scheduler.doi_slot(doi):
+            self.scraped_dois += 1
+            try:
+                abstract, landing_url = await self._scrape(doi)
+            except CloudflareChallengeError as e:
+                abstract, landing_url = None, str(e)
+                if self.challenge_fallback:
+                    self.challenge_fallbacks += 1
+                    abstract, landing_url = await asyncio.get_running_loop().run_in_executor(
+                        None, scrape_abstract_from_doi, doi, self.extractors)
+        if self.cache is not None:
+            self.cache.record(doi, abstract, landing_url)
+        return abstract
+
+
+async def async_get_abstract_from_doi(doi: str,
+                                      scraper: Optional[AbstractScraper] = None,
+                                      cache: Optional[AbstractCache] = None) -> str:
     """An asynchronous version of get_abstract_from_doi. This function uses webscraping to obtain the abstract to a given doi.
 
     Args:
         doi (str): The doi for which we want to scrape the web.
+        scraper (AbstractScraper, optional): An (entered) scraper to share connections with other scrapes; its
+            cache is used. If None, a scraper is created for this DOI only. Defaults to None.
+        cache (AbstractCache, optional): The cache of the scraper created if scraper is None. Defaults to None.
 
     Returns:
         str: The scraped abstract.
-    """    
-    await asyncio.sleep(0.3)
-    fut = asyncio.get_running_loop().run_in_executor(None, get_abstract_from_doi, doi)
-    return await fut
+    """
+    if scraper is None:
+        async with AbstractScraper(cache=cache) as scraper:
+            return await scraper.get_abstract(doi)
+    return await scraper.get_abstract(doi)
 
 
-def update_dict_w_abstract(row):
+def update_dict_w_abstract(row, cache: Optional[AbstractCache] = None):
     """If passed a dictionary containing a DOI, it will try to scrape an abstract from the web and store it under the key "abstract". 
 
     Args:
         row (dict): A dictionary containing at least a doi field. 
+        cache (AbstractCache, optional): If given, consulted before and updated after scraping. Defaults to None.
 
     Returns:
         dict: A dict with an updated abstract field.
     """
     try:
-        row["abstract"] = get_abstract_from_doi(row["doi"]).strip()
+        row["abstract"] = get_abstract_from_doi(row["doi"], cache=cache).strip()
     except Exception as e:
         row["abstract"] = None
     return row
 
 
 def query_abstract_from_dois_with_delay(
-        data: pd.DataFrame, delay, start=0, end=0
+        data: pd.DataFrame, delay, start=0, end=0, cache: Optional[AbstractCache] = None
 ):
     """Queries abstract using the doi fields in the Dataframe data. Returns a new Dataframe with scraped abstracts. After every query, it will pause for delay seconds to prevent being blocked.
 
@@ -135,10 +347,15 @@ def query_abstract_from_dois_with_delay(
         delay (float): The time to wait after each query.
         start (int, optional): After which row (position) to start querying. Defaults to 0.
         end (int, optional): At which row (position) to end querying. Defaults to 0.
+        cache (AbstractCache, optional): The (entered) cache of scrape outcomes, DOIs found in it are neither
+            scraped nor delayed. Defaults to the persistent AbstractCache.
 
     Returns:
         (pd.DataFrame): Returns a new Dataframe containing an additional row "abstracts".
     """
+    if cache is None:
+        with AbstractCache() as cache:
+            return query_abstract_from_dois_with_delay(data, delay, start, end, cache)
     start = start
     end = len(data) if end == 0 else end
     acc = []
@@ -147,13 +364,18 @@ def query_abstract_from_dois_with_delay(
             continue
         if ind > end:
             break
+        entry = cache.get_entry(row["doi"])
+        if entry is not None:
+            row["abstract"] = entry["abstract"]
+            acc.append(row)
+            continue
         time.sleep(random.uniform(delay - 0.25, delay + 0.25))
-        acc.append(update_dict_w_abstract(row))
+        acc.append(update_dict_w_abstract(row, cache))
     return pd.DataFrame(acc)
 
 
 def query_abstract_from_dois_using_multithreading(
-        data: pd.DataFrame, start=0, end=0
+        data: pd.DataFrame, start=0, end=0, cache: Optional[AbstractCache] = None
 ):
     """Queries abstract using the doi fields in the Dataframe data. Returns a new Dataframe with scraped abstracts. It uses multithreading for fast results; this may lead to IP blocks, so take care when using it.
 
@@ -161,10 +383,15 @@ def query_abstract_from_dois_using_multithreading(
         data (pd.DataFrame): A Dataframe having at least a column containing DOIs.
         start (int, optional): After which row (position) to start querying. Defaults to 0.
         end (int, optional): At which row (position) to end querying. Defaults to 0.
+        cache (AbstractCache, optional): The (entered) cache of scrape outcomes, DOIs found in it are not scraped.
+            Defaults to the persistent AbstractCache.
 
     Returns:
         (pd.DataFrame): Returns a new Dataframe containing an additional row "abstracts".
     """
+    if cache is None:
+        with AbstractCache() as cache:
+            return query_abstract_from_dois_using_multithreading(data, start, end, cache)
     start = start
     end = len(data) if end == 0 else end
     scrape = []
@@ -176,7 +403,7 @@ def query_abstract_from_dois_using_multithreading(
                 continue
             if ind > end:
                 break
-            accF.append(executor.submit(update_dict_w_abstract, row))
+            accF.append(executor.submit(update_dict_w_abstract, row, cache))
 
         for future in as_completed(accF):
             try:
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from .repositories import DataNotFoundError, RateLimitedError, \
+    RepositoryHTTPError
+
+logger = logging.getLogger(__name__)
+
+
+def is_congestion_signal(error: Optional[Exception]) -> bool:
+    """Returns whether error indicates that the upstream is overloaded (429, 503 or a timeout)."""
+    if isinstance(error, RateLimitedError):
+        return True
+    if isinstance(error, RepositoryHTTPError):
+        return error.status == 503
+    return isinstance(error, asyncio.TimeoutError)
+
+
+class AdaptiveConcurrencyController:
+    """Adapts the number of concurrent connections to a repository with additive increase / multiplicative
+        decrease (AIMD), using latency inflation in the style of TCP Vegas as an additional congestion signal.
+
+    The controller keeps a baseline (the lowest smoothed latency seen so far, slowly decaying upwards) and a
+    short-term exponentially weighted latency. While calls succeed and the short-term latency stays below
+    latency_tolerance times the baseline, the limit grows by additive_increase per limit successful calls
+    (i.e. roughly once per "round trip" of the whole window). A 429, 503, timeout or inflated latency cuts the
+    limit by multiplicative_decrease, at most once per window, so that a burst of failures caused by a single
+    overload only counts once.
+    """
+
+    def __init__(self,
+                 repo_identifier: str,
+                 initial_limit: int,
+                 min_limit: int = 1,
+                 max_limit: int = 50,
+                 additive_increase: float = 1.0,
+                 multiplicative_decrease: float = 0.5,
+                 latency_tolerance: float = 2.0,
+                 smoothing: float = 0.2,
+                 on_limit_change: Callable[[int], None] = None):
+        """
+        Args:
+            repo_identifier (str): The repository this controller belongs to (used for logging).
+            initial_limit (int): The concurrency limit to start with.
+            min_limit (int, optional): The floor of the limit. Defaults to 1.
+            max_limit (int, optional): The ceiling of the limit. Defaults to 50.
+            additive_increase (float, optional): The increase per window of successful calls. Defaults to 1.0.
+            multiplicative_decrease (float, optional): The factor applied on congestion. Defaults to 0.5.
+            latency_tolerance (float, optional): Latency above tolerance * baseline counts as congestion. Defaults to 2.0.
+            smoothing (float, optional): The weight of a new sample in the smoothed latency. Defaults to 0.2.
+            on_limit_change (Callable[[int], None], optional): Called with the new limit whenever it changes. Defaults to None.
+        """
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= max_limit")
+        self.repo_identifier = repo_identifier
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._on_limit_change = on_limit_change
+
+        self._limit = float(min(max_limit, max(min_limit, initial_limit)))
+        self._smoothed_latency = None
+        self._baseline_latency = None
+        self._calls_since_decrease = self.limit
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def baseline_latency(self) -> Optional[float]:
+        return self._baseline_latency
+
+    @property
+    def smoothed_latency(self) -> Optional[float]:
+        return self._smoothed_latency
+
+    def _update_latency(self, latency):
+        if self._smoothed_latency is None:
+            self._smoothed_latency = latency
+        else:
+            self._smoothed_latency += self.smoothing * (latency - self._smoothed_latency)
+
+        if self._baseline_latency is None \
+                or self._smoothed_latency < self._baseline_latency:
+            self._baseline_latency = self._smoothed_latency
+        else:
+            # Let the baseline follow a permanently slower upstream eventually
+            self._baseline_latency *= 1.001
+
+    def record(self, latency: float, error: Exception = None):
+        """Records the outcome of a single call and adapts the limit.
+
+        Args:
+            latency (float): The duration of the call in seconds.
+            error (Exception, optional): The exception raised by the call. Defaults to None.
+        """
+        self._calls_since_decrease += 1
+        if is_congestion_signal(error):
+            self._decrease(type(error).__name__)
+            return
+
+        self._update_latency(latency)
+        if self._smoothed_latency > self.latency_tolerance * self._baseline_latency:
+            self._decrease(f"latency {self._smoothed_latency:.2f}s > "
+                           f"{self.latency_tolerance} x {self._baseline_latency:.2f}s")
+        elif error is None or isinstance(error, DataNotFoundError):
+            # Other errors (e.g. malformed data) neither grow nor shrink the limit
+            self._set_limit(self._limit + self.additive_increase / self._limit,
+                            "healthy")
+
+    def _decrease(self, reason):
+        if self._calls_since_decrease < self.limit:
+            return
+        self._calls_since_decrease = 0
+        self._set_limit(self._limit * self.multiplicative_decrease, reason)
+
+    def _set_limit(self, new_limit, reason):
+        old_limit = self.limit
+        self._limit = min(float(self.max_limit), max(float(self.min_limit), new_limit))
+        if self.limit != old_limit:
+            logger.info("%s concurrency %d -> %d (%s)", self.repo_identifier,
+                        old_limit, self.limit, reason)
+            if self._on_limit_change is not None:
+                self._on_limit_change(self.limit)
@@ -1,42 +1,139 @@
 import asyncio
-import functools
-from queue import Queue
-from typing import List
+import collections
+import threading
+from queue import Empty, Full
+from typing import List, Iterable, Optional
+
 
 class AsyncMTQueue:
-    """An implementation of a synchronous queue that provides both interfaces for asyncio and blocking get/puts.
-       It does that by wrapping all blocking calls with an executor.
-       
-       All functions do the same thing as the queue in the standard library.
-    """    
+    """A threadsafe queue that provides both interfaces for asyncio and blocking get/puts.
+
+       Blocking threads wait on conditions guarded by an internal mutex. Coroutines wait on futures of their
+       own event loop; producers and consumers in other threads wake them via call_soon_threadsafe, so
+       async_get and async_put never occupy an executor thread.
+
+       All functions do the same thing as the queue in the standard library, except that get_nowait returns
+       None instead of raising when the queue is empty.
+    """
+
     def __init__(self, max_size=0):
-        self._queue = Queue(maxsize=max_size)
+        self._max_size = max_size
+        self._items = collections.deque()
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+        self._async_getters = collections.deque()
+        self._async_putters = collections.deque()
 
-    async def async_get(self):
-        return await asyncio.get_running_loop().run_in_executor(None,
-                                                                self.get_blocking)
+    # Internal helpers -- must be called while holding the mutex
+    ############################################
 
-    def get_blocking(self, timeout=None):
-        return self._queue.get(block=True, timeout=timeout)
+    def _full(self):
+        return 0 < self._max_size <= len(self._items)
 
-    def put(self, val, block=True):
-        self._queue.put(val, block=block)
+    @staticmethod
+    def _wake_first(waiters: collections.deque):
+        while len(waiters) > 0:
+            loop, fut = waiters.popleft()
+            if fut.done():
+                continue
+            try:
+                loop.call_soon_threadsafe(AsyncMTQueue._resolve, fut)
+                return
+            except RuntimeError:  # loop closed, drop the waiter
+                continue
 
-    async def async_put(self, val):
-        func = functools.partial(self.put, val=val, block=True)
-        asyncio.get_running_loop().run_in_executor(None, func)
+    @staticmethod
+    def _resolve(fut):
+        if not fut.done():
+            fut.set_result(None)
 
-    def qsize(self):
-        return self._queue.qsize()
+    def _notify_item_added(self, count=1):
+        for _ in range(count):
+            self._not_empty.notify()
+            self._wake_first(self._async_getters)
 
-    def get_nowait(self):
+    def _notify_item_removed(self, count=1):
+        for _ in range(count):
+            self._not_full.notify()
+            self._wake_first(self._async_putters)
+
+    async def _wait_async(self, waiters: collections.deque, ready):
+        """Waits until ready() holds under the mutex. The mutex is held on return."""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._mutex.acquire()
+            if ready():
+                return
+            fut = loop.create_future()
+            entry = (loop, fut)
+            waiters.append(entry)
+            self._mutex.release()
+            try:
+                await fut
+            except asyncio.CancelledError:
+                with self._mutex:
+                    if entry in waiters:
+                        waiters.remove(entry)
+                    elif ready():
+                        # We were woken but will not consume, pass it on
+                        self._wake_first(waiters)
+                raise
+
+    # Getters
+    ############################################
+
+    async def async_get(self):
+        await self._wait_async(self._async_getters, lambda: len(self._items) > 0)
         try:
-            return self._queue.get_nowait()
-        except Exception as e:
-            return None
+            item = self._items.popleft()
+            self._notify_item_removed()
+            if len(self._items) > 0:
+                self._wake_first(self._async_getters)
+        finally:
+            self._mutex.release()
+        return item
 
-    def put_nowait(self, val):
-        self._queue.put_nowait(val)
+    async def async_get_many(self, max_items: int) -> List:
+        """Waits until at least one element is available and returns up to max_items elements.
+
+        Args:
+            max_items (int): The maximum number of elements to return.
+
+        Returns:
+            List: Between one and max_items elements in FIFO order.
+        """
+        await self._wait_async(self._async_getters, lambda: len(self._items) > 0)
+        try:
+            items = self._pop_many(max_items)
+            if len(self._items) > 0:
+                self._wake_first(self._async_getters)
+        finally:
+            self._mutex.release()
+        return items
+
+    def _pop_many(self, max_items):
+        count = min(max_items, len(self._items))
+        items = [self._items.popleft() for _ in range(count)]
+        self._notify_item_removed(count)
+        return items
+
+    def get_blocking(self, timeout=None):
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: len(self._items) > 0,
+                                            timeout=timeout):
+                raise Empty
+            item = self._items.popleft()
+            self._notify_item_removed()
+            return item
+
+    def get_nowait(self):
+        with self._mutex:
+            if len(self._items) == 0:
+                return None
+            item = self._items.popleft()
+            self._notify_item_removed()
+            return item
 
     def get(self, block, timeout):
         if block:
@@ -44,17 +141,86 @@ class AsyncMTQueue:
         else:
             return self.get_nowait()
 
+    def get_many(self, max_items: int, block=True, timeout=None) -> List:
+        """Returns up to max_items elements. If block is set, waits until at least one element is available.
+
+        Args:
+            max_items (int): The maximum number of elements to return.
+            block (bool, optional): Whether to wait for the first element. Defaults to True.
+            timeout (float, optional): How long to wait for the first element. Defaults to None.
+
+        Raises:
+            Empty: If blocking and no element arrived before timeout.
+
+        Returns:
+            List: Up to max_items elements in FIFO order.
+        """
+        with self._not_empty:
+            if block and not self._not_empty.wait_for(
+                    lambda: len(self._items) > 0, timeout=timeout):
+                raise Empty
+            return self._pop_many(max_items)
+
     def get_all_available(self) -> List:
         """Helper Method that returns all currently available entries in the internal queue nonblocking.
 
         Returns:
             List: All elements returned from the internal queue.
-        """        
-        ls = []
-        while True:
-            tmp = self.get_nowait()
-            if tmp is not None:
-                ls.append(tmp)
-            else:
-                break
-        return ls
+        """
+        return self.get_many(len(self._items), block=False)
+
+    # Putters
+    ############################################
+
+    def _append(self, vals):
+        self._items.extend(vals)
+        self._notify_item_added(len(vals))
+
+    def put(self, val, block=True, timeout=None):
+        with self._not_full:
+            if self._full():
+                if not block:
+                    raise Full
+                if not self._not_full.wait_for(lambda: not self._full(),
+                                               timeout=timeout):
+                    raise Full
+            self._append([val])
+
+    def put_nowait(self, val):
+        self.put(val, block=False)
+
+    async def async_put(self, val):
+        await self._wait_async(self._async_putters, lambda: not self._full())
+        try:
+            self._append([val])
+            if not self._full():
+                self._wake_first(self._async_putters)
+        finally:
+            self._mutex.release()
+
+    def put_many(self, vals: Iterable, block=True, timeout: Optional[float] = None):
+        """Puts all elements of vals on the queue. On bounded queues the elements are inserted as space frees up,
+            so a batch larger than max_size does not deadlock.
+
+        Args:
+            vals (Iterable): The elements to insert in order.
+            block (bool, optional): Whether to wait for space. Defaults to True.
+            timeout (float, optional): How long to wait for space per element. Defaults to None.
+
+        Raises:
+            Full: If the queue has no space left and we may not (or no longer) wait.
+        """
+        vals = list(vals)
+        with self._not_full:
+            while len(vals) > 0:
+                if self._full():
+                    if not block or not self._not_full.wait_for(
+                            lambda: not self._full(), timeout=timeout):
+                        raise Full
+                space = len(vals) if self._max_size <= 0 \
+                    else self._max_size - len(self._items)
+                self._append(vals[:space])
+                vals = vals[space:]
+
+    def qsize(self):
+        return len(self._items)
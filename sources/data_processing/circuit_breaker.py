@@ -0,0 +1,167 @@
+import collections
+import time
+
+
+class CircuitState:
+    """The states of a CircuitBreaker."""
+    CLOSED = "closed"  # Requests pass, outcomes are recorded
+    OPEN = "open"  # Requests are rejected until open_duration has passed
+    HALF_OPEN = "half_open"  # A limited number of trial requests pass
+
+
+class CircuitBreaker:
+    """A circuit breaker for a single repository, driven by the error rate and the rate of slow calls over a
+        sliding window of the most recent calls.
+
+    If, after at least min_calls calls, either rate reaches its threshold, the circuit opens and all requests
+    are rejected for open_duration seconds. Afterwards it becomes half open and lets half_open_max_calls trial
+    requests through: if all of them succeed the circuit closes again, a single failure reopens it.
+    """
+
+    def __init__(self,
+                 window_size: int = 20,
+                 min_calls: int = 5,
+                 failure_rate_threshold: float = 0.5,
+                 slow_call_duration: float = 10.0,
+                 slow_call_rate_threshold: float = 0.8,
+                 open_duration: float = 30.0,
+                 half_open_max_calls: int = 1,
+                 clock=time.monotonic):
+        """
+        Args:
+            window_size (int, optional): The number of recent calls considered. Defaults to 20.
+            min_calls (int, optional): The number of calls needed before the circuit may open. Defaults to 5.
+            failure_rate_threshold (float, optional): The failure rate that opens the circuit. Defaults to 0.5.
+            slow_call_duration (float, optional): Calls taking longer (in s) count as slow. Defaults to 10.0.
+            slow_call_rate_threshold (float, optional): The slow call rate that opens the circuit. Defaults to 0.8.
+            open_duration (float, optional): How long (in s) the circuit stays open. Defaults to 30.0.
+            half_open_max_calls (int, optional): The number of trial calls when half open. Defaults to 1.
+            clock (Callable[[], float], optional): Monotonic clock. Defaults to time.monotonic.
+        """
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._state = CircuitState.CLOSED
+        self._calls = collections.deque(maxlen=window_size)  # (failed, slow)
+        self._opened_at = None
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self._last_trial_start = None
+
+        self._times_opened = 0
+        self._rejected_calls = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == CircuitState.OPEN \
+                and self._clock() - self._opened_at >= self.open_duration:
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def _transition(self, state):
+        self._state = state
+        if state == CircuitState.OPEN:
+            self._opened_at = self._clock()
+            self._times_opened += 1
+        elif state == CircuitState.CLOSED:
+            self._calls.clear()
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self._last_trial_start = None
+
+    def retry_in(self) -> float:
+        """Returns the number of seconds until the circuit lets requests through again (0 if it does now)."""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self.open_duration - (self._clock() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """Returns whether a request may be sent now. In the half open state this reserves a trial slot, so every
+            allowed request must be followed by a call to record_success or record_failure.
+
+        Returns:
+            bool: True iff the request may be sent.
+        """
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN:
+            now = self._clock()
+            # A trial that never reported back must not block the circuit forever
+            if self._trials_started >= self.half_open_max_calls \
+                    and self._last_trial_start is not None \
+                    and now - self._last_trial_start >= self.open_duration:
+                self._trials_started = self._trials_succeeded
+            if self._trials_started < self.half_open_max_calls:
+                self._trials_started += 1
+                self._last_trial_start = now
+                return True
+        self._rejected_calls += 1
+        return False
+
+    def record_success(self, latency: float):
+        """Records a call that reached the repository and got a valid answer (including "no data").
+
+        Args:
+            latency (float): The duration of the call in seconds.
+        """
+        self._record(False, latency)
+
+    def record_failure(self, latency: float):
+        """Records a call that failed (error status, timeout, connection error, ...).
+
+        Args:
+            latency (float): The duration of the call in seconds.
+        """
+        self._record(True, latency)
+
+    def _record(self, failed: bool, latency: float):
+        slow = latency >= self.slow_call_duration
+        state = self.state
+        if state == CircuitState.HALF_OPEN:
+            if failed or slow:
+                self._transition(CircuitState.OPEN)
+            else:
+                self._trials_succeeded += 1
+                if self._trials_succeeded >= self.half_open_max_calls:
+                    self._transition(CircuitState.CLOSED)
+            return
+        if state == CircuitState.OPEN:
+            return
+
+        self._calls.append((failed, slow))
+        if len(self._calls) >= self.min_calls \
+                and (self.failure_rate >= self.failure_rate_threshold
+                     or self.slow_call_rate >= self.slow_call_rate_threshold):
+            self._transition(CircuitState.OPEN)
+
+    @property
+    def failure_rate(self) -> float:
+        if len(self._calls) == 0:
+            return 0.0
+        return sum(failed for failed, _ in self._calls) / len(self._calls)
+
+    @property
+    def slow_call_rate(self) -> float:
+        if len(self._calls) == 0:
+            return 0.0
+        return sum(slow for _, slow in self._calls) / len(self._calls)
+
+    def metrics(self) -> dict:
+        """Returns the current state and statistics of the breaker.
+
+        Returns:
+            dict: state, failure_rate, slow_call_rate, calls_in_window, times_opened and rejected_calls.
+        """
+        return {"state": self.state,
+                "failure_rate": self.failure_rate,
+                "slow_call_rate": self.slow_call_rate,
+                "calls_in_window": len(self._calls),
+                "times_opened": self._times_opened,
+                "rejected_calls": self._rejected_calls}
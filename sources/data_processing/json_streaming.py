@@ -0,0 +1,206 @@
+import json
+import re
+from typing import AsyncIterable, Iterator, List, Sequence
+
+from .response_decoding import ResponseDecodingError, loads
+
+# The bytes the scanner has to look at, everything else is skipped by the regular expression engine. JSON's
+# structural characters are ASCII, so they never occur inside multi-byte UTF-8 sequences.
+document_pattern = re.compile(rb'[{}\[\]",:]')
+item_pattern = re.compile(rb'[{}\[\]"]')
+string_pattern = re.compile(rb'["\\]')
+item_start_pattern = re.compile(rb"[^\s,]")
+
+
+class JsonArrayStreamParser:
+    """Parses a JSON document incrementally and yields the elements of one array (e.g. ["message"]["items"]
+        of a Crossref response) as soon as they are complete, so that only a single element is decoded at a time.
+
+    Everything outside the array is kept and can be read from document once the input is complete; the array
+        itself is empty there. The elements must be objects or arrays.
+
+    Note:
+        The document is not validated beyond what is needed to find the array, each element and the rest of
+            the document are decoded (and validated) separately.
+    """
+
+    def __init__(self, array_path: Sequence[str]):
+        """
+        Args:
+            array_path (Sequence[str]): The keys leading from the root object to the array.
+        """
+        self.array_path = tuple(array_path)
+        self.document = None
+        self._buffer = bytearray()
+        self._pos = 0
+        self._skeleton = bytearray()
+        # One entry per open container outside the array: [is_object, key, expecting_key]
+        self._containers = []
+        self._in_string = False
+        self._string_start = 0
+        # Inside the array: the depth within the current element or None between elements
+        self._in_array = False
+        self._item_depth = None
+        self._item_start = 0
+        self.parsed_items = 0
+
+    def _current_path(self):
+        return tuple(container[1] for container in self._containers if container[0])
+
+    def feed(self, chunk: bytes) -> List:
+        """Adds the next chunk of the document.
+
+        Args:
+            chunk (bytes): The next bytes of the document.
+
+        Returns:
+            List: The array elements completed by this chunk.
+        """
+        self._buffer.extend(chunk)
+        items = []
+        buffer = self._buffer
+        while True:
+            if self._in_string:
+                match = string_pattern.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    break
+                if match.group() == b"\\":
+                    if match.end() >= len(buffer):
+                        self._pos = match.start()
+                        break
+                    self._pos = match.end() + 1
+                    continue
+                self._pos = match.end()
+                self._in_string = False
+                if not self._in_array:
+                    self._on_string_end()
+            elif self._in_array:
+                if self._item_depth is None:
+                    match = item_start_pattern.search(buffer, self._pos)
+                    if match is None:
+                        self._pos = len(buffer)
+                        break
+                    if match.group() == b"]":
+                        self._in_array = False
+                        self._skeleton.extend(b"[]")
+                        del buffer[:match.end()]
+                        self._pos = 0
+                        continue
+                    self._item_start = match.start()
+                    self._item_depth = 0
+                    self._pos = match.start()
+                match = item_pattern.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    break
+                self._pos = match.end()
+                token = match.group()
+                if token == b'"':
+                    self._in_string = True
+                    continue
+                self._item_depth += 1 if token in (b"{", b"[") else -1
+                if self._item_depth == 0:
+                    items.append(self._decode(buffer[self._item_start:self._pos]))
+                    self._item_depth = None
+                    self._compact()
+            else:
+                match = document_pattern.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    break
+                self._pos = match.end()
+                self._on_document_token(match.group(), match.start())
+                if self._in_array:
+                    self._compact()
+        if not self._in_string and self._item_depth is None and not self._in_array:
+            self._compact()
+        self.parsed_items += len(items)
+        return items
+
+    def _on_document_token(self, token: bytes, start: int):
+        if token == b'"':
+            self._in_string = True
+            self._string_start = start
+        elif token == b"{":
+            self._containers.append([True, None, True])
+        elif token == b"[":
+            path = self._current_path()
+            if path == self.array_path and len(self._containers) == len(path):
+                # Keep "[" out of the skeleton, the array is added as [] once it is complete
+                self._skeleton.extend(self._buffer[:start])
+                del self._buffer[:self._pos]
+                self._pos = 0
+                self._in_array = True
+                self._item_depth = None
+                return
+            self._containers.append([False, None, False])
+        elif token in (b"}", b"]"):
+            if len(self._containers) > 0:
+                self._containers.pop()
+        elif token == b",":
+            if len(self._containers) > 0 and self._containers[-1][0]:
+                self._containers[-1][2] = True
+        elif token == b":":
+            if len(self._containers) > 0:
+                self._containers[-1][2] = False
+
+    def _on_string_end(self):
+        if len(self._containers) > 0 and self._containers[-1][0] \
+                and self._containers[-1][2]:
+            raw_key = bytes(self._buffer[self._string_start:self._pos])
+            self._containers[-1][1] = json.loads(raw_key.decode("utf-8"))
+
+    def _compact(self):
+        # Move what has been scanned out of the buffer: into the skeleton outside the array, dropped inside it
+        if self._in_array:
+            if self._item_depth is None:
+                del self._buffer[:self._pos]
+                self._pos = 0
+            return
+        keep_from = self._string_start if self._in_string else self._pos
+        self._skeleton.extend(self._buffer[:keep_from])
+        del self._buffer[:keep_from]
+        self._pos -= keep_from
+        self._string_start = 0
+
+    @staticmethod
+    def _decode(raw: bytes):
+        try:
+            return loads(raw)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ResponseDecodingError(f"Malformed JSON array element: {e}") from e
+
+    def close(self):
+        """Ends the input and decodes everything outside the array.
+
+        Raises:
+            ResponseDecodingError: If the document is incomplete or malformed.
+
+        Returns:
+            The document with an empty array.
+        """
+        if self._in_array or self._in_string or len(self._containers) > 0:
+            raise ResponseDecodingError("Incomplete JSON document")
+        self._skeleton.extend(self._buffer)
+        self._buffer = bytearray()
+        try:
+            self.document = loads(bytes(self._skeleton))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ResponseDecodingError(f"Malformed JSON document: {e}") from e
+        return self.document
+
+    def iter_items(self, chunks) -> Iterator:
+        """Yields the array elements of a document given as an iterable of byte chunks, then closes the parser."""
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        self.close()
+
+    async def async_iter_items(self, chunks: AsyncIterable[bytes]):
+        """Yields the array elements of a document given as an async iterable of byte chunks (e.g.
+            resp.content.iter_chunked(n)), then closes the parser.
+        """
+        async for chunk in chunks:
+            for item in self.feed(chunk):
+                yield item
+        self.close()
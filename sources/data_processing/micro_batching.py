@@ -0,0 +1,92 @@
+import asyncio
+from typing import Awaitable, Callable, List
+
+
+class MicroBatcher:
+    """Collects items submitted concurrently and processes them together: a batch is flushed once it holds
+        max_batch_size items or max_delay seconds after its first item arrived, whichever comes first.
+
+    Each submitter awaits the result for its own item. If processing a batch raises, all of its submitters
+        receive the exception.
+
+    Note:
+        Must be used from within a running event loop.
+    """
+
+    def __init__(self,
+                 process_batch: Callable[[List], Awaitable[List]],
+                 max_batch_size: int,
+                 max_delay: float):
+        """
+        Args:
+            process_batch (Callable[[List], Awaitable[List]]): Processes a batch and returns one result per item,
+                in the order of the items.
+            max_batch_size (int): The maximum number of items per batch.
+            max_delay (float): The maximum time (in s) an item waits for its batch to fill up.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._items = []
+        self._futures = []
+        self._timer = None
+        self._running_batches = set()
+        self.flushed_batches = 0
+        self.processed_items = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    async def submit(self, item):
+        """Adds item to the current batch and waits for its result.
+
+        Args:
+            item: The item to process.
+
+        Returns:
+            The result process_batch returned for item.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self):
+        """Starts processing the current batch right away."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if len(self._items) == 0:
+            return
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        self.flushed_batches += 1
+        self.processed_items += len(items)
+        task = asyncio.get_running_loop().create_task(self._run(items, futures))
+        self._running_batches.add(task)
+        task.add_done_callback(self._running_batches.discard)
+
+    async def _run(self, items, futures):
+        try:
+            results = await self._process_batch(items)
+        except BaseException as e:
+            for future in futures:
+                if not future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for future, result in zip(futures, results):
+            # Submitters may have been cancelled in the meantime
+            if not future.done():
+                future.set_result(result)
@@ -1,9 +1,12 @@
+import collections
 import typing
+from queue import Full
 from typing import Optional, List
 from threading import Thread
 
 from sources.data_processing.async_mt_queue import AsyncMTQueue
-from sources.data_processing.queries import AbstractQuery, Response
+from sources.data_processing.queries import AbstractQuery, Response, \
+    JournalDaterangeResponse
 from sources.data_processing.query_delegator import run_delegator, \
     TerminationFlag
 
@@ -19,30 +22,81 @@ class PaperScraper:
        AbstractQuery from queries.py.
     
     The PaperScraper keeps track of all delegated queries via their ids and the outgoing responses. 
-       If all queries have been handled the processed_all_queries attribute will become True.
+       If all queries have been handled the processed_all_queries attribute will become True. A query
+       answered page by page (see JournalDaterangeResponse) counts as handled once its final page arrived.
+
+    Both queues are bounded, so a producer that delegates faster than the repositories answer is slowed down
+       (delegate_query blocks) instead of buffering the whole sync in memory. While delegate_query waits for
+       space it keeps draining the response queue into a local buffer, otherwise the delegator (blocked on a
+       full response queue) and the caller (blocked on a full delegation queue) could wait for each other forever.
+       That buffer holds about max_buffered_articles articles (a page of a JournalDaterangeResponse counts with
+       all its articles): once it is full delegate_query raises queue.Full instead of growing the buffer, the
+       caller has to poll responses before it delegates the query again.
     
     Note:
         Must be used in combination with the context pattern.
     """
 
+    # Capacities of the delegation and the response queue
+    delegation_queue_size = 1000
+    response_queue_size = 1000
+    # How long (in s) delegate_query waits for space before draining the response queue again
+    backpressure_poll_interval = 0.05
+    # The number of articles delegate_query buffers at most (plus one response) while it waits for space
+    max_buffered_articles = 10000
+
     def __init__(self):
         self._processed_all_queries = True
         self._all_query_ids = set()
 
         self._delegation_queue: Optional[AsyncMTQueue] = None
         self._response_queue: Optional[AsyncMTQueue] = None
+        # Responses drained from the response queue while delegate_query was waiting for space
+        self._buffered_responses = collections.deque()
+        self._buffered_articles = 0
         self._thread = None  # Use with instead
 
     def delegate_query(self, query: AbstractQuery):
-        """Delegates a  query to be handled by the Paperscraper.
+        """Delegates a  query to be handled by the Paperscraper. Blocks while the delegation queue is full.
 
         Args:
             query (AbstractQuery): The query to delegate.
+
+        Raises:
+            Full: If the delegation queue stays full and max_buffered_articles articles are buffered. The query
+                has not been delegated; responses must be polled before delegating it again.
         """        
         # potential race, but not a  problem here
         self._processed_all_queries = False
         self._all_query_ids.add(query.query_id)
-        self._delegation_queue.put(query)
+        try:
+            self._put_with_backpressure(query, self.max_buffered_articles)
+        except Full:
+            self._all_query_ids.discard(query.query_id)
+            raise
+
+    @staticmethod
+    def _num_articles(response: Response) -> int:
+        if isinstance(response, JournalDaterangeResponse):
+            return len(response.all_articles)
+        return 1
+
+    def _put_with_backpressure(self, item, max_buffered_articles: Optional[int] = None):
+        while True:
+            try:
+                self._delegation_queue.put(item, timeout=self.backpressure_poll_interval)
+                return
+            except Full:
+                # Make room for the delegator, so that it can get to our queries
+                if max_buffered_articles is not None and self._buffered_articles >= max_buffered_articles \
+                        and self._response_queue.qsize() > 0:
+                    raise Full(f"{self._buffered_articles} articles have not been polled")
+                while max_buffered_articles is None or self._buffered_articles < max_buffered_articles:
+                    responses = self._response_queue.get_many(1, block=False)
+                    if len(responses) == 0:
+                        break
+                    self._buffered_responses.append(responses[0])
+                    self._buffered_articles += self._num_articles(responses[0])
 
     def poll_all_available_responses(self) -> typing.List[Response]:
         """Returns all currently available (nonblockingly) responses on the response queue.
@@ -50,9 +104,13 @@ class PaperScraper:
         Returns:
             typing.List[Response]: All available responses.
         """        
-        responses = self._response_queue.get_all_available()
+        responses = list(self._buffered_responses)
+        self._buffered_responses.clear()
+        self._buffered_articles = 0
+        responses.extend(self._response_queue.get_all_available())
         self._all_query_ids = self._all_query_ids - \
-                              {response.query_id for response in responses}
+                              {response.query_id for response in responses
+                               if response.final}
         return responses
 
     def poll_response(self, blocking=True, timeout=None) -> Response:
@@ -68,13 +126,18 @@ class PaperScraper:
         Returns:
             Response: Returns a response object once it is available
         """        
-        response: Response = self._response_queue.get(block=blocking, timeout=timeout)
-        self._all_query_ids.remove(response.query_id)
+        if len(self._buffered_responses) > 0:
+            response: Response = self._buffered_responses.popleft()
+            self._buffered_articles -= self._num_articles(response)
+        else:
+            response: Response = self._response_queue.get(block=blocking, timeout=timeout)
+        if response.final:
+            self._all_query_ids.remove(response.query_id)
         return response
 
     def initialise(self):
-        self._delegation_queue: AsyncMTQueue = AsyncMTQueue()
-        self._response_queue: AsyncMTQueue = AsyncMTQueue()
+        self._delegation_queue: AsyncMTQueue = AsyncMTQueue(self.delegation_queue_size)
+        self._response_queue: AsyncMTQueue = AsyncMTQueue(self.response_queue_size)
         self._thread = Thread(target=run_delegator,
                               args=(self._delegation_queue,
                                     self._response_queue),
@@ -84,6 +147,9 @@ class PaperScraper:
     def delegation_qsize(self):
         return self._delegation_queue.qsize()
 
+    def buffered_qsize(self):
+        return len(self._buffered_responses)
+
     @property
     def processed_all_queries(self):
         """Returns true iff all delegated queries have returned a response object that has been processed.
@@ -97,7 +163,8 @@ class PaperScraper:
         return self._processed_all_queries
 
     def terminate(self):
-        self._delegation_queue.put(TerminationFlag())
+        # The responses to the queries still in the pipeline are buffered without limit, terminate must not fail
+        self._put_with_backpressure(TerminationFlag())
         self._thread.join()
 
     def __enter__(self):
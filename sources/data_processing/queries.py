@@ -59,6 +59,9 @@ class Response:
 
     It contains all information we obtained from a article based query."""
 
+    # Whether this is the last response to its query
+    final = True
+
     def __init__(self, query_id: int, metadata: Optional[ArticleMetadata]):
         self.query_id = query_id
         self.metadata = metadata
@@ -88,12 +91,21 @@ class FailedQueryResponse(Response):
 
 
 class JournalDaterangeResponse(Response):
-    """Class encapsulating a response from a ISSNDaterangeQuery."""
+    """Class encapsulating a response from a ISSNDaterangeQuery.
+
+    Intervals with many articles are delivered page by page. All pages but the last one carry the cursor of
+       the next page and are partial (final is False).
+    """
     
-    def __init__(self, query_id: int, all_articles: list):
+    def __init__(self, query_id: int, all_articles: list, next_cursor: Optional[str] = None):
         super().__init__(query_id, None)
         self.query_id = query_id
         self.all_articles = all_articles
+        self.next_cursor = next_cursor
+
+    @property
+    def final(self):
+        return self.next_cursor is None
 
 
 # Interface Definition
@@ -109,6 +121,8 @@ class AbstractQuery(metaclass=abc.ABCMeta):
         self._query_id = query_id
         self._queried_repositories = set()
         self._journal_data = None
+        self._retry_count = 0
+        self._sync_id = None
 
     @property
     def query_id(self):
@@ -120,12 +134,32 @@ class AbstractQuery(metaclass=abc.ABCMeta):
     def get_scheduling_information(self):
         return self._queried_repositories
 
+    @property
+    def retry_count(self):
+        return self._retry_count
+
+    def register_retry(self, repo_identifier=None):
+        """Counts a delayed retry and, if given, marks repo_identifier as queryable again.
+        """
+        self._retry_count += 1
+        if repo_identifier is not None:
+            self._queried_repositories.discard(repo_identifier)
+
     def add_journal_data(self, journal_data):
         self._journal_data = journal_data
 
     def get_journal_data(self):
         return self._journal_data
 
+    @property
+    def sync_id(self):
+        return self._sync_id
+
+    def set_sync_id(self, sync_id):
+        """Tags the query with the synchronisation job it belongs to (used for fair scheduling).
+        """
+        self._sync_id = sync_id
+
 
 # Scheduling Information contains data about tried APIs and more?
 # It must at least contain key "tried_connections"
@@ -156,6 +190,15 @@ class ISSNTimeIntervalQuery(AbstractQuery):
         self.start_interval_date = start_interval_date
         self.end_interval_date = end_interval_date
         self.issn = issn
+        self.cursor = "*"
+
+    def advance_to_page(self, cursor: str):
+        """Moves the query on to the page identified by cursor. Fetching the next page is a new request, so
+            the scheduling information and the retry count are reset.
+        """
+        self.cursor = cursor
+        self._queried_repositories = set()
+        self._retry_count = 0
 
 
 class KeywordQuery(AbstractQuery):
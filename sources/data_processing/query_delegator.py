@@ -1,16 +1,30 @@
 import asyncio
-from collections import defaultdict
-from threading import Timer
+import time
+from typing import List, Optional
 
 import aiohttp
 
 from sources.data_processing.async_mt_queue import AsyncMTQueue
 from sources.data_processing.queries import AbstractQuery, FailedQueryResponse, \
     DoiQuery, KeywordQuery
+from sources.databases.abstract_cache_db import AbstractCache
+from sources.databases.http_response_cache_db import HTTPResponseCache
+from sources.databases.repository_rate_limit_db import RepositoryRateLimits
+from sources.databases.repository_routing_db import RepositoryRoutingStatistics
 from . import queries
-from .abstract_webscraping import async_get_abstract_from_doi
-from .repositories import AbstractRepository, DataNotFoundError, \
-    OpenAireRepository, CrossrefRepository, CoreRepository
+from .abstract_webscraping import AbstractScraper, async_get_abstract_from_doi
+from .adaptive_concurrency import AdaptiveConcurrencyController
+from .circuit_breaker import CircuitBreaker, CircuitState
+from .micro_batching import MicroBatcher
+from .rate_limiting import RepositoryRateLimiter
+from .query_scheduling import FairPriorityScheduler
+from .request_coalescing import QueryCoalescer, SingleFlight, normalise_doi
+from .response_caching import CachingSession
+from .request_hedging import HedgingPolicy, LatencyWindow, RepositoryCall, \
+    race_with_hedge
+from .retry_scheduling import RetryClassifier, RetryDecision, RetryScheduler
+from .repositories import AbstractRepository, DataNotFoundError
+from .repository_registry import RepositoryRegistry, default_registry
 
 
 def valid(field:str):
@@ -41,6 +55,16 @@ class AllRepositoriesTriedError(Exception):
     pass
 
 
+class AllCircuitsOpenError(Exception):
+    """Exception that will be raised if all untried repositories for a given query have an open circuit breaker.
+        retry_in holds the number of seconds until the first of them lets requests through again.
+    """
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"All remaining repositories are unavailable for {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
 def run_delegator(query_delegation_queue: AsyncMTQueue,
                   response_queue: AsyncMTQueue):
     """The interface to the QueryDelegator. It should called in a new background thread that is running the delegator.
@@ -60,39 +84,6 @@ def run_delegator(query_delegation_queue: AsyncMTQueue,
         pass
 
 
-class QueryCounter:
-    """Query Counter is a simple Utility tool that keeps track of the number
-    of active requests outgoing on different repositories.
-    """
-    repo_intervals = defaultdict(lambda: 1)  # WRONG
-
-    def __init__(self):
-        self._active_concurrent_requests = defaultdict(lambda: 0)
-        self._requests_in_last_time_interval = defaultdict(lambda: 0)
-
-    def register_new_request(self, repo_identifier):
-        self._active_concurrent_requests[repo_identifier] = \
-            1 + self._active_concurrent_requests.get(repo_identifier, 0)
-        self._requests_in_last_time_interval[repo_identifier] = \
-            1 + self._requests_in_last_time_interval.get(repo_identifier, 0)
-
-        t = Timer(QueryCounter.repo_intervals[repo_identifier],
-                  self.reduce_requests_in_last_interval, args=[repo_identifier])
-        t.start()
-
-    def request_completed(self, repo_identifier):
-        self._active_concurrent_requests[repo_identifier] -= 1
-
-    def reduce_requests_in_last_interval(self, repo_identifier: str):
-        self._requests_in_last_time_interval[repo_identifier] -= 1
-
-    def get_open_connections_for_repo(self, repo_identifier):
-        return self._active_concurrent_requests[repo_identifier]
-
-    def get_num_request_last_interval(self, repo_identifier):
-        return self._requests_in_last_time_interval[repo_identifier]
-
-
 class QueryDelegator:
     """The QueryDelegator takes queries by waiting on the _query_delegation_queue and executes them by delegating them to appropriate repositories.
         Once a request has been processed, it will be pushed to the _response_queue from which it can be popped.
@@ -101,64 +92,335 @@ class QueryDelegator:
 
     def __init__(self,
                  query_delegation_queue: AsyncMTQueue,
-                 response_queue: AsyncMTQueue):
+                 response_queue: AsyncMTQueue,
+                 routing_statistics: Optional[RepositoryRoutingStatistics] = None,
+                 response_cache: Optional[HTTPResponseCache] = None,
+                 rate_limits: Optional[RepositoryRateLimits] = None,
+                 registry: Optional[RepositoryRegistry] = None,
+                 abstract_cache: Optional[AbstractCache] = None):
         self._query_delegation_queue = query_delegation_queue
         self._response_queue = response_queue
-        self._query_counter = QueryCounter()
-        self._terminated = False
+        self._registry = default_registry if registry is None else registry
+        self._routing_statistics = RepositoryRoutingStatistics() \
+            if routing_statistics is None else routing_statistics
+        self._response_cache = HTTPResponseCache(
+            ttl_by_host=self._registry.cache_ttl_by_host()) \
+            if response_cache is None else response_cache
+        self._rate_limits = RepositoryRateLimits() \
+            if rate_limits is None else rate_limits
+        self._abstract_cache = AbstractCache() \
+            if abstract_cache is None else abstract_cache
+        self._rate_limiters = {}
+        self._circuit_breakers = {}
+        self._concurrency_controllers = {}
+        self._latency_windows = {}
+        self._doi_batchers = {}
+        self._hedged_requests = 0
+        self._hedges_won = 0
+        self._query_coalescer = QueryCoalescer()
+        self._abstract_scrapes = SingleFlight()
+        self._abstract_scraper: Optional[AbstractScraper] = None
+        self._retry_classifier = RetryClassifier()
+        self._retry_scheduler = RetryScheduler(self.submit_query)
+        self._scheduler = FairPriorityScheduler()
+        self._running_tasks = set()
+        self._scrape_tasks = set()
+        self._scrape_slots: Optional[asyncio.Semaphore] = None
+        self._termination_flag = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._intake_space: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def get_routing_keys(query: AbstractQuery) -> List[str]:
+        """Returns the keys (ISSN and DOI prefix) under which routing statistics of a query are stored.
 
-    def generate_journal_repo_preferences(self):
-        pass
+        Args:
+            query (AbstractQuery): A DoiQuery or KeywordQuery.
 
-    repo_identifier_repo_map = {"openaire": OpenAireRepository,
-                                "crossref": CrossrefRepository,
-                                "CORE": CoreRepository}
+        Returns:
+            List[str]: The routing keys, the most specific first.
+        """
+        journal_data = query.get_journal_data()
+        issn = journal_data.issn if journal_data is not None else None
+        if isinstance(query, DoiQuery):
+            doi = query.doi_to_query
+        elif isinstance(query, KeywordQuery):
+            doi = query.doi
+        else:
+            doi = None
+        return RepositoryRoutingStatistics.keys_for(issn, doi)
 
-    repo_identifier_max_conn = {"openaire": 15,
-                                "crossref": 12,
-                                "CORE": 15}
+    def generate_journal_repo_preferences(self, query: AbstractQuery, rep_pref: List[str]) -> List[str]:
+        """Reorders the static repository preferences of a query by what we learned about its journal
+            (or publisher): repositories that usually return abstracts quickly for it are tried first.
 
-    query_repository_preferences = \
-        {"KeywordQuery": ["openaire", "CORE", "crossref"],
-         "DOIQuery": ["openaire", "CORE"],
-         "JournalTimeIntervalQuery": ["crossref"]}
+        Args:
+            query (AbstractQuery): A DoiQuery or KeywordQuery.
+            rep_pref (List[str]): The static repository preferences of the query type.
+
+        Returns:
+            List[str]: The repository identifiers in the order they should be tried.
+        """
+        return self._routing_statistics.rank_repositories(
+            self.get_routing_keys(query), rep_pref)
+
+    def record_routing_outcome(self, query: AbstractQuery, repo_identifier, latency: float, success: bool):
+        """Stores whether repo_identifier returned a usable abstract for query and how long it took.
+
+        Args:
+            query (AbstractQuery): A DoiQuery or KeywordQuery.
+            repo_identifier (str): The repository that answered.
+            latency (float): The duration of the call in seconds.
+            success (bool): Whether the answer contained an abstract.
+        """
+        self._routing_statistics.record(self.get_routing_keys(query),
+                                        repo_identifier, success, latency)
+
+    # Used if a repository cannot report its own limit.
+    default_max_queries_per_second = 10
+
+    # Hedged requests for DoiQueries, disabled by default.
+    hedging_policy = HedgingPolicy()
+
+    # How long (in s) a DoiQuery waits for more DoiQueries to the same repository, so that they can be sent as
+    # one bulk request (see AbstractRepository.max_doi_batch_size).
+    doi_batch_delay = 0.05
+
+    @property
+    def registry(self) -> RepositoryRegistry:
+        """The repositories this delegator routes queries to."""
+        return self._registry
+
+    def get_cache_metrics(self) -> dict:
+        """Returns the statistics (including the hit ratio) of the response cache.
+
+        Returns:
+            dict: See HTTPResponseCache.metrics().
+        """
+        return self._response_cache.metrics()
+
+    async def get_rate_limiter(self, repo_identifier) -> RepositoryRateLimiter:
+        """Returns the rate limiter of a repository, creating it on first use from the limit the repository
+            reported in a previous run (or its max_queries_per_second) and its max_connections.
+
+        Args:
+            repo_identifier (str): The identifier of the repository.
+
+        Returns:
+            RepositoryRateLimiter: The limiter guarding all requests to the repository.
+        """
+        if repo_identifier not in self._rate_limiters:
+            max_qps = self._rate_limits.get_max_queries_per_second(repo_identifier)
+            if max_qps is None:
+                try:
+                    max_qps = self._registry[repo_identifier]() \
+                        .max_queries_per_second
+                except Exception:
+                    max_qps = None
+            if max_qps is None:
+                max_qps = self.default_max_queries_per_second
+
+            self._rate_limiters.setdefault(
+                repo_identifier,
+                RepositoryRateLimiter(
+                    max_qps, self._registry.max_connections(repo_identifier)))
+        return self._rate_limiters[repo_identifier]
+
+    def get_circuit_breaker(self, repo_identifier) -> CircuitBreaker:
+        """Returns the circuit breaker of a repository, creating it on first use.
+
+        Args:
+            repo_identifier (str): The identifier of the repository.
+
+        Returns:
+            CircuitBreaker: The breaker tracking the health of the repository.
+        """
+        if repo_identifier not in self._circuit_breakers:
+            self._circuit_breakers[repo_identifier] = CircuitBreaker()
+        return self._circuit_breakers[repo_identifier]
+
+    def get_circuit_breaker_metrics(self) -> dict:
+        """Returns the state and statistics of all circuit breakers by repository identifier.
+
+        Returns:
+            dict: A map from repository identifiers to CircuitBreaker.metrics().
+        """
+        return {repo_identifier: breaker.metrics()
+                for repo_identifier, breaker in self._circuit_breakers.items()}
+
+    def get_concurrency_controller(self, repo_identifier) -> AdaptiveConcurrencyController:
+        """Returns the adaptive concurrency controller of a repository, creating it on first use. Its decisions
+            are applied to the connection limit of the repository's rate limiter.
+
+        Args:
+            repo_identifier (str): The identifier of the repository.
+
+        Returns:
+            AdaptiveConcurrencyController: The controller adapting the repository's connection limit.
+        """
+        if repo_identifier not in self._concurrency_controllers:
+            min_conn, max_conn = self._registry.connection_bounds(repo_identifier)
+
+            def on_limit_change(limit):
+                if repo_identifier in self._rate_limiters:
+                    self._rate_limiters[repo_identifier].set_max_connections(limit)
+
+            self._concurrency_controllers[repo_identifier] = \
+                AdaptiveConcurrencyController(
+                    repo_identifier,
+                    self._registry.max_connections(repo_identifier),
+                    min_limit=min_conn, max_limit=max_conn,
+                    on_limit_change=on_limit_change)
+        return self._concurrency_controllers[repo_identifier]
+
+    def record_repository_call(self, repo_identifier, latency: float, error: Exception = None):
+        """Feeds the outcome of a repository call into its circuit breaker and its concurrency controller.
+            A DataNotFoundError counts as a healthy answer.
+
+        Args:
+            repo_identifier (str): The repository that was called.
+            latency (float): The duration of the call in seconds.
+            error (Exception, optional): The exception raised by the call. Defaults to None.
+        """
+        breaker = self.get_circuit_breaker(repo_identifier)
+        if error is None or isinstance(error, DataNotFoundError):
+            breaker.record_success(latency)
+            self.get_latency_window(repo_identifier).record(latency)
+        else:
+            breaker.record_failure(latency)
+        self.get_concurrency_controller(repo_identifier).record(latency, error)
+
+    def apply_reported_rate_limit(self, repo: AbstractRepository):
+        """Updates the rate limiter of repo if the repository reported a (new) limit in its last response. The
+            limit is also stored for the next run.
+
+        Args:
+            repo (AbstractRepository): The repository that has just been queried.
+        """
+        reported = repo.reported_max_queries_per_second
+        limiter = self._rate_limiters.get(repo.get_identifier())
+        if reported is None or reported <= 0:
+            return
+        self._rate_limits.record(repo.get_identifier(), reported)
+        if limiter is not None and reported != limiter.max_queries_per_second:
+            limiter.set_max_queries_per_second(reported)
+
+    def get_latency_window(self, repo_identifier) -> LatencyWindow:
+        """Returns the latencies of the recent successful calls to a repository.
+
+        Args:
+            repo_identifier (str): The identifier of the repository.
+
+        Returns:
+            LatencyWindow: The latency window of the repository.
+        """
+        if repo_identifier not in self._latency_windows:
+            self._latency_windows[repo_identifier] = LatencyWindow()
+        return self._latency_windows[repo_identifier]
+
+    def get_hedge_delay(self, query: AbstractQuery, repo_identifier) -> Optional[float]:
+        """Returns how long to wait for repo_identifier to answer query before a hedged request is sent.
+
+        Args:
+            query (AbstractQuery): The query to execute.
+            repo_identifier (str): The primary repository.
+
+        Returns:
+            float: The delay in seconds or None if the query must not be hedged.
+        """
+        if not isinstance(query, DoiQuery):
+            return None
+        return self.hedging_policy.hedge_delay(
+            self.get_latency_window(repo_identifier))
+
+    def choose_hedge_repository(self, query: AbstractQuery) -> Optional[str]:
+        """Selects the repository for a hedged request: the next untried repository of the DoiQuery preferences
+            whose circuit is closed (hedges never use up the trial calls of a recovering repository).
+
+        Args:
+            query (AbstractQuery): The query to hedge.
+
+        Returns:
+            str: The repository identifier or None if there is no repository to hedge with.
+        """
+        rep_pref = self.generate_journal_repo_preferences(
+            query, self._registry.repositories_for(DoiQuery))
+        scheduling_info = query.get_scheduling_information()
+        return next((repo for repo in rep_pref if repo not in scheduling_info
+                     and self.get_circuit_breaker(repo).state == CircuitState.CLOSED),
+                    None)
+
+    def start_hedge(self, query: AbstractQuery, session):
+        """Creates the hedged call of a query, which waits for its own rate limiter slot.
+
+        Args:
+            query (AbstractQuery): The query to hedge.
+            session ([type]): The Aiohttp client session to use.
+
+        Returns:
+            Awaitable: The hedged call or None if there is no repository to hedge with.
+        """
+        repo_identifier = self.choose_hedge_repository(query)
+        if repo_identifier is None:
+            return None
+        self._hedged_requests += 1
+        return self.call_repository(
+            self._registry[repo_identifier](), query, session,
+            acquire=True)
+
+    def get_hedging_metrics(self) -> dict:
+        """Returns how many hedged requests have been sent and how many of them answered first.
+
+        Returns:
+            dict: hedged_requests and hedges_won.
+        """
+        return {"hedged_requests": self._hedged_requests,
+                "hedges_won": self._hedges_won}
 
     async def wait_until_repository_available(self, repo_identifier):
-        """If there are API restricitons on the amount of queries per second on a repository, this is
-            function will ensure that these restrictions are met by waiting on the internal QueryCounter.
+        """If there are API restrictions on the amount of queries per second or open connections on a repository,
+            this function will ensure that these restrictions are met by acquiring a slot on the repository's
+            rate limiter. Each call must be followed by a call to release_repository.
 
         Args:
-            repo_identifier (str): [description]
-        """        
-        while (self._query_counter.get_open_connections_for_repo(
-                repo_identifier) > self.repo_identifier_max_conn[
-                   repo_identifier]
-                or
-                self._query_counter.get_num_request_last_interval(repo_identifier)>
-                self.repo_identifier_max_conn[repo_identifier]):
-            await asyncio.sleep(0.5)
+            repo_identifier (str): The identifier of the repository we want to query.
+        """
+        limiter = await self.get_rate_limiter(repo_identifier)
+        await limiter.acquire()
+
+    def release_repository(self, repo_identifier):
+        """Releases the slot acquired by wait_until_repository_available.
+
+        Args:
+            repo_identifier (str): The identifier of the repository we queried.
+        """
+        self._rate_limiters[repo_identifier].release()
 
     # Version!
 
-    async def choose_repository(self, query) -> AbstractRepository:
+    def select_repository(self, query) -> str:
         """Selects the appropriate repository for a given query by checking both the query type and the query history.
+            Does not wait for the repository's rate limiter.
 
         Args:
             query (AbstractQuery): The query to process.
 
         Raises:
             AllRepositoriesTriedError: Raises AllRepositoriesTriedError, if there is no queryable repo left.
+            AllCircuitsOpenError: Raises AllCircuitsOpenError, if all queryable repos have an open circuit.
 
         Returns:
-            AbstractRepository: The repo to query next.
+            str: The identifier of the repo to query next.
         """        
         if isinstance(query, queries.KeywordQuery):
-            rep_pref = self.query_repository_preferences["KeywordQuery"]
+            rep_pref = self.generate_journal_repo_preferences(
+                query, self._registry.repositories_for(queries.KeywordQuery))
         elif isinstance(query, queries.ISSNTimeIntervalQuery):
-            rep_pref = self.query_repository_preferences[
-                "JournalTimeIntervalQuery"]
+            rep_pref = self._registry.repositories_for(
+                queries.ISSNTimeIntervalQuery)
         elif isinstance(query, queries.DoiQuery):
-            rep_pref = self.query_repository_preferences["DOIQuery"]
+            rep_pref = self.generate_journal_repo_preferences(
+                query, self._registry.repositories_for(queries.DoiQuery))
         else:
             raise Exception("Unknown Query Type")
 
@@ -168,12 +430,154 @@ class QueryDelegator:
         if len(possible_repositories) == 0:
             raise AllRepositoriesTriedError()
 
-        repo = possible_repositories[0]
+        repo = next((repo for repo in possible_repositories
+                     if self.get_circuit_breaker(repo).allow_request()), None)
+        if repo is None:
+            raise AllCircuitsOpenError(
+                min(self.get_circuit_breaker(repo).retry_in()
+                    for repo in possible_repositories))
+        return repo
+
+    async def choose_repository(self, query) -> AbstractRepository:
+        """Selects the repository for a given query (see select_repository) and waits until it may be queried.
+
+        Args:
+            query (AbstractQuery): The query to process.
+
+        Raises:
+            AllRepositoriesTriedError: Raises AllRepositoriesTriedError, if there is no queryable repo left.
+            AllCircuitsOpenError: Raises AllCircuitsOpenError, if all queryable repos have an open circuit.
+
+        Returns:
+            AbstractRepository: The repo to query next.
+        """
+        repo = self.select_repository(query)
         await self.wait_until_repository_available(repo)
-        self._query_counter.register_new_request(repo)
         query.store_scheduling_information(repo)
 
-        return self.repo_identifier_repo_map[repo]()
+        return self._registry[repo]()
+
+    async def call_repository(self, repo: AbstractRepository, query: AbstractQuery, session,
+                              acquire: bool = False) -> RepositoryCall:
+        """Executes query on repo, releases the repository's rate limiter slot and records the outcome in the
+            repository's health statistics and in the routing statistics. A cancelled call is not recorded.
+
+        Args:
+            repo (AbstractRepository): The repository to query.
+            query (AbstractQuery): The query to execute.
+            session ([type]): The Aiohttp client session to use.
+            acquire (bool, optional): Whether a rate limiter slot must be acquired first (otherwise
+                the caller has done so). Defaults to False.
+
+        Returns:
+            RepositoryCall: The result or the error raised by the repository.
+        """
+        repo_identifier = repo.get_identifier()
+        if acquire:
+            await self.wait_until_repository_available(repo_identifier)
+        start = time.monotonic()
+        try:
+            result, error = await repo.execute_query(query, session), None
+        except asyncio.CancelledError:
+            self.release_repository(repo_identifier)
+            raise
+        except Exception as e:
+            result, error = None, e
+        latency = time.monotonic() - start
+        self.release_repository(repo_identifier)
+        self.record_repository_call(repo_identifier, latency, error)
+        self.apply_reported_rate_limit(repo)
+
+        if isinstance(query, DoiQuery) or isinstance(query, KeywordQuery):
+            if isinstance(error, DataNotFoundError):
+                self.record_routing_outcome(query, repo_identifier, latency,
+                                            False)
+            elif error is None:
+                self.record_routing_outcome(query, repo_identifier, latency,
+                                            valid(result.metadata.abstract))
+        return RepositoryCall(repo_identifier, result, error, latency)
+
+    def is_batched(self, query: AbstractQuery, repo_identifier) -> bool:
+        """Returns whether query is sent to repo_identifier as part of a bulk request."""
+        return isinstance(query, DoiQuery) and \
+               self._registry[repo_identifier].max_doi_batch_size > 1
+
+    def get_doi_batcher(self, repo_identifier, session) -> MicroBatcher:
+        """Returns the micro-batcher collecting the DoiQueries for a repository, creating it on first use.
+
+        Args:
+            repo_identifier (str): The identifier of the repository.
+            session ([type]): The Aiohttp client session to use.
+
+        Returns:
+            MicroBatcher: The batcher, its results are RepositoryCalls.
+        """
+        if repo_identifier not in self._doi_batchers:
+            self._doi_batchers[repo_identifier] = MicroBatcher(
+                lambda batch: self.call_repository_with_batch(
+                    repo_identifier, batch, session),
+                self._registry[repo_identifier].max_doi_batch_size,
+                self.doi_batch_delay)
+        return self._doi_batchers[repo_identifier]
+
+    def get_batching_metrics(self) -> dict:
+        """Returns the number of bulk requests and of DoiQueries answered by them per repository.
+
+        Returns:
+            dict: A map from repository identifiers to {"requests": int, "queries": int}.
+        """
+        return {repo_identifier: {"requests": batcher.flushed_batches,
+                                  "queries": batcher.processed_items}
+                for repo_identifier, batcher in self._doi_batchers.items()}
+
+    async def call_repository_with_batch(self, repo_identifier, doi_queries: List[DoiQuery],
+                                         session) -> List[RepositoryCall]:
+        """Answers a batch of DoiQueries with a single bulk request to a repository. The request takes one slot
+            on the repository's rate limiter and counts as one call for its health statistics.
+
+        Args:
+            repo_identifier (str): The repository to query.
+            doi_queries (List[DoiQuery]): The queries of the batch.
+            session ([type]): The Aiohttp client session to use.
+
+        Returns:
+            List[RepositoryCall]: One call per query. DOIs the repository does not know fail with a
+                DataNotFoundError, so that they fall through to the next repository.
+        """
+        await self.wait_until_repository_available(repo_identifier)
+        repo = self._registry[repo_identifier]()
+        start = time.monotonic()
+        try:
+            responses, error = await repo.execute_doi_batch(doi_queries, session), None
+        except asyncio.CancelledError:
+            self.release_repository(repo_identifier)
+            raise
+        except Exception as e:
+            responses, error = {}, e
+        latency = time.monotonic() - start
+        self.release_repository(repo_identifier)
+        self.record_repository_call(repo_identifier, latency, error)
+        self.apply_reported_rate_limit(repo)
+
+        calls = []
+        for query in doi_queries:
+            if error is not None:
+                calls.append(RepositoryCall(repo_identifier, None, error, latency))
+            elif query.query_id in responses:
+                result = responses[query.query_id]
+                self.record_routing_outcome(query, repo_identifier, latency,
+                                            valid(result.metadata.abstract))
+                calls.append(RepositoryCall(repo_identifier, result, None, latency))
+            else:
+                self.record_routing_outcome(query, repo_identifier, latency, False)
+                calls.append(RepositoryCall(repo_identifier, None,
+                                            DataNotFoundError(), latency))
+        return calls
+
+    @staticmethod
+    def _has_abstract(call: RepositoryCall) -> bool:
+        return call.error is None and call.result.metadata is not None \
+               and valid(call.result.metadata.abstract)
 
     async def handle_query(self, query: AbstractQuery, session):
         """Asynchronous execution context that performs the query. If unsuccessful, it will update the scheduling
@@ -183,66 +587,262 @@ class QueryDelegator:
             query (AbstractQuery): The query to process.
             session ([type]): The Aiohttp client session to use.
         """        
+        if not self._query_coalescer.admit(query):
+            return
+
         try:
-            repo = await self.choose_repository(query)
+            repo_identifier = self.select_repository(query)
         except AllRepositoriesTriedError as e:
-            self._response_queue.put(
-                FailedQueryResponse(query.query_id))
+            await self.publish_response(query,
+                                        FailedQueryResponse(query.query_id))
+            return
+        except AllCircuitsOpenError as e:
+            # Waiting for a circuit to close uses up the query's retry budget
+            if query.retry_count >= \
+                    self._retry_classifier.transient_policy.max_retries:
+                await self.publish_response(
+                    query, FailedQueryResponse(query.query_id))
+            else:
+                query.register_retry()
+                self._retry_scheduler.schedule(query, e.retry_in)
             return
 
-        try:
-            result = await repo.execute_query(query, session)
-            self._query_counter.request_completed(repo.get_identifier())
-
-            if isinstance(query, DoiQuery) or isinstance(query, KeywordQuery):
-                result.add_journal_data(query.get_journal_data())
-
-                if not valid(result.metadata.abstract):
-                    try:
-                        result.metadata.abstract = \
-                            await async_get_abstract_from_doi(result.metadata.doi)
-                    except Exception as e:
-                        pass
-                self._response_queue.put(result)
+        if self.is_batched(query, repo_identifier):
+            # Bulk requests are not hedged
+            query.store_scheduling_information(repo_identifier)
+            calls = [await self.get_doi_batcher(repo_identifier, session)
+                     .submit(query)]
+        else:
+            await self.wait_until_repository_available(repo_identifier)
+            query.store_scheduling_information(repo_identifier)
+            primary = self.call_repository(
+                self._registry[repo_identifier](), query,
+                session)
+            hedge_delay = self.get_hedge_delay(query, repo_identifier)
+            if hedge_delay is None:
+                calls = [await primary]
             else:
-                self._response_queue.put(result)
+                calls = await race_with_hedge(
+                    primary, lambda: self.start_hedge(query, session),
+                    hedge_delay, self._has_abstract)
+
+        # The first answer with an abstract wins, otherwise the first answer at all
+        winner = calls[-1] if self._has_abstract(calls[-1]) \
+            else next((call for call in calls if call.error is None), None)
+        if winner is None:
+            for call in calls:
+                if call.repo_identifier != repo_identifier \
+                        and self._retry_classifier.classify(call.error, query)[0] \
+                        == RetryDecision.FALLTHROUGH:
+                    # A hedge that got a definite answer counts as tried
+                    query.store_scheduling_information(call.repo_identifier)
+            primary_error = next(call.error for call in calls
+                                 if call.repo_identifier == repo_identifier)
+            self.reschedule_failed_query(query, repo_identifier,
+                                         primary_error)
+            return
+        if winner.repo_identifier != repo_identifier:
+            self._hedges_won += 1
+            query.store_scheduling_information(winner.repo_identifier)
+        result = winner.result
+
+        if isinstance(result, queries.JournalDaterangeResponse) \
+                and not result.final:
+            # Publish the page right away and queue the query again for the next one
+            await self._response_queue.async_put(result)
+            query.advance_to_page(result.next_cursor)
+            self.submit_query(query)
+            return
 
-        except DataNotFoundError as e:
-            self._query_delegation_queue.put(query)
-            self._query_counter.request_completed(repo.get_identifier())
+        if isinstance(query, DoiQuery) or isinstance(query, KeywordQuery):
+            result.add_journal_data(query.get_journal_data())
+
+            if not valid(result.metadata.abstract):
+                # The scrape may wait long for its publisher, it must not hold one of the in-flight slots
+                await self._scrape_slots.acquire()
+                task = asyncio.create_task(self.complete_with_scraped_abstract(query, result))
+                self._scrape_tasks.add(task)
+                task.add_done_callback(self._on_scrape_done)
+                return
+        await self.publish_response(query, result)
+
+    async def complete_with_scraped_abstract(self, query: AbstractQuery, result: queries.Response):
+        """Scrapes the abstract of a response without one and publishes the response.
+
+        Args:
+            query (AbstractQuery): The completed DoiQuery or KeywordQuery.
+            result (queries.Response): Its response, whose metadata has no valid abstract.
+        """
+        try:
+            result.metadata.abstract = \
+                await self.scrape_abstract(result.metadata.doi)
         except Exception as e:
-            self._query_delegation_queue.put(query)
-            self._query_counter.request_completed(repo.get_identifier())
+            pass
+        await self.publish_response(query, result)
+
+    async def scrape_abstract(self, doi: str) -> str:
+        """Scrapes the abstract of doi from the web. Concurrent scrapes of the same DOI are coalesced.
+
+        Args:
+            doi (str): The DOI whose abstract we want.
+
+        Returns:
+            str: The scraped abstract.
+        """
+        return await self._abstract_scrapes.do(
+            normalise_doi(doi),
+            lambda: async_get_abstract_from_doi(doi, self._abstract_scraper))
+
+    async def publish_response(self, query: AbstractQuery, response: queries.Response):
+        """Pushes the final response of query onto the response queue, together with copies for all equivalent
+            queries that have been coalesced with it. Waits (without blocking the event loop) while the response
+            queue is full.
+
+        Args:
+            query (AbstractQuery): The completed query.
+            response (queries.Response): Its final response.
+        """
+        await self._response_queue.async_put(response)
+        for follower_response in self._query_coalescer.complete(query, response):
+            await self._response_queue.async_put(follower_response)
+
+    def get_coalescing_metrics(self) -> dict:
+        """Returns how many queries and abstract scrapes have been executed and how many were saved by coalescing.
+
+        Returns:
+            dict: executed_queries, coalesced_queries, executed_scrapes and coalesced_scrapes.
+        """
+        return {"executed_queries": self._query_coalescer.executed_queries,
+                "coalesced_queries": self._query_coalescer.coalesced_queries,
+                "executed_scrapes": self._abstract_scrapes.executed_calls,
+                "coalesced_scrapes": self._abstract_scrapes.coalesced_calls}
+
+    def reschedule_failed_query(self, query: AbstractQuery, repo_identifier, error: Exception):
+        """Decides how to continue after a repository call failed. Rate limits and transient errors are retried
+            on the same repository after a backoff (via the retry scheduler); all other errors fall through to
+            the next repository immediately.
+
+        Args:
+            query (AbstractQuery): The failed query.
+            repo_identifier (str): The repository that failed.
+            error (Exception): The exception raised by the repository.
+        """
+        decision, delay = self._retry_classifier.classify(error, query)
+        if decision == RetryDecision.RETRY_LATER:
+            query.register_retry(repo_identifier)
+            self._retry_scheduler.schedule(query, delay)
+        else:
+            self.submit_query(query)
 
     async def process_queries(self):
         """The "run" method of the QueryDelegator. Waits on the delegation queue and schedules all requests to be done. 
             Once a TerminationFlag has been passed, it will try to terminate the process.
         """        
-        initial_tasks = set(asyncio.all_tasks())
-        async with aiohttp.ClientSession() as session:
-            while not self._terminated:
-                query: queries.AbstractQuery = await \
-                    self._query_delegation_queue.async_get()
+        with self._routing_statistics, self._response_cache, self._rate_limits, \
+                self._abstract_cache:
+            await self._process_queries()
+
+    # The maximum number of queries handled concurrently, all others wait in the scheduler.
+    max_in_flight_queries = 100
+    # The maximum number of queries waiting in the scheduler. Beyond that, queries stay in the (bounded)
+    # delegation queue, so that producers are slowed down instead of everything being buffered in memory.
+    max_pending_queries = 1000
+    # The maximum number of queries moved from the delegation queue to the scheduler at once.
+    intake_batch_size = 100
+    # The maximum number of abstracts scraped from landing pages at once.
+    max_concurrent_scrapes = 10
+    # The maximum number of responses waiting for their scraped abstract. They do not count as in-flight queries;
+    # beyond that, queries that need a scrape wait in their in-flight slot.
+    max_pending_scrapes = 1000
+
+    def submit_query(self, query: AbstractQuery):
+        """(Re)submits a query to the scheduler. Must be called from within the delegator's event loop.
+
+        Args:
+            query (AbstractQuery): The query to schedule.
+        """
+        self._scheduler.push(query)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _feed_scheduler(self):
+        """Moves queries from the delegation queue into the scheduler and records termination flags. Pauses
+            while the scheduler holds max_pending_queries queries.
+        """
+        while True:
+            while len(self._scheduler) >= self.max_pending_queries:
+                self._intake_space.clear()
+                await self._intake_space.wait()
+            items = await self._query_delegation_queue.async_get_many(
+                min(self.intake_batch_size,
+                    self.max_pending_queries - len(self._scheduler)))
+            for item in items:
+                if isinstance(item, TerminationTimeoutFlag):
+                    self._termination_flag = item
+                elif isinstance(item, TerminationFlag):
+                    if self._termination_flag is None:
+                        self._termination_flag = item
+                else:
+                    self._scheduler.push(item)
+            self._wakeup.set()
+
+    def _dispatch(self, query: AbstractQuery, session):
+        task = asyncio.create_task(self.handle_query(query, session))
+        self._running_tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task):
+        self._running_tasks.discard(task)
+        self._wakeup.set()
+
+    def _on_scrape_done(self, task):
+        self._scrape_tasks.discard(task)
+        self._scrape_slots.release()
+        self._wakeup.set()
+
+    def _finished_all_queries(self):
+        return len(self._scheduler) == 0 \
+               and len(self._running_tasks) == 0 \
+               and len(self._scrape_tasks) == 0 \
+               and len(self._retry_scheduler) == 0 \
+               and self._query_delegation_queue.qsize() == 0
+
+    async def _process_queries(self):
+        self._wakeup = asyncio.Event()
+        self._intake_space = asyncio.Event()
+        self._scrape_slots = asyncio.Semaphore(self.max_pending_scrapes)
+        feeder = asyncio.create_task(self._feed_scheduler())
+        timeout = None
+        async with aiohttp.ClientSession() as client_session, \
+                AbstractScraper(self.max_concurrent_scrapes,
+                                cache=self._abstract_cache) as abstract_scraper:
+            session = CachingSession(client_session, self._response_cache)
+            self._abstract_scraper = abstract_scraper
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
 
                 # Check for Termination Signal
-                if isinstance(query, TerminationFlag):
-                    timeout = None
-                    self._terminated = True
-                    if len(asyncio.all_tasks() - initial_tasks) > 0:
-                        await asyncio.gather(*(asyncio.all_tasks() -
-                                               initial_tasks))
-                    if self._query_delegation_queue.qsize() == 0:
-                        break
-
-                    self._query_delegation_queue.put(TerminationFlag())
-                    self._terminated = False
-                    continue
-                if isinstance(query, TerminationTimeoutFlag):
-                    timeout = query.timeout
+                if isinstance(self._termination_flag, TerminationTimeoutFlag):
+                    timeout = self._termination_flag.timeout
                     break
 
-                asyncio.create_task(self.handle_query(query, session))
+                while len(self._scheduler) > 0 and \
+                        len(self._running_tasks) < self.max_in_flight_queries:
+                    self._dispatch(self._scheduler.pop(), session)
+                if len(self._scheduler) < self.max_pending_queries:
+                    self._intake_space.set()
+
+                if self._termination_flag is not None \
+                        and self._finished_all_queries():
+                    break
 
-            if len(asyncio.all_tasks() - initial_tasks) > 0:
-                await asyncio.wait(asyncio.all_tasks() - initial_tasks,
-                                   timeout=timeout)
+            feeder.cancel()
+            deadline = None if timeout is None else time.monotonic() + timeout
+            # Queries that are still running may hand their response over to a scrape
+            for tasks in (self._running_tasks, self._scrape_tasks):
+                if len(tasks) > 0:
+                    await asyncio.wait(set(tasks), timeout=None if deadline is None
+                                       else max(0.0, deadline - time.monotonic()))
+            self._retry_scheduler.cancel_all()
+            self._abstract_scraper = None
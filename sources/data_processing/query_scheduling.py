@@ -0,0 +1,112 @@
+import collections
+from typing import Callable, Dict, Hashable, Optional
+
+from .queries import AbstractQuery, DoiQuery, KeywordQuery, \
+    ISSNTimeIntervalQuery
+
+# Attempts beyond this number share the lowest priority level of their type
+MAX_ATTEMPT_LEVEL = 3
+
+
+def default_query_priority(query: AbstractQuery) -> int:
+    """Returns the priority level of a query, lower levels are dispatched first.
+
+    Follow-up DoiQueries and KeywordQueries come first since each of them completes an article, journal
+        interval queries second. Within each type, queries that have already been attempted (fallthroughs and
+        retries) come after fresh ones, so that a failing upstream cannot crowd out new work.
+
+    Args:
+        query (AbstractQuery): The query to rate.
+
+    Returns:
+        int: The priority level.
+    """
+    if isinstance(query, (DoiQuery, KeywordQuery)):
+        type_rank = 0
+    elif isinstance(query, ISSNTimeIntervalQuery):
+        type_rank = 1
+    else:
+        type_rank = 2
+    attempts = len(query.get_scheduling_information()) + query.retry_count
+    return type_rank * (MAX_ATTEMPT_LEVEL + 1) + min(attempts, MAX_ATTEMPT_LEVEL)
+
+
+def default_query_flow(query: AbstractQuery) -> Hashable:
+    """Returns the flow of a query: queries of the same sync job and journal share a flow.
+
+    Args:
+        query (AbstractQuery): The query.
+
+    Returns:
+        Hashable: The (sync_id, issn) pair of the query.
+    """
+    if isinstance(query, ISSNTimeIntervalQuery):
+        issn = query.issn
+    else:
+        journal_data = query.get_journal_data()
+        issn = journal_data.issn if journal_data is not None else None
+    return query.sync_id, issn
+
+
+class FairPriorityScheduler:
+    """Orders pending queries by strict priority level and, within a level, round-robin across flows (sync
+        jobs and journals), so that one huge journal cannot starve the others.
+    """
+
+    def __init__(self,
+                 priority_function: Callable[[AbstractQuery], int] = default_query_priority,
+                 flow_function: Callable[[AbstractQuery], Hashable] = default_query_flow):
+        self._priority_function = priority_function
+        self._flow_function = flow_function
+        # level -> flow -> pending queries of the flow
+        self._levels: Dict[int, Dict[Hashable, collections.deque]] = {}
+        # level -> flows with pending queries in round-robin order
+        self._rotations: Dict[int, collections.deque] = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def push(self, query: AbstractQuery):
+        """Adds a query to the scheduler.
+
+        Args:
+            query (AbstractQuery): The query to schedule.
+        """
+        level = self._priority_function(query)
+        flow = self._flow_function(query)
+        flows = self._levels.setdefault(level, {})
+        if flow not in flows:
+            flows[flow] = collections.deque()
+            self._rotations.setdefault(level, collections.deque()).append(flow)
+        flows[flow].append(query)
+        self._size += 1
+
+    def pop(self) -> Optional[AbstractQuery]:
+        """Removes and returns the next query to dispatch.
+
+        Returns:
+            AbstractQuery: The next query or None if the scheduler is empty.
+        """
+        if self._size == 0:
+            return None
+        level = min(self._levels)
+        flows = self._levels[level]
+        rotation = self._rotations[level]
+
+        flow = rotation.popleft()
+        query = flows[flow].popleft()
+        if len(flows[flow]) > 0:
+            rotation.append(flow)
+        else:
+            del flows[flow]
+            if len(flows) == 0:
+                del self._levels[level]
+                del self._rotations[level]
+        self._size -= 1
+        return query
+
+    def pending_by_level(self) -> Dict[int, int]:
+        """Returns the number of pending queries per priority level."""
+        return {level: sum(len(queue) for queue in flows.values())
+                for level, flows in self._levels.items()}
@@ -0,0 +1,160 @@
+import asyncio
+import collections
+import time
+from typing import Optional
+
+
+class RepositoryRateLimiter:
+    """An event loop native rate limiter for a single repository.
+
+    It combines a token bucket (restricting the number of requests per second)
+    with a counting semaphore (restricting the number of open connections).
+    Waiters are woken exactly when capacity frees up: connection waiters are
+    handed a slot as soon as another request releases one and token waiters
+    sleep precisely until the next token has been refilled.
+
+    Note:
+        All asyncio primitives are created lazily, so the limiter may be
+        constructed outside of the event loop it is used in.
+    """
+
+    def __init__(self,
+                 max_queries_per_second: float,
+                 max_connections: int,
+                 burst: Optional[float] = None,
+                 clock=time.monotonic):
+        """
+        Args:
+            max_queries_per_second (float): The refill rate of the token bucket.
+            max_connections (int): The maximum number of concurrently open requests.
+            burst (float, optional): The capacity of the token bucket. Defaults to max(1, max_queries_per_second).
+            clock (Callable[[], float], optional): Monotonic clock used for the refill. Defaults to time.monotonic.
+        """
+        if max_queries_per_second <= 0:
+            raise ValueError("max_queries_per_second must be positive")
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+
+        self._clock = clock
+        self._rate = float(max_queries_per_second)
+        self._capacity = float(burst) if burst is not None \
+            else max(1.0, self._rate)
+        self._tokens = self._capacity
+        self._last_refill = clock()
+        self._token_lock: Optional[asyncio.Lock] = None
+
+        self._max_connections = max_connections
+        self._open_connections = 0
+        self._connection_waiters = collections.deque()
+
+    @property
+    def max_queries_per_second(self) -> float:
+        return self._rate
+
+    @property
+    def max_connections(self) -> int:
+        return self._max_connections
+
+    @property
+    def open_connections(self) -> int:
+        return self._open_connections
+
+    @property
+    def available_tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self._capacity,
+                           self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    async def _acquire_token(self):
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+
+        # The lock keeps token waiters in FIFO order, only the head sleeps.
+        async with self._token_lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+    async def _acquire_connection(self):
+        if self._open_connections < self._max_connections \
+                and len(self._connection_waiters) == 0:
+            self._open_connections += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._connection_waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was already handed to us, pass it on.
+                self.release()
+            else:
+                self._connection_waiters.remove(waiter)
+            raise
+
+    def _wake_connection_waiters(self):
+        while len(self._connection_waiters) > 0 \
+                and self._open_connections < self._max_connections:
+            waiter = self._connection_waiters.popleft()
+            if not waiter.done():
+                self._open_connections += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        """Waits until both a connection slot and a request token are
+        available and claims them. Each call must be matched by a call to
+        release once the request has completed.
+        """
+        await self._acquire_connection()
+        try:
+            await self._acquire_token()
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self):
+        """Frees the connection slot claimed by acquire and wakes the next
+        waiter.
+        """
+        self._open_connections -= 1
+        self._wake_connection_waiters()
+
+    def set_max_queries_per_second(self, max_queries_per_second: float):
+        """Updates the refill rate of the token bucket at runtime.
+
+        Args:
+            max_queries_per_second (float): The new refill rate.
+        """
+        if max_queries_per_second <= 0:
+            raise ValueError("max_queries_per_second must be positive")
+        self._refill()
+        self._rate = float(max_queries_per_second)
+        self._capacity = max(1.0, self._rate)
+        self._tokens = min(self._tokens, self._capacity)
+
+    def set_max_connections(self, max_connections: int):
+        """Updates the connection limit at runtime. Lowering the limit never
+        interrupts open requests, it only delays new ones.
+
+        Args:
+            max_connections (int): The new connection limit.
+        """
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+        self._max_connections = max_connections
+        self._wake_connection_waiters()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
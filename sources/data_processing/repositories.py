@@ -1,20 +1,22 @@
 import abc
-import asyncio
+import dataclasses
 import datetime
-import functools
+import email.utils
 import json
 import re
-from typing import List
+from typing import Callable, Dict, List, Optional, Union
 from collections import defaultdict
 
-import jellyfish
-import requests
-import yaml
 from aiohttp import ClientSession
-from habanero import Crossref
 
 from . import queries
 from .queries import AbstractQuery, ArticleMetadata
+from .repository_registry import register_repository
+from .request_coalescing import normalise_doi
+from .json_streaming import JsonArrayStreamParser
+from .response_decoding import ResponseDecodingError, is_json_content_type, \
+    read_json, repair_openaire_json
+from .title_matching import TitleMatcher
 
 
 # Interface Definitions
@@ -28,7 +30,30 @@ class AbstractRepository(metaclass=abc.ABCMeta):
     """AbstractRepository defines the interface a repository must implement to work together with the query_delegator.
 
     It provides an api_endpoint, an identifier, a query_per_second limit and an execute_query method. The last one must be implemented asynchronously.
+
+    Repositories that learn their rate limit from response headers store it (in queries per second) in
+    reported_max_queries_per_second, from where the query_delegator applies it to the repository's rate limiter.
+
+    The query_delegator routes queries by what repositories declare here (see RepositoryRegistry); concrete
+    repositories register with @register_repository.
     """
+    reported_max_queries_per_second: Optional[float] = None
+
+    # The query types the repository answers and the relative cost of doing so. A query type is routed to the
+    # repositories that declare it, cheapest first (until the delegator learns better, see query routing).
+    query_costs: Dict[type, float] = {}
+
+    # The initial number of concurrent connections and the bounds within which it is adapted.
+    max_connections = 10
+    connection_bounds = (2, 40)
+
+    # How long (in s) responses are served from the response cache without revalidation.
+    cache_ttl = 24 * 3600
+
+    # The number of DoiQueries a single request can answer; repositories with a bulk lookup raise it and
+    # implement execute_doi_batch.
+    max_doi_batch_size = 1
+
     @staticmethod
     @abc.abstractmethod
     def get_identifier():
@@ -64,6 +89,20 @@ class AbstractRepository(metaclass=abc.ABCMeta):
         """        
         raise NotImplementedError("Must declare how queries are handled!")
 
+    async def execute_doi_batch(
+            self, doi_queries: List[queries.DoiQuery], session: ClientSession = None
+    ) -> Dict[int, queries.Response]:
+        """Answers up to max_doi_batch_size DoiQueries with a single request.
+
+        Args:
+            doi_queries (List[queries.DoiQuery]): The queries to answer.
+            session (ClientSession, optional): The aiohttp.ClientSession we are currently using. Defaults to None.
+
+        Returns:
+            Dict[int, queries.Response]: The responses by query_id, DOIs the repository does not know are missing.
+        """
+        raise NotImplementedError(f"{self.get_identifier()} has no bulk DOI lookup")
+
 
 # Concrete Repositories
 ######################################################################################################
@@ -76,6 +115,91 @@ class DataNotFoundError(Exception):
     pass
 
 
+class RepositoryHTTPError(Exception):
+    """Raised when a repository answers with an HTTP error status. Carries the status and the parsed
+        Retry-After header (in seconds) so that the QueryDelegator can decide how to retry.
+    """
+
+    def __init__(self, status: int, retry_after: float = None, message: str = ""):
+        super().__init__(message or f"Repository responded with status {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RateLimitedError(RepositoryHTTPError):
+    """Raised when a repository answers with 429 Too Many Requests."""
+    pass
+
+
+def parse_retry_after(value) -> float:
+    """Parses a Retry-After header, which is either a number of seconds or an HTTP date.
+
+    Args:
+        value (str): The raw header value (or None).
+
+    Returns:
+        float: The number of seconds to wait or None if the header is missing or malformed.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date is None:
+        return None
+    now = datetime.datetime.now(retry_date.tzinfo)
+    return max(0.0, (retry_date - now).total_seconds())
+
+
+def raise_for_status(status: int, headers) -> None:
+    """Raises a RepositoryHTTPError (or RateLimitedError for 429) if status is an error status.
+
+    Args:
+        status (int): The HTTP status of the response.
+        headers (Mapping): The response headers.
+
+    Raises:
+        RateLimitedError: If status is 429.
+        RepositoryHTTPError: If status is any other status >= 400.
+    """
+    if status < 400:
+        return
+    retry_after = parse_retry_after(headers.get("Retry-After"))
+    if status == 429:
+        raise RateLimitedError(status, retry_after)
+    raise RepositoryHTTPError(status, retry_after)
+
+
+def match_metadata_to_doi_queries(doi_queries: List[queries.DoiQuery],
+                                  candidate_metadata: List[ArticleMetadata]) -> Dict[int, queries.Response]:
+    """Splits the results of a bulk DOI lookup back into one response per query. If a DOI has several results,
+        the first one with an abstract is used.
+
+    Args:
+        doi_queries (List[queries.DoiQuery]): The queries of the batch.
+        candidate_metadata (List[ArticleMetadata]): All results of the bulk request.
+
+    Returns:
+        Dict[int, queries.Response]: The responses by query_id, queries without a result are missing.
+    """
+    by_doi = {}
+    for metadata in candidate_metadata:
+        if metadata.doi is None:
+            continue
+        doi = normalise_doi(metadata.doi)
+        if doi not in by_doi or (by_doi[doi].abstract is None
+                                 and metadata.abstract is not None):
+            by_doi[doi] = metadata
+    return {query.query_id: queries.Response(
+        query.query_id, dataclasses.replace(by_doi[normalise_doi(query.doi_to_query)]))
+        for query in doi_queries if normalise_doi(query.doi_to_query) in by_doi}
+
+
 def strings_approx_equal(fst_string: str, snd_string: str) -> bool:
     """Helper method that defines equality of strings based on the damerau_levensthein_distance.
     
@@ -86,14 +210,7 @@ def strings_approx_equal(fst_string: str, snd_string: str) -> bool:
     Returns:
         bool: True iff the two strings are approximately equal, False otherwise.
     """    
-    dist = jellyfish.damerau_levenshtein_distance(
-        fst_string.strip().lower(), snd_string.strip().lower()
-    )
-    return (
-        True
-        if dist < (2 + (len(fst_string) + len(snd_string)) // 40)
-        else False
-    )
+    return TitleMatcher(fst_string).approx_equal(snd_string)
 
 
 def get_metadata_best_fit_by_title(ls_metadata: List[ArticleMetadata], real_title:str) -> ArticleMetadata:
@@ -108,24 +225,9 @@ def get_metadata_best_fit_by_title(ls_metadata: List[ArticleMetadata], real_titl
     Returns:
         ArticleMetadata: Returns the best fit ArticleMetadata or None if no match is found.
     """    
-    lev_distances = [
-        jellyfish.damerau_levenshtein_distance(
-            meta.title.strip().lower(), real_title.strip().lower()
-        )
-        for meta in ls_metadata
-    ]
-    candidate_responses = list(
-        filter(
-            lambda pair: pair[1] < (2 + len(ls_metadata[pair[0]].title) // 20),
-            enumerate(lev_distances),
-        )
-    )
-
-    if len(candidate_responses) > 0:
-        response = min(candidate_responses, key=lambda pair: pair[1])
-        return ls_metadata[response[0]]
-    else:
-        return None
+    position = TitleMatcher(real_title).best_fit(
+        [meta.title for meta in ls_metadata])
+    return ls_metadata[position] if position is not None else None
 
 
 # Makes Author search more secure by deleting all abbreviated names
@@ -161,6 +263,7 @@ def format_author(author: str):
     return whitespace_pattern.sub(" ", reduced_str).strip()
 
 
+@register_repository
 class OpenAireRepository(AbstractRepository):
     """A class representing a connection to the OpenAireRepository.
     Implements all functions from AbstractRepository.
@@ -179,22 +282,24 @@ class OpenAireRepository(AbstractRepository):
     def max_queries_per_second(self):
         return 15  # Potentially more concurrent connections
 
+    # The doi parameter accepts a comma separated list
+    max_doi_batch_size = 20
+
+    query_costs = {queries.KeywordQuery: 1.0, queries.DoiQuery: 1.0}
+    max_connections = 15
+    cache_ttl = 7 * 24 * 3600
+
     async def _request_json_api(
             self, session: ClientSession, params: dict
-    ) -> str:
-        """GET request wrapper to fetch page HTML.
-
-        kwargs are passed to `session.request()`.
+    ) -> dict:
+        """GET request wrapper to fetch the decoded JSON response. OpenAIRE's known JSON malformations are
+            repaired (see repair_openaire_json).
         """
         resp = await session.request(
             method="GET", url=self.api_endpoint, params=params
         )
-        resp.raise_for_status()
-        text = await resp.text()
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            return yaml.load(text, yaml.SafeLoader)
+        raise_for_status(resp.status, resp.headers)
+        return await read_json(resp, repair_openaire_json)
 
     @staticmethod
     def _get_oa_query_dict_from_args(
@@ -334,6 +439,24 @@ class OpenAireRepository(AbstractRepository):
         else:  # TODO Improve on this!
             return entities_metadata[0]
 
+    async def execute_doi_batch(
+            self, doi_queries: List[queries.DoiQuery], session: ClientSession = None
+    ) -> Dict[int, queries.Response]:
+        json_response = await self._request_json_api(
+            session, self._get_oa_query_dict_from_args(
+                doi=",".join(query.doi_to_query for query in doi_queries),
+                # Leave room for duplicate records of the same DOI
+                size=2 * len(doi_queries)))
+
+        if json_response["response"]["results"] is None:
+            return {}
+        candidate_metadata = [
+            self._map_oa_entity_to_metadata(
+                result["metadata"]["oaf:entity"]["oaf:result"])
+            for result in json_response["response"]["results"]["result"]
+        ]
+        return match_metadata_to_doi_queries(doi_queries, candidate_metadata)
+
     async def execute_query(
             self, query: AbstractQuery, session: ClientSession = None
     ):
@@ -357,6 +480,151 @@ class OpenAireRepository(AbstractRepository):
             )
 
 
+def parse_rate_limit_headers(headers) -> Optional[float]:
+    """Parses the x-rate-limit-limit and x-rate-limit-interval headers sent by Crossref.
+
+    Args:
+        headers (Mapping): The response headers.
+
+    Returns:
+        float: The allowed number of queries per second or None if the headers are missing or malformed.
+    """
+    limit = headers.get("x-rate-limit-limit")
+    interval = headers.get("x-rate-limit-interval")
+    if limit is None or interval is None:
+        return None
+    try:
+        seconds = float(interval.strip().rstrip("s"))
+        return int(limit) / seconds if seconds > 0 else None
+    except ValueError:
+        return None
+
+
+class CrossrefClient:
+    """An asynchronous client for the Crossref REST API that runs on a (shared) aiohttp ClientSession, so that
+        connections are kept alive and reused across queries.
+
+    Every response is checked for the x-rate-limit-* headers, the limit they report is passed to on_rate_limit.
+    """
+    base_url = "https://api.crossref.org"
+
+    def __init__(self, session: ClientSession, mailto: str = "",
+                 on_rate_limit: Callable[[float], None] = None):
+        """
+        Args:
+            session (ClientSession): The session to send requests with.
+            mailto (str, optional): The contact address for Crossref's polite pool. Defaults to "".
+            on_rate_limit (Callable[[float], None], optional): Called with the limit in queries per second
+                whenever a response reports one. Defaults to None.
+        """
+        self._session = session
+        self._mailto = mailto
+        self._on_rate_limit = on_rate_limit
+
+    @staticmethod
+    def _format_filter(filter: dict) -> str:
+        # A list value repeats the filter, e.g. {"doi": [a, b]} -> "doi:a,doi:b"
+        return ",".join(f"{key}:{value}"
+                        for key, values in filter.items()
+                        for value in (values if isinstance(values, list) else [values]))
+
+    def _build_params(self, select=None, filter=None, limit=None, **kwargs) -> dict:
+        params = {}
+        if select is not None:
+            params["select"] = ",".join(select)
+        if filter is not None and len(filter) > 0:
+            params["filter"] = self._format_filter(filter)
+        if limit is not None:
+            params["rows"] = str(limit)
+        for key, value in kwargs.items():
+            if value is not None:
+                # query_bibliographic -> query.bibliographic (same convention as habanero)
+                name = "query." + key[len("query_"):] if key.startswith("query_") else key
+                params[name] = str(value)
+        if self._mailto != "":
+            params["mailto"] = self._mailto
+        return params
+
+    # The size of the chunks in which streamed responses are read
+    stream_chunk_size = 64 * 1024
+
+    def _check_response(self, resp, path: str):
+        # Responses served from the response cache carry the limit of the time they were stored
+        rate_limit = None if getattr(resp, "from_cache", False) \
+            else parse_rate_limit_headers(resp.headers)
+        if rate_limit is not None and self._on_rate_limit is not None:
+            self._on_rate_limit(rate_limit)
+        if resp.status == 404:
+            raise DataNotFoundError(f"Crossref has no resource {path}")
+        raise_for_status(resp.status, resp.headers)
+
+    async def _get(self, path: str, params: dict) -> dict:
+        async with self._session.get(self.base_url + path, params=params) as resp:
+            self._check_response(resp, path)
+            return await read_json(resp)
+
+    async def _stream_items(self, path: str, params: dict, parser: JsonArrayStreamParser):
+        async with self._session.get(self.base_url + path, params=params) as resp:
+            self._check_response(resp, path)
+            content_type = resp.headers.get("Content-Type")
+            if not is_json_content_type(content_type):
+                raise ResponseDecodingError(
+                    f"Expected a JSON response, got {content_type}", content_type)
+            async for item in parser.async_iter_items(
+                    resp.content.iter_chunked(self.stream_chunk_size)):
+                yield item
+
+    async def work(self, doi: str) -> dict:
+        """Fetches the metadata of a single DOI (/works/{doi}).
+
+        Raises:
+            DataNotFoundError: If Crossref does not know the DOI.
+
+        Returns:
+            dict: The decoded response, the work is stored under "message".
+        """
+        return await self._get(f"/works/{doi}", self._build_params())
+
+    async def works(self, select: List[str] = None, filter: dict = None,
+                    limit: int = None, **query) -> dict:
+        """Searches works (/works). Field queries are passed as keyword arguments, e.g. query_author="...".
+
+        Returns:
+            dict: The decoded response, the works are stored under ["message"]["items"].
+        """
+        return await self._get("/works", self._build_params(
+            select, filter, limit, **query))
+
+    async def journal_works(self, issn: str, select: List[str] = None,
+                            filter: dict = None, limit: int = None,
+                            **kwargs) -> dict:
+        """Lists the works of a journal (/journals/{issn}/works).
+
+        Returns:
+            dict: The decoded response, the works are stored under ["message"]["items"].
+        """
+        return await self._get(f"/journals/{issn}/works", self._build_params(
+            select, filter, limit, **kwargs))
+
+    def iter_journal_works(self, parser: JsonArrayStreamParser, issn: str,
+                           select: List[str] = None, filter: dict = None,
+                           limit: int = None, **kwargs):
+        """Like journal_works, but yields the works one at a time while the response is being received, so that
+            only a single work is decoded at any time.
+
+        Args:
+            parser (JsonArrayStreamParser): A new parser for ["message", "items"]; once all works have been
+                yielded, the rest of the response (e.g. "next-cursor") is in parser.document.
+            issn (str): The ISSN of the journal.
+
+        Returns:
+            AsyncIterator[dict]: The works.
+        """
+        return self._stream_items(f"/journals/{issn}/works", self._build_params(
+            select, filter, limit, **kwargs), parser)
+
+
+@register_repository
 class CrossrefRepository(AbstractRepository):
     """A class representing a connection to the CrossrefRepository.
     Implements all functions from AbstractRepository.
@@ -371,45 +639,66 @@ class CrossrefRepository(AbstractRepository):
 
     @property
     def api_endpoint(self):
-        raise NotImplementedError("Access via Habanero!")
+        return CrossrefClient.base_url
 
     _calculated = None
 
     @property
     def max_queries_per_second(self):
-        if CrossrefRepository._calculated is None:
-            cr = requests.head("https://api.crossref.org/")
-            CrossrefRepository._calculated = int(
-                cr.headers["x-rate-limit-limit"]) / int(
-                cr.headers["x-rate-limit-interval"][:-1]
-            )
+        # Learned from the x-rate-limit-* headers of normal responses (see _record_rate_limit), None before the
+        # first response. The QueryDelegator starts from the limit stored in the previous run or a default.
         return CrossrefRepository._calculated
 
-    def _execute_query_new_thread(self, query: AbstractQuery):
+    # Crossref ORs repeated doi filters
+    max_doi_batch_size = 20
+
+    # Crossref rarely has abstracts, so it is not asked for DOIs, only as the last resort for keyword queries
+    query_costs = {queries.KeywordQuery: 3.0,
+                   queries.ISSNTimeIntervalQuery: 1.0}
+    max_connections = 12
+
+    def _record_rate_limit(self, max_queries_per_second: float):
+        self.reported_max_queries_per_second = max_queries_per_second
+        CrossrefRepository._calculated = max_queries_per_second
+
+    async def execute_query(
+            self, query: AbstractQuery, session: ClientSession = None
+    ):
+        if session is None:
+            async with ClientSession() as session:
+                return await self.execute_query(query, session)
+
+        client = CrossrefClient(session, self._polite_pool_mail,
+                                self._record_rate_limit)
         if isinstance(query, queries.KeywordQuery):
             metadata = self._get_best_fit_metadata_from_response(
-                query, self._execute_keyword_query(query)
+                query, await self._execute_keyword_query(query, client)
             )
             return queries.Response(query_id=query.query_id, metadata=metadata)
 
         elif isinstance(query, queries.DoiQuery):
-            return self._execute_query_new_thread(
+            return await self.execute_query(
                 queries.KeywordQuery(
                     query_id=query.query_id, doi=query.doi_to_query
-                )
+                ), session
             )
         elif isinstance(query, queries.ISSNTimeIntervalQuery):
-            return self._execute_journal_time_interval_query(query)
+            return await self._execute_journal_time_interval_query(query, client)
 
         else:
             raise NotImplementedError()
 
-    async def execute_query(
-            self, query: AbstractQuery, session: ClientSession = None
-    ):
-        return await asyncio.get_running_loop().run_in_executor(
-            None, functools.partial(self._execute_query_new_thread, query)
-        )
+    async def execute_doi_batch(
+            self, doi_queries: List[queries.DoiQuery], session: ClientSession = None
+    ) -> Dict[int, queries.Response]:
+        client = CrossrefClient(session, self._polite_pool_mail,
+                                self._record_rate_limit)
+        response = await client.works(
+            select=self.to_select, limit=2 * len(doi_queries),
+            filter={"doi": [query.doi_to_query for query in doi_queries]})
+        return match_metadata_to_doi_queries(
+            doi_queries, [self._map_response_item_to_metadata(item)
+                          for item in response["message"]["items"]])
 
     naive_clean_abstract = re.compile(r"<jats:\w*>|</jats:\w*>")
 
@@ -466,95 +755,83 @@ class CrossrefRepository(AbstractRepository):
         else:  # TODO Improve
             return candidate_metadata[0]
 
-    def _execute_keyword_query(self, query):
-        cr = Crossref(mailto=self._polite_pool_mail)
+    to_select = [
+        "abstract",
+        "title",
+        "original-title",
+        "issue",
+        "short-title",
+        "DOI",
+        "issued",
+        "volume",
+        "author",
+        "URL",
+        "ISSN",
+        "publisher",
+    ]
 
+    async def _execute_keyword_query(self, query, client: CrossrefClient):
         if query.doi is not None:
             try:
-                response = cr.works(ids=query.doi)
-            except requests.exceptions.HTTPError as e:
+                return await client.work(query.doi)
+            except RepositoryHTTPError as e:
+                if e.status == 429 or e.status >= 500:
+                    raise
                 raise DataNotFoundError(
                     "DOI is invalid or not reachable from Crossref!"
                 ) from e
-        else:
-            to_select = [
-                "abstract",
-                "title",
-                "original-title",
-                "issue",
-                "short-title",
-                "DOI",
-                "issued",
-                "volume",
-                "author",
-                "URL",
-                "ISSN",
-                "publisher",
-            ]
-            kwargs = {}
-            if query.title is not None:
-                kwargs["query_bibliographic"] = query.title
-            if query.authors is not None:
-                kwargs["query_author"] = " ".join(
-                    [format_author(author) for author in query.authors]
-                )
-
-            filter = {"type": "journal-article"}
-            if query.start_date is not None:
-                filter["from-pub-date"] = query.start_date.isoformat()
-            if query.end_date is not None:
-                filter["until-pub-date"] = query.start_date.isoformat()
 
-            response = cr.works(
-                limit=5, **kwargs, select=to_select, filter=filter
+        kwargs = {}
+        if query.title is not None:
+            kwargs["query_bibliographic"] = query.title
+        if query.authors is not None:
+            kwargs["query_author"] = " ".join(
+                [format_author(author) for author in query.authors]
             )
 
-        if type(response) is list:
-            if len(response) == 0:
-                raise DataNotFoundError
-            else:
-                return response[0]
-        else:
-            return response
-
-    def _execute_journal_time_interval_query(self,
-                                             query: queries.ISSNTimeIntervalQuery):
-        cr = Crossref(mailto=self._polite_pool_mail)
-        to_select = [
-            "abstract",
-            "title",
-            "original-title",
-            "issue",
-            "short-title",
-            "DOI",
-            "issued",
-            "volume",
-            "author",
-            "URL",
-            "ISSN",
-            "publisher",
-        ]
-        kwargs = {}
-        if query.issn is not None:
-            kwargs["ids"] = [query.issn]
+        filter = {"type": "journal-article"}
+        if query.start_date is not None:
+            filter["from-pub-date"] = query.start_date.isoformat()
+        if query.end_date is not None:
+            filter["until-pub-date"] = query.start_date.isoformat()
+
+        return await client.works(
+            limit=5, **kwargs, select=self.to_select, filter=filter
+        )
 
+    # Crossref returns at most 1000 works per page
+    journal_page_size = 1000
+
+    async def _execute_journal_time_interval_query(self,
+                                                   query: queries.ISSNTimeIntervalQuery,
+                                                   client: CrossrefClient):
+        """Fetches the page of the query's interval at query.cursor (deep paging). The response carries the
+            cursor of the next page unless it is the last one.
+        """
         filters = {}
         if query.start_interval_date is not None:
             filters["from-pub-date"] = query.start_interval_date.isoformat()
         if query.end_interval_date is not None:
             filters["until-pub-date"] = query.end_interval_date.isoformat()
 
-        response = cr.journals(
-            limit=1000, **kwargs, works=True, select=to_select,
-            filter=filters)
+        # Pages are large (journal_page_size works with abstracts), so every work is mapped to ArticleMetadata
+        # as soon as it has been received instead of decoding the whole page first
+        parser = JsonArrayStreamParser(("message", "items"))
+        articles = [self._map_response_item_to_metadata(article)
+                    async for article in client.iter_journal_works(
+                        parser, query.issn, limit=self.journal_page_size,
+                        select=self.to_select, filter=filters,
+                        cursor=query.cursor)]
 
-        articles = response["message"]["items"]
+        next_cursor = parser.document["message"].get("next-cursor")
+        if len(articles) < self.journal_page_size:
+            next_cursor = None
 
         return queries.JournalDaterangeResponse(
-            query.query_id, [self._map_response_item_to_metadata(article)
-                             for article in articles])
+            query.query_id, articles, next_cursor)
 
 
+@register_repository
 class CoreRepository(AbstractRepository):
     """A class representing a connection to the CrossrefRepository.
     Implements all functions from AbstractRepository.
@@ -575,6 +852,14 @@ class CoreRepository(AbstractRepository):
     def max_queries_per_second(self):
         return 15  # !!! Couldn't actually find this info on the CORE website
 
+    # The search endpoint accepts a list of at most 100 queries per request
+    max_batch_size = 100
+
+    query_costs = {queries.KeywordQuery: 2.0, queries.DoiQuery: 2.0}
+    max_connections = 15
+    cache_ttl = 7 * 24 * 3600
+    max_doi_batch_size = max_batch_size
+
     async def execute_query(
             self, query: AbstractQuery, session: ClientSession = None
     ) -> queries.Response:
@@ -583,8 +868,9 @@ class CoreRepository(AbstractRepository):
             r = await session.post(
                 self.api_endpoint, data=search_body, params=search_params
             )
-            response = json.loads(await r.text())
-            metadata = self._response_to_metadata(response)
+            raise_for_status(r.status, r.headers)
+            response = await read_json(r)
+            metadata = self._response_to_metadata(response[0])
             return queries.Response(query_id=query.query_id, metadata=metadata)
 
         elif isinstance(query, queries.DoiQuery):
@@ -597,8 +883,77 @@ class CoreRepository(AbstractRepository):
                 f"{self.get_identifier()} does not support the query type {type(query)}"
             )
 
+    async def execute_batch(
+            self, batch: List[AbstractQuery], session: ClientSession = None
+    ) -> List[Union[queries.Response, Exception]]:
+        """Sends up to max_batch_size KeywordQueries and DoiQueries in a single search request.
+
+        Args:
+            batch (List[AbstractQuery]): The KeywordQueries and DoiQueries to answer.
+            session (ClientSession, optional): The aiohttp.ClientSession we are currently using. Defaults to None.
+
+        Raises:
+            ValueError: If the batch is larger than max_batch_size.
+            NotImplementedError: If the batch contains another query type.
+
+        Returns:
+            List[Union[queries.Response, Exception]]: Per position of batch, the response or the
+                DataNotFoundError for queries without a result.
+        """
+        if len(batch) > self.max_batch_size:
+            raise ValueError(f"{self.get_identifier()} accepts at most "
+                             f"{self.max_batch_size} queries per request")
+        (search_body, search_params) = self._kw_queries_to_params(
+            [self._as_keyword_query(query) for query in batch])
+        r = await session.post(
+            self.api_endpoint, data=search_body, params=search_params
+        )
+        raise_for_status(r.status, r.headers)
+        response = await read_json(r)
+
+        results = []
+        for position, query in enumerate(batch):
+            try:
+                metadata = self._response_to_metadata(response[position])
+                results.append(queries.Response(query_id=query.query_id,
+                                                metadata=metadata))
+            except (DataNotFoundError, IndexError, TypeError) as e:
+                results.append(e if isinstance(e, DataNotFoundError)
+                               else DataNotFoundError())
+        return results
+
+    async def execute_doi_batch(
+            self, doi_queries: List[queries.DoiQuery], session: ClientSession = None
+    ) -> Dict[int, queries.Response]:
+        return {result.query_id: result
+                for result in await self.execute_batch(doi_queries, session)
+                if isinstance(result, queries.Response)}
+
+    def _as_keyword_query(self, query: AbstractQuery) -> queries.KeywordQuery:
+        if isinstance(query, queries.KeywordQuery):
+            return query
+        if isinstance(query, queries.DoiQuery):
+            return queries.KeywordQuery(query_id=query.query_id,
+                                        doi=query.doi_to_query)
+        raise NotImplementedError(
+            f"{self.get_identifier()} does not support the query type {type(query)}"
+        )
+
     # converts an AbstractQuery into parameters for a search request.
     def _kw_query_to_params(self, query):
+        return self._kw_queries_to_params([query])
+
+    # converts KeywordQueries into the parameters of a single (batch) search request.
+    def _kw_queries_to_params(self, kw_queries):
+        search_body = json.dumps([self._kw_query_to_search_object(query)
+                                  for query in kw_queries])
+        search_params = {
+            "apiKey": self.api_key,
+        }
+        return (search_body, search_params)
+
+    # converts a KeywordQuery into one element of the search request body.
+    def _kw_query_to_search_object(self, query):
         query_elements = []
         if query.title is not None:
             query_elements.append(f'title:"{query.title}"')
@@ -613,18 +968,13 @@ class CoreRepository(AbstractRepository):
         if year_start is not None or year_end is not None:
             query_elements.append(f"year:[{year_start} TO {year_end}]")
         query_string = " AND ".join(query_elements)
-        queries = [
-            {"query": query_string, "page": 1, "pageSize": 10, "scrollId": ""}
-        ]
-        search_body = json.dumps(queries)
-        search_params = {
-            "apiKey": self.api_key,
-        }
-        return (search_body, search_params)
+        return {"query": query_string, "page": 1, "pageSize": 10,
+                "scrollId": ""}
 
+    # converts the result of one (batch) search element into metadata.
     def _response_to_metadata(self, response: dict):
         try:
-            top_result = response[0]["data"][0]
+            top_result = response["data"][0]
         except:
             raise DataNotFoundError()
         metadata_dict = {
@@ -652,3 +1002,138 @@ class CoreRepository(AbstractRepository):
         metadata_dict["publisher"] = default_top_result["publisher"]
 
         return queries.ArticleMetadata(**metadata_dict)
+
+
+@register_repository
+class OpenAlexRepository(AbstractRepository):
+    """A class representing a connection to OpenAlex, which indexes (most of) Crossref, Microsoft Academic Graph
+        and PubMed with abstracts.
+    Implements all functions from AbstractRepository.
+
+    DOIs are looked up in bulk: one request answers up to max_doi_batch_size of them.
+    """
+    _polite_pool_mail = ""
+
+    @staticmethod
+    def get_identifier():
+        return "openalex"
+
+    @property
+    def api_endpoint(self):
+        return "https://api.openalex.org/works"
+
+    @property
+    def max_queries_per_second(self):
+        return 10
+
+    # The doi filter accepts up to 50 values separated by "|"
+    max_doi_batch_size = 50
+
+    # Bulk lookups with abstracts, so OpenAlex is tried first for DOIs
+    query_costs = {queries.DoiQuery: 0.5, queries.KeywordQuery: 2.5}
+    max_connections = 10
+    cache_ttl = 7 * 24 * 3600
+
+    to_select = ["doi", "title", "publication_date", "authorships",
+                 "abstract_inverted_index", "biblio", "primary_location"]
+
+    doi_resolver = "https://doi.org/"
+
+    # Characters with a meaning in the filter syntax
+    filter_symbol_pattern = re.compile(r"[,|:]")
+
+    async def _request_works(self, session: ClientSession, filter: str, per_page: int) -> dict:
+        params = {"filter": filter, "per-page": str(per_page),
+                  "select": ",".join(self.to_select)}
+        if self._polite_pool_mail != "":
+            params["mailto"] = self._polite_pool_mail
+        resp = await session.get(self.api_endpoint, params=params)
+        raise_for_status(resp.status, resp.headers)
+        return await read_json(resp)
+
+    @staticmethod
+    def reconstruct_abstract(inverted_index: Optional[Dict[str, List[int]]]) -> Optional[str]:
+        """OpenAlex ships abstracts as inverted index (word -> positions); this restores the text.
+
+        Args:
+            inverted_index (Dict[str, List[int]]): The abstract_inverted_index of a work.
+
+        Returns:
+            str: The abstract or None if the work has none.
+        """
+        if not inverted_index:
+            return None
+        positioned = sorted((position, word)
+                            for word, positions in inverted_index.items()
+                            for position in positions)
+        return " ".join(word for _, word in positioned)
+
+    def _map_work_to_metadata(self, work: dict) -> queries.ArticleMetadata:
+        doi = work.get("doi")
+        if doi is not None and doi.startswith(self.doi_resolver):
+            doi = doi[len(self.doi_resolver):]
+        source = (work.get("primary_location") or {}).get("source") or {}
+        biblio = work.get("biblio") or {}
+        return queries.ArticleMetadata(
+            title=work.get("title"),
+            authors=[authorship["author"]["display_name"]
+                     for authorship in work.get("authorships") or []
+                     if authorship.get("author") is not None],
+            doi=doi,
+            publication_date=work.get("publication_date"),
+            abstract=self.reconstruct_abstract(work.get("abstract_inverted_index")),
+            repo_identifier=self.get_identifier(),
+            publisher=source.get("host_organization_name"),
+            journal_name=source.get("display_name"),
+            journal_volume=biblio.get("volume"),
+            journal_issue=biblio.get("issue"),
+            issn=source.get("issn_l"))
+
+    async def execute_doi_batch(
+            self, doi_queries: List[queries.DoiQuery], session: ClientSession = None
+    ) -> Dict[int, queries.Response]:
+        if session is None:
+            async with ClientSession() as session:
+                return await self.execute_doi_batch(doi_queries, session)
+        if len(doi_queries) > self.max_doi_batch_size:
+            raise ValueError(f"{self.get_identifier()} accepts at most "
+                             f"{self.max_doi_batch_size} DOIs per request")
+        response = await self._request_works(
+            session, "doi:" + "|".join(query.doi_to_query for query in doi_queries),
+            per_page=2 * len(doi_queries))
+        return match_metadata_to_doi_queries(
+            doi_queries, [self._map_work_to_metadata(work)
+                          for work in response["results"]])
+
+    async def execute_query(
+            self, query: AbstractQuery, session: ClientSession = None
+    ) -> queries.Response:
+        if session is None:
+            async with ClientSession() as session:
+                return await self.execute_query(query, session)
+
+        if isinstance(query, queries.KeywordQuery) and query.doi is None:
+            if query.title is None:
+                raise DataNotFoundError()
+            response = await self._request_works(
+                session, "title.search:" + self.filter_symbol_pattern.sub(
+                    " ", query.title), per_page=5)
+            metadata = get_metadata_best_fit_by_title(
+                [self._map_work_to_metadata(work) for work in response["results"]
+                 if work.get("title") is not None], query.title)
+            if metadata is None:
+                raise DataNotFoundError()
+            return queries.Response(query_id=query.query_id, metadata=metadata)
+
+        elif isinstance(query, (queries.KeywordQuery, queries.DoiQuery)):
+            doi = query.doi if isinstance(query, queries.KeywordQuery) \
+                else query.doi_to_query
+            responses = await self.execute_doi_batch(
+                [queries.DoiQuery(query.query_id, doi)], session)
+            if query.query_id not in responses:
+                raise DataNotFoundError()
+            return responses[query.query_id]
+        else:
+            raise NotImplementedError(
+                f"{self.get_identifier()} does not support the query type {type(query)}"
+            )
@@ -0,0 +1,95 @@
+from typing import Dict, Iterable, List, Tuple
+
+from yarl import URL
+
+
+class RepositoryRegistry:
+    """Holds the repositories the QueryDelegator can query, by identifier. Every repository declares what the
+        delegator needs to route to it (see AbstractRepository): the query types it answers and their relative
+        cost (query_costs), its connection limits, its bulk DOI lookup (max_doi_batch_size), its rate limit and
+        how long its responses may be cached.
+
+    Repositories register with the default registry at definition (@register_repository); a new source only
+    needs to be defined and imported, the delegator does not have to be edited.
+    """
+
+    def __init__(self, repositories: Iterable[type] = ()):
+        """
+        Args:
+            repositories (Iterable[type], optional): AbstractRepository subclasses to register. Defaults to ().
+        """
+        self._repositories: Dict[str, type] = {}
+        for repo_class in repositories:
+            self.register(repo_class)
+
+    def register(self, repo_class: type) -> type:
+        """Registers a repository under its identifier (replacing a repository with the same identifier). Can be
+            used as class decorator.
+
+        Args:
+            repo_class (type): The AbstractRepository subclass.
+
+        Returns:
+            type: repo_class
+        """
+        self._repositories[repo_class.get_identifier()] = repo_class
+        return repo_class
+
+    def unregister(self, repo_identifier: str):
+        self._repositories.pop(repo_identifier, None)
+
+    def __getitem__(self, repo_identifier: str) -> type:
+        return self._repositories[repo_identifier]
+
+    def __contains__(self, repo_identifier: str) -> bool:
+        return repo_identifier in self._repositories
+
+    def __iter__(self):
+        return iter(self._repositories)
+
+    def __len__(self):
+        return len(self._repositories)
+
+    def items(self):
+        return self._repositories.items()
+
+    def query_cost(self, repo_identifier: str, query_type: type):
+        """Returns the cost repo_identifier declared for query_type (or a base class of it), None if the
+            repository does not answer the query type.
+        """
+        for declared_type, cost in self._repositories[repo_identifier].query_costs.items():
+            if issubclass(query_type, declared_type):
+                return cost
+        return None
+
+    def repositories_for(self, query_type: type) -> List[str]:
+        """Returns the identifiers of the repositories that answer query_type, cheapest first. Ties keep the
+            order of registration.
+
+        Args:
+            query_type (type): The class of the query.
+
+        Returns:
+            List[str]: The repository identifiers in order of preference.
+        """
+        costs = [(self.query_cost(repo_identifier, query_type), repo_identifier)
+                 for repo_identifier in self._repositories]
+        return [repo_identifier for cost, repo_identifier in
+                sorted((pair for pair in costs if pair[0] is not None),
+                       key=lambda pair: pair[0])]
+
+    def max_connections(self, repo_identifier: str) -> int:
+        return self._repositories[repo_identifier].max_connections
+
+    def connection_bounds(self, repo_identifier: str) -> Tuple[int, int]:
+        return self._repositories[repo_identifier].connection_bounds
+
+    def cache_ttl_by_host(self) -> Dict[str, float]:
+        """Returns the time to live of cached responses by the host of each repository's api endpoint."""
+        return {URL(repo_class().api_endpoint).host: repo_class.cache_ttl
+                for repo_class in self._repositories.values()}
+
+
+# The repositories defined in repositories.py register here
+default_registry = RepositoryRegistry()
+register_repository = default_registry.register
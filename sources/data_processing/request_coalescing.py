@@ -0,0 +1,165 @@
+import asyncio
+import dataclasses
+import re
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .queries import AbstractQuery, DoiQuery, KeywordQuery, Response, \
+    FailedQueryResponse
+
+doi_prefix_pattern = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:)\s*",
+                                flags=re.IGNORECASE)
+non_alphanumeric_pattern = re.compile(r"[\W_]+")
+
+
+def normalise_doi(doi: str) -> str:
+    """Normalises a DOI (DOIs are case insensitive and often prefixed with a resolver).
+
+    Args:
+        doi (str): The raw DOI.
+
+    Returns:
+        str: The lower case DOI without resolver prefix or surrounding whitespace.
+    """
+    return doi_prefix_pattern.sub("", doi.strip()).lower()
+
+
+def coalescing_key(query: AbstractQuery) -> Optional[str]:
+    """Returns the key under which equivalent queries are coalesced: the normalised DOI if one is known and
+        otherwise the normalised title and authors of a KeywordQuery.
+
+    Args:
+        query (AbstractQuery): The query.
+
+    Returns:
+        str: The coalescing key or None if the query cannot be coalesced.
+    """
+    if isinstance(query, DoiQuery):
+        return "doi:" + normalise_doi(query.doi_to_query)
+    if isinstance(query, KeywordQuery):
+        if query.doi is not None and query.doi != "":
+            return "doi:" + normalise_doi(query.doi)
+        if query.title is not None and query.title != "":
+            title = non_alphanumeric_pattern.sub(" ", query.title.lower()).strip()
+            authors = sorted(non_alphanumeric_pattern.sub(" ", author.lower()).strip()
+                             for author in (query.authors or []))
+            return "kw:" + title + "|" + ";".join(authors)
+    return None
+
+
+def response_for_follower(follower: AbstractQuery, response: Response) -> Response:
+    """Copies the response of a leader query for an equivalent follower query: it carries the follower's
+        query_id and journal data.
+
+    Args:
+        follower (AbstractQuery): The coalesced query.
+        response (Response): The leader's response.
+
+    Returns:
+        Response: The follower's response.
+    """
+    if isinstance(response, FailedQueryResponse) or response.metadata is None:
+        return FailedQueryResponse(follower.query_id)
+    copy = Response(follower.query_id, dataclasses.replace(response.metadata))
+    copy.add_journal_data(follower.get_journal_data())
+    return copy
+
+
+class QueryCoalescer:
+    """Coalesces equivalent queries that are in flight at the same time. The first query with a given key becomes
+        the leader and is executed; later ones are attached to it as followers and receive a copy of the leader's
+        response (with their own query_id) once it completes.
+
+    Followers do not occupy a task while they wait, so slow termination (which waits for all tasks) cannot
+        deadlock on a leader that is waiting for a retry.
+    """
+
+    def __init__(self):
+        self._leader_keys: Dict[int, str] = {}
+        self._followers: Dict[str, List[AbstractQuery]] = {}
+        self.executed_queries = 0
+        self.coalesced_queries = 0
+
+    def admit(self, query: AbstractQuery) -> bool:
+        """Decides whether query must be executed. Returns False if it has been attached to an equivalent
+            in flight query instead.
+
+        Args:
+            query (AbstractQuery): A query about to be handled (possibly again after a retry).
+
+        Returns:
+            bool: True iff the query must be executed.
+        """
+        if query.query_id in self._leader_keys:
+            return True
+        key = coalescing_key(query)
+        if key is None:
+            return True
+        if key in self._followers:
+            self._followers[key].append(query)
+            self.coalesced_queries += 1
+            return False
+        self._leader_keys[query.query_id] = key
+        self._followers[key] = []
+        self.executed_queries += 1
+        return True
+
+    def complete(self, query: AbstractQuery, response: Response) -> List[Response]:
+        """Marks query as completed and returns the responses for all of its followers.
+
+        Args:
+            query (AbstractQuery): The completed query.
+            response (Response): Its final response.
+
+        Returns:
+            List[Response]: One response per follower.
+        """
+        key = self._leader_keys.pop(query.query_id, None)
+        if key is None:
+            return []
+        return [response_for_follower(follower, response)
+                for follower in self._followers.pop(key, [])]
+
+    def in_flight(self) -> int:
+        return len(self._leader_keys)
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers with the same key await the shared result."""
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.executed_calls = 0
+        self.coalesced_calls = 0
+
+    async def do(self, key: str, function: Callable[[], Awaitable]):
+        """Runs function unless a call with the same key is in flight, in which case its result is awaited.
+
+        Args:
+            key (str): The key identifying equivalent calls.
+            function (Callable[[], Awaitable]): Creates the awaitable to run.
+
+        Returns:
+            The result of the (shared) call. Exceptions are shared as well.
+        """
+        if key in self._in_flight:
+            self.coalesced_calls += 1
+            return await asyncio.shield(self._in_flight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.executed_calls += 1
+        try:
+            result = await function()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Avoid "exception was never retrieved" if nobody joined
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
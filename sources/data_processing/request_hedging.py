@@ -0,0 +1,114 @@
+import asyncio
+import collections
+import dataclasses
+import math
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+class LatencyWindow:
+    """A sliding window over the latencies of the most recent calls to a repository."""
+
+    def __init__(self, window_size: int = 200):
+        self._latencies = collections.deque(maxlen=window_size)
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def record(self, latency: float):
+        self._latencies.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Returns the q-th percentile (nearest rank) of the latencies in the window.
+
+        Args:
+            q (float): The percentile as a fraction in (0, 1].
+
+        Returns:
+            float: The latency in seconds or None if the window is empty.
+        """
+        if len(self._latencies) == 0:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+@dataclasses.dataclass
+class HedgingPolicy:
+    """Decides when a second (hedged) request is sent for a query whose first request is slow: once the primary
+        repository has not answered within the given percentile of its observed latency.
+    """
+    enabled: bool = False
+    percentile: float = 0.95
+    # Hedge only once the latency percentile is backed by enough observations
+    min_samples: int = 20
+    min_delay: float = 0.05
+
+    def hedge_delay(self, window: LatencyWindow) -> Optional[float]:
+        """Returns how long to wait for the primary request before hedging.
+
+        Args:
+            window (LatencyWindow): The recent latencies of the primary repository.
+
+        Returns:
+            float: The delay in seconds or None if the request must not be hedged.
+        """
+        if not self.enabled or len(window) < self.min_samples:
+            return None
+        return max(self.min_delay, window.percentile(self.percentile))
+
+
+@dataclasses.dataclass
+class RepositoryCall:
+    """The outcome of a single call to a repository: either a result or the error it raised."""
+    repo_identifier: str
+    result: Any = None
+    error: Optional[Exception] = None
+    latency: float = 0.0
+
+
+async def race_with_hedge(primary: Awaitable,
+                          start_hedge: Callable[[], Optional[Awaitable]],
+                          delay: float,
+                          is_valid: Callable[[Any], bool]) -> List:
+    """Awaits primary and, if it has not completed after delay seconds, additionally starts the hedge. Returns
+        as soon as one of them produces a valid outcome and cancels the other one.
+
+    The awaitables must return their outcome instead of raising. If the primary completes with an invalid outcome
+        before delay, no hedge is started.
+
+    Args:
+        primary (Awaitable): The primary call.
+        start_hedge (Callable[[], Optional[Awaitable]]): Creates the hedged call, may return None if there is
+            nothing to hedge with.
+        delay (float): How long (in s) to wait for the primary before hedging.
+        is_valid (Callable[[Any], bool]): Whether an outcome ends the race.
+
+    Returns:
+        List: The outcomes of all completed calls in completion order. The last one is valid, unless none is.
+    """
+    pending = {asyncio.ensure_future(primary)}
+    outcomes = []
+    hedged = False
+    try:
+        while len(pending) > 0:
+            done, pending = await asyncio.wait(
+                pending, timeout=None if hedged else delay,
+                return_when=asyncio.FIRST_COMPLETED)
+            if len(done) == 0:
+                hedged = True
+                hedge = start_hedge()
+                if hedge is not None:
+                    pending.add(asyncio.ensure_future(hedge))
+                continue
+            hedged = True
+            for task in done:
+                outcomes.append(task.result())
+                if is_valid(outcomes[-1]):
+                    return outcomes
+        return outcomes
+    finally:
+        for task in pending:
+            task.cancel()
+        if len(pending) > 0:
+            # Let the losers clean up (e.g. release their rate limiter slots)
+            await asyncio.wait(pending)
@@ -0,0 +1,329 @@
+import asyncio
+import json
+import re
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import ClientSession
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from sources.databases.http_response_cache_db import HTTPResponseCache
+
+charset_pattern = re.compile(r"charset=([\w-]+)", flags=re.IGNORECASE)
+
+
+class CachedStreamReader:
+    """Offers the body of a CachedResponse like aiohttp's StreamReader (resp.content)."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def iter_chunked(self, n: int):
+        body = memoryview(self._body)
+        for start in range(0, len(body), n):
+            yield bytes(body[start:start + n])
+
+
+class CachedResponse:
+    """A fully read HTTP response that offers the subset of aiohttp.ClientResponse used by the repositories."""
+
+    def __init__(self, status: int, headers, body: bytes, from_cache: bool = False):
+        self.status = status
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self._body = body
+        self.content = CachedStreamReader(body)
+        self.from_cache = from_cache
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("Content-Type", "application/octet-stream") \
+            .split(";")[0].strip().lower()
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        if encoding is None:
+            match = charset_pattern.search(self.headers.get("Content-Type", ""))
+            encoding = match.group(1) if match is not None else "utf-8"
+        return self._body.decode(encoding, errors="replace")
+
+    async def json(self, content_type=None, loads=json.loads):
+        return loads(await self.text())
+
+    def release(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class TeeStreamReader:
+    """Offers the body of a live aiohttp response like its StreamReader and keeps a copy of it for the cache,
+        as long as keep (called with the body received so far) has not rejected it.
+    """
+
+    # How much of the body is kept while keep cannot decide yet
+    max_undecided_bytes = 64 * 1024
+
+    def __init__(self, content, keep: Callable[[bytes], Optional[bool]],
+                 on_complete: Callable[[bytes], Awaitable[None]]):
+        """
+        Args:
+            content: The StreamReader of the live response.
+            keep (Callable[[bytes], Optional[bool]]): Whether the body is to be stored, None if undecided.
+            on_complete (Callable[[bytes], Awaitable[None]]): Called with the body once it has been read
+                completely, if it is to be stored.
+        """
+        self._content = content
+        self._keep = keep
+        self._on_complete = on_complete
+        self._body: Optional[bytearray] = bytearray()
+        self._kept: Optional[bool] = None
+
+    def _tee(self, chunk: bytes):
+        if self._body is None:
+            return
+        self._body.extend(chunk)
+        if self._kept is None:
+            self._kept = self._keep(bytes(self._body))
+        if self._kept is False or \
+                (self._kept is None and len(self._body) > self.max_undecided_bytes):
+            self._body = None
+
+    async def _complete(self):
+        if self._body is not None and self._kept:
+            await self._on_complete(bytes(self._body))
+        self._body = None
+
+    async def read(self) -> bytes:
+        body = await self._content.read()
+        self._tee(body)
+        await self._complete()
+        return body
+
+    async def iter_chunked(self, n: int):
+        async for chunk in self._content.iter_chunked(n):
+            self._tee(chunk)
+            yield chunk
+        await self._complete()
+
+
+class TeeResponse:
+    """A live aiohttp response whose body is copied into the cache while it is read (see TeeStreamReader)."""
+
+    def __init__(self, response, content: TeeStreamReader):
+        self._response = response
+        self.content = content
+        self.from_cache = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    async def read(self) -> bytes:
+        return await self.content.read()
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        return await CachedResponse(self.status, self.headers, await self.read()).text(encoding)
+
+    async def json(self, content_type=None, loads=json.loads):
+        return loads(await self.text())
+
+
+class _CachedRequestContextManager:
+    """Like aiohttp's request context manager, the request can be awaited or used with async with."""
+
+    def __init__(self, coro):
+        self._coro = coro
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    async def __aenter__(self) -> CachedResponse:
+        return await self._coro
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class _FirstPageContextManager:
+    """The request of the first page of a deep paging: a fresh stored page or the live response, copied into the
+        cache while it is read (see CachingSession.first_page_is_final).
+    """
+
+    def __init__(self, session: "CachingSession", method: str, url: str, kwargs: dict):
+        self._session = session
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._live = None
+
+    def __await__(self):
+        return self.__aenter__().__await__()
+
+    async def __aenter__(self):
+        response = await self._session._lookup_fresh(self._method, self._url, self._kwargs)
+        if response is not None:
+            return response
+        self._live = self._session._session.request(self._method, self._url, **self._kwargs)
+        return self._session._tee(await self._live.__aenter__(), self._method, self._url,
+                                  self._kwargs)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._live is not None:
+            await self._live.__aexit__(exc_type, exc_val, exc_tb)
+
+
+class CachingSession:
+    """Wraps an aiohttp ClientSession and answers requests from an HTTPResponseCache when possible.
+
+    Fresh responses are served from disk. Stale responses with an ETag or Last-Modified header are revalidated
+        with a conditional request, a 304 answer serves the stored body. Only 200 responses are stored. All
+        POST requests of the repositories are searches, so POSTs are cached like GETs.
+
+    Pages of Crossref's deep paging (requests with a cursor parameter) are not stored: cursors expire on the
+        server within minutes, so the next cursor in a stored page (or the page after an evicted one) would lead
+        to a request that fails or returns a different result set. The exception is a first page (cursor=*)
+        that holds the whole result set, it has no cursor to follow (see first_page_is_final).
+
+    Requests whose responses are not stored are passed through: they return the live aiohttp response, so that
+        its body can be streamed (e.g. with resp.content.iter_chunked) instead of being read into memory first.
+        First pages are streamed as well, a copy is only kept until it is clear that there are more pages.
+
+    Everything but request/get/post is delegated to the wrapped session.
+    """
+    cacheable_methods = {"GET", "POST"}
+    uncacheable_parameters = {"cursor"}
+    first_page_cursor = "*"
+    # Crossref reports the size of the result set before the items
+    total_results_pattern = re.compile(rb'"total-results"\s*:\s*(\d+)')
+
+    def __init__(self, session: ClientSession, cache: HTTPResponseCache):
+        self._session = session
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def is_cacheable(self, method: str, url: str, params: Optional[dict] = None) -> bool:
+        """Returns whether the response to a request may be stored and served from the cache."""
+        if method.upper() not in self.cacheable_methods:
+            return False
+        parameters = set(URL(url).query) | set(params or {})
+        return parameters.isdisjoint(self.uncacheable_parameters)
+
+    def is_first_page(self, method: str, url: str, params: Optional[dict] = None) -> bool:
+        """Returns whether a request asks for the first page of a deep paging (cursor=*)."""
+        parameters = {**URL(url).query, **(params or {})}
+        return method.upper() in self.cacheable_methods and \
+            parameters.get("cursor") == self.first_page_cursor
+
+    @classmethod
+    def first_page_is_final(cls, params: Optional[dict], body: bytes) -> Optional[bool]:
+        """Returns whether a first page holds the whole result set (fewer results than the requested rows), None
+            if body does not tell yet.
+        """
+        match = cls.total_results_pattern.search(body)
+        if match is None:
+            return None
+        rows = (params or {}).get("rows")
+        return rows is not None and int(match.group(1)) < int(rows)
+
+    def request(self, method: str, url, **kwargs):
+        url = str(url)
+        if self.is_first_page(method, url, kwargs.get("params")):
+            return _FirstPageContextManager(self, method, url, kwargs)
+        if not self.is_cacheable(method, url, kwargs.get("params")):
+            return self._session.request(method, url, **kwargs)
+        return _CachedRequestContextManager(self._request(method, url, **kwargs))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    async def _send(self, method, url, headers, **kwargs) -> CachedResponse:
+        async with self._session.request(method, url, headers=headers, **kwargs) as resp:
+            return CachedResponse(resp.status, resp.headers, await resp.read())
+
+    async def _lookup_fresh(self, method: str, url: str, kwargs: dict) -> Optional[CachedResponse]:
+        key_hash = self._cache.make_key(method, url, kwargs.get("params"), kwargs.get("data"))
+        entry = self._cache.lookup(key_hash)
+        if entry is None or not self._cache.is_fresh(entry):
+            return None
+        body = await asyncio.get_running_loop().run_in_executor(
+            None, self._cache.read_body, entry)
+        if body is None:
+            self._cache.discard(key_hash)
+            return None
+        self._cache.hits += 1
+        return CachedResponse(entry.status, entry.headers, body, True)
+
+    def _tee(self, response, method: str, url: str, kwargs: dict) -> TeeResponse:
+        self._cache.misses += 1
+        key_hash = self._cache.make_key(method, url, kwargs.get("params"), kwargs.get("data"))
+
+        def keep(body: bytes) -> Optional[bool]:
+            if response.status != 200:
+                return False
+            return self.first_page_is_final(kwargs.get("params"), body)
+
+        async def store(body: bytes):
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._cache.write_body, key_hash, body)
+            self._cache.add_entry(key_hash, URL(url).host, response.status,
+                                  dict(response.headers), len(body))
+
+        return TeeResponse(response, TeeStreamReader(response.content, keep, store))
+
+    async def _request(self, method: str, url: str, **kwargs) -> CachedResponse:
+        headers = dict(kwargs.pop("headers", None) or {})
+        loop = asyncio.get_running_loop()
+        key_hash = self._cache.make_key(method, url, kwargs.get("params"),
+                                        kwargs.get("data"))
+        entry = self._cache.lookup(key_hash)
+        if entry is not None and self._cache.is_fresh(entry):
+            body = await loop.run_in_executor(None, self._cache.read_body, entry)
+            if body is not None:
+                self._cache.hits += 1
+                return CachedResponse(entry.status, entry.headers, body, True)
+            self._cache.discard(key_hash)
+            entry = None
+
+        if entry is not None:
+            if entry.etag is not None:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified is not None:
+                headers["If-Modified-Since"] = entry.last_modified
+        response = await self._send(method, url, headers, **kwargs)
+
+        if response.status == 304 and entry is not None:
+            body = await loop.run_in_executor(None, self._cache.read_body, entry)
+            if body is not None:
+                self._cache.refresh(entry)
+                self._cache.revalidated += 1
+                # Keep the fresh headers (e.g. rate limits) of the 304
+                headers = CIMultiDict(entry.headers)
+                headers.update(response.headers)
+                return CachedResponse(entry.status, headers, body, True)
+            # The body vanished, ask again without conditions
+            self._cache.discard(key_hash)
+            for conditional_header in ("If-None-Match", "If-Modified-Since"):
+                headers.pop(conditional_header, None)
+            response = await self._send(method, url, headers, **kwargs)
+
+        self._cache.misses += 1
+        if response.status == 200:
+            body = await response.read()
+            await loop.run_in_executor(None, self._cache.write_body, key_hash,
+                                       body)
+            self._cache.add_entry(key_hash, URL(url).host, response.status,
+                                  dict(response.headers), len(body))
+        return response
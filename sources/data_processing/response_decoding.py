@@ -0,0 +1,107 @@
+import json
+import re
+from typing import Callable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ResponseDecodingError(ValueError):
+    """Raised when a repository response is not JSON (wrong content type or malformed body)."""
+
+    def __init__(self, message: str, content_type: Optional[str] = None):
+        super().__init__(message)
+        self.content_type = content_type
+
+
+# Content types under which the repositories serve JSON; a missing header is accepted as well.
+json_content_types = {"application/json", "text/json", "text/plain",
+                      "application/javascript"}
+
+# A backslash that starts a valid JSON escape or any other (invalid) backslash
+escape_pattern = re.compile(r'\\(["\\/bfnrt]|u[0-9a-fA-F]{4})?')
+
+# The decoder used by decode_json. orjson is considerably faster on large payloads, but optional
+# (orjson.JSONDecodeError subclasses json.JSONDecodeError).
+loads: Callable[[bytes], object] = orjson.loads if orjson is not None else json.loads
+
+
+def media_type(content_type: Optional[str]) -> Optional[str]:
+    """Returns the media type of a Content-Type header without its parameters (e.g. charset)."""
+    if content_type is None:
+        return None
+    return content_type.split(";")[0].strip().lower() or None
+
+
+def is_json_content_type(content_type: Optional[str]) -> bool:
+    media = media_type(content_type)
+    return media is None or media in json_content_types or media.endswith("+json")
+
+
+def repair_openaire_json(text: str) -> str:
+    """Repairs the malformation we see in OpenAIRE's JSON output, which is converted from XML without
+        escaping: stray backslashes (e.g. LaTeX in abstracts like "\\alpha") become escaped backslashes. Raw control
+        characters in strings, the other malformation, are accepted by decode_json's repair path.
+
+    Args:
+        text (str): The malformed JSON.
+
+    Returns:
+        str: JSON that the decoder accepts.
+    """
+    return escape_pattern.sub(
+        lambda match: match.group(0) if match.group(1) is not None else "\\\\",
+        text)
+
+
+def decode_json(body: bytes,
+                content_type: Optional[str] = None,
+                repair: Optional[Callable[[str], str]] = None):
+    """Decodes a JSON response body directly from bytes.
+
+    Args:
+        body (bytes): The raw response body.
+        content_type (str, optional): The Content-Type header of the response. Defaults to None.
+        repair (Callable[[str], str], optional): Applied to the body if it does not decode, the result is decoded
+            once more, this time accepting control characters in strings. Defaults to None.
+
+    Raises:
+        ResponseDecodingError: If the content type is not JSON or the body cannot be decoded (after repair).
+
+    Returns:
+        The decoded JSON document.
+    """
+    if not is_json_content_type(content_type):
+        raise ResponseDecodingError(
+            f"Expected a JSON response, got {media_type(content_type)}", content_type)
+    try:
+        return loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        if repair is None:
+            raise ResponseDecodingError(f"Malformed JSON response: {e}",
+                                        content_type) from e
+        error = e
+    try:
+        return json.loads(repair(body.decode("utf-8", errors="replace")),
+                          strict=False)
+    except json.JSONDecodeError as e:
+        raise ResponseDecodingError(f"Malformed JSON response: {error}",
+                                    content_type) from e
+
+
+async def read_json(resp, repair: Optional[Callable[[str], str]] = None):
+    """Reads and decodes the JSON body of an aiohttp (or cached) response.
+
+    Args:
+        resp: The response.
+        repair (Callable[[str], str], optional): See decode_json. Defaults to None.
+
+    Raises:
+        ResponseDecodingError: If the content type is not JSON or the body cannot be decoded.
+
+    Returns:
+        The decoded JSON document.
+    """
+    return decode_json(await resp.read(), resp.headers.get("Content-Type"), repair)
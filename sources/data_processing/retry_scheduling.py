@@ -0,0 +1,175 @@
+import asyncio
+import heapq
+import itertools
+import random
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import aiohttp
+
+from .queries import AbstractQuery
+from .repositories import DataNotFoundError, RateLimitedError, \
+    RepositoryHTTPError
+
+
+class RetryDecision:
+    """The possible reactions of the QueryDelegator to a failed repository call."""
+    RETRY_LATER = "retry_later"  # Retry the same repository after a delay
+    FALLTHROUGH = "fallthrough"  # Immediately try the next repository
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter for a class of errors.
+
+    The n-th retry (starting at 0) waits a uniformly random time in
+    [0, min(max_delay, base_delay * 2**n)]. If the repository sent a Retry-After
+    header we wait at least that long.
+    """
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    max_retries: int = 5
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Computes the time to wait before the next attempt.
+
+        Args:
+            attempt (int): How many times we have retried already.
+            retry_after (float, optional): The delay requested by the repository. Defaults to None.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        backoff = random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return retry_after + backoff * 0.1
+        return backoff
+
+
+class RetryClassifier:
+    """Maps the exceptions raised by AbstractRepository.execute_query to a RetryDecision and a delay.
+
+    Rate limiting (429) and transient failures (5xx, timeouts, connection errors) are retried on the same
+    repository with the corresponding policy until the query has used up its retries. Everything else,
+    in particular DataNotFoundError, falls through to the next repository immediately.
+    """
+
+    def __init__(self,
+                 rate_limit_policy: RetryPolicy = None,
+                 transient_policy: RetryPolicy = None):
+        self.rate_limit_policy = rate_limit_policy if rate_limit_policy is not None \
+            else RetryPolicy(base_delay=2.0, max_delay=120.0, max_retries=5)
+        self.transient_policy = transient_policy if transient_policy is not None \
+            else RetryPolicy(base_delay=1.0, max_delay=30.0, max_retries=3)
+
+    def policy_for(self, error: Exception) -> Optional[RetryPolicy]:
+        if isinstance(error, DataNotFoundError):
+            return None
+        if isinstance(error, RateLimitedError):
+            return self.rate_limit_policy
+        if isinstance(error, RepositoryHTTPError):
+            return self.transient_policy if error.status >= 500 else None
+        if isinstance(error, (asyncio.TimeoutError,
+                              aiohttp.ClientConnectionError)):
+            return self.transient_policy
+        return None
+
+    def classify(self, error: Exception, query: AbstractQuery):
+        """Decides how to react to error for the given query.
+
+        Args:
+            error (Exception): The exception raised by the repository.
+            query (AbstractQuery): The failed query (its retry_count is inspected, not modified).
+
+        Returns:
+            Tuple[str, float]: The RetryDecision and the delay in seconds (0 for FALLTHROUGH).
+        """
+        policy = self.policy_for(error)
+        if policy is None or query.retry_count >= policy.max_retries:
+            return RetryDecision.FALLTHROUGH, 0.0
+        retry_after = getattr(error, "retry_after", None)
+        return RetryDecision.RETRY_LATER, \
+            policy.compute_delay(query.retry_count, retry_after)
+
+
+class RetryScheduler:
+    """Holds delayed queries in a timer heap and resubmits them once they are due.
+
+    Only a single timer handle (for the earliest entry) is registered on the event loop at any time, so
+    delayed queries neither occupy the live delegation queue nor a task.
+
+    Note:
+        Must be used from within a running event loop.
+    """
+
+    def __init__(self, resubmit: Callable[[AbstractQuery], None]):
+        """
+        Args:
+            resubmit (Callable[[AbstractQuery], None]): Called with each query once its delay has passed.
+        """
+        self._resubmit = resubmit
+        self._heap = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_due = None
+        self._empty: Optional[asyncio.Event] = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _get_empty_event(self):
+        if self._empty is None:
+            self._empty = asyncio.Event()
+            if len(self._heap) == 0:
+                self._empty.set()
+        return self._empty
+
+    def schedule(self, query: AbstractQuery, delay: float):
+        """Resubmits query after delay seconds.
+
+        Args:
+            query (AbstractQuery): The query to retry.
+            delay (float): The delay in seconds.
+        """
+        loop = asyncio.get_running_loop()
+        due = loop.time() + max(0.0, delay)
+        heapq.heappush(self._heap, (due, next(self._counter), query))
+        self._get_empty_event().clear()
+        self._arm_timer(loop)
+
+    def _arm_timer(self, loop):
+        if len(self._heap) == 0:
+            return
+        due = self._heap[0][0]
+        if self._timer is not None:
+            if self._timer_due <= due:
+                return
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = loop.call_at(due, self._fire)
+
+    def _fire(self):
+        loop = asyncio.get_running_loop()
+        self._timer = None
+        now = loop.time()
+        while len(self._heap) > 0 and self._heap[0][0] <= now:
+            _, _, query = heapq.heappop(self._heap)
+            self._resubmit(query)
+        if len(self._heap) == 0:
+            self._get_empty_event().set()
+        else:
+            self._arm_timer(loop)
+
+    async def wait_until_empty(self):
+        """Waits until all delayed queries have been resubmitted."""
+        await self._get_empty_event().wait()
+
+    def cancel_all(self):
+        """Drops all delayed queries without resubmitting them."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._heap.clear()
+        if self._empty is not None:
+            self._empty.set()
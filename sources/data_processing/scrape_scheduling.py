@@ -0,0 +1,141 @@
+import asyncio
+import collections
+import contextlib
+from typing import Dict, Optional, Tuple
+
+from yarl import URL
+
+from .rate_limiting import RepositoryRateLimiter
+from .request_coalescing import normalise_doi
+
+
+def doi_prefix(doi: str) -> str:
+    """Returns the registrant prefix of a DOI (e.g. 10.1016), which mostly determines the publisher."""
+    return normalise_doi(doi).split("/")[0]
+
+
+def domain_of(url: str) -> Optional[str]:
+    """Returns the host of url without a leading www."""
+    host = URL(url).host
+    if host is None:
+        return None
+    return host[len("www."):] if host.startswith("www.") else host
+
+
+class DomainPolitenessScheduler:
+    """Spaces out the requests of the AbstractScraper per domain: every domain (doi.org, sciencedirect.com, ...)
+        has its own rate and connection limit, so that no single publisher is hammered.
+
+    Scrapes are interleaved across publishers. The landing domain of a DOI prefix is learned from the first DOI
+        with that prefix that resolves; afterwards, DOIs of the prefix wait for a slot of their domain before they
+        take one of the max_concurrency global slots. DOIs of a busy publisher therefore queue up without
+        blocking the DOIs of other publishers.
+
+    Like RepositoryRateLimiter, the scheduler may be constructed outside of the event loop it is used in.
+    """
+    default_max_requests_per_second = 2.0
+    default_max_connections = 2
+
+    # (max requests per second, max connections) of domains that tolerate more than the default
+    domain_limits: Dict[str, Tuple[float, int]] = {"doi.org": (10.0, 10)}
+
+    def __init__(self,
+                 max_concurrency: int = 10,
+                 domain_limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        """
+        Args:
+            max_concurrency (int, optional): How many DOIs are scraped at once (over all domains). Defaults to 10.
+            domain_limits (Dict[str, Tuple[float, int]], optional): Limits that replace the class' domain_limits.
+                Defaults to None.
+        """
+        self.max_concurrency = max_concurrency
+        if domain_limits is not None:
+            self.domain_limits = domain_limits
+        self._limiters: Dict[str, RepositoryRateLimiter] = {}
+        self._domain_slots: Dict[str, asyncio.Semaphore] = {}
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        self._prefix_domains: Dict[str, str] = {}
+        self.requests_by_domain = collections.Counter()
+
+    def get_limits(self, domain: str) -> Tuple[float, int]:
+        return self.domain_limits.get(domain, (self.default_max_requests_per_second,
+                                               self.default_max_connections))
+
+    def get_limiter(self, domain: str) -> RepositoryRateLimiter:
+        """Returns the rate limiter of a domain, creating it on first use.
+
+        Args:
+            domain (str): The domain (see domain_of).
+
+        Returns:
+            RepositoryRateLimiter: The limiter of the domain's requests.
+        """
+        if domain not in self._limiters:
+            # No bursts, requests to a domain are evenly spaced
+            self._limiters[domain] = RepositoryRateLimiter(*self.get_limits(domain),
+                                                           burst=1.0)
+        return self._limiters[domain]
+
+    def record_landing(self, doi: str, url: str):
+        """Remembers the domain a DOI resolved to as landing domain of its prefix.
+
+        Args:
+            doi (str): The resolved DOI.
+            url (str): The url of its landing page.
+        """
+        domain = domain_of(url)
+        if domain is not None:
+            self._prefix_domains[doi_prefix(doi)] = domain
+
+    def predict_domain(self, doi: str) -> Optional[str]:
+        """Returns the landing domain of the DOI's prefix or None if no DOI of the prefix has been resolved."""
+        return self._prefix_domains.get(doi_prefix(doi))
+
+    @contextlib.asynccontextmanager
+    async def doi_slot(self, doi: str):
+        """Waits until a DOI may be scraped: first for a slot of its predicted landing domain (if known), then
+            for one of the global slots.
+
+        Args:
+            doi (str): The DOI to scrape.
+        """
+        if self._global_slots is None:
+            self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        domain = self.predict_domain(doi)
+        if domain is None:
+            async with self._global_slots:
+                yield
+            return
+        if domain not in self._domain_slots:
+            self._domain_slots[domain] = asyncio.Semaphore(self.get_limits(domain)[1])
+        async with self._domain_slots[domain], self._global_slots:
+            yield
+
+    @contextlib.asynccontextmanager
+    async def request_slot(self, url: str):
+        """Waits until the domain of url may be requested (rate and connection limit) and holds the
+            connection slot while the request is open.
+
+        Args:
+            url (str): The url to request.
+        """
+        domain = domain_of(url)
+        if domain is None:
+            yield
+            return
+        async with self.get_limiter(domain):
+            self.requests_by_domain[domain] += 1
+            yield
+
+    def get_metrics(self) -> dict:
+        """Returns the number of requests and the learned prefixes by domain.
+
+        Returns:
+            dict: {domain: {"requests": int, "prefixes": List[str]}}
+        """
+        metrics = {domain: {"requests": requests, "prefixes": []}
+                   for domain, requests in self.requests_by_domain.items()}
+        for prefix, domain in self._prefix_domains.items():
+            metrics.setdefault(domain, {"requests": 0, "prefixes": []})[
+                "prefixes"].append(prefix)
+        return metrics
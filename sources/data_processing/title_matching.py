@@ -0,0 +1,99 @@
+import functools
+from collections import Counter
+from typing import List, Optional, Sequence
+
+import jellyfish
+
+
+@functools.lru_cache(maxsize=4096)
+def normalise_title(title: str) -> str:
+    return title.strip().lower()
+
+
+def best_fit_max_distance(candidate_title: str) -> int:
+    """The (exclusive) bound on the distance of a candidate title to be accepted as best fit."""
+    return 2 + len(candidate_title) // 20
+
+
+def approx_equal_max_distance(fst_string: str, snd_string: str, base_tolerance: int = 2) -> int:
+    """The (exclusive) bound on the distance of two strings to be approximately equal."""
+    return base_tolerance + (len(fst_string) + len(snd_string)) // 40
+
+
+class TitleMatcher:
+    """Compares one title against many candidates by the Damerau-Levenshtein distance of the normalised
+        (stripped, lower cased) strings.
+
+    The distance is only computed for candidates that pass two cheap lower bounds: the difference of the lengths
+        and the bag distance (the number of characters one string has in excess of the other). Both never exceed
+        the Damerau-Levenshtein distance, so rejecting on them does not change which candidates are accepted.
+    """
+
+    def __init__(self, title: str):
+        self.title = title
+        self._normalised = normalise_title(title)
+        self._characters = Counter(self._normalised)
+        self.computed_distances = 0
+
+    def distance(self, candidate: str, max_distance: int) -> Optional[int]:
+        """Returns the distance of candidate to the title if it is smaller than max_distance.
+
+        Args:
+            candidate (str): The candidate title.
+            max_distance (int): The exclusive bound on the distance.
+
+        Returns:
+            int: The distance or None if it is max_distance or larger.
+        """
+        normalised = normalise_title(candidate)
+        if abs(len(normalised) - len(self._normalised)) >= max_distance:
+            return None
+        characters = Counter(normalised)
+        excess = max(sum((characters - self._characters).values()),
+                     sum((self._characters - characters).values()))
+        if excess >= max_distance:
+            return None
+        self.computed_distances += 1
+        distance = jellyfish.damerau_levenshtein_distance(normalised,
+                                                          self._normalised)
+        return distance if distance < max_distance else None
+
+    def approx_equal(self, candidate: str, base_tolerance: int = 2) -> bool:
+        """See strings_approx_equal."""
+        return self.distance(candidate, approx_equal_max_distance(
+            self.title, candidate, base_tolerance)) is not None
+
+    def best_fit(self, candidates: Sequence[str]) -> Optional[int]:
+        """Returns the position of the candidate closest to the title among those within best_fit_max_distance
+            of their own length. Ties go to the first candidate; once a match is found, later candidates only
+            need to be checked against its distance.
+
+        Args:
+            candidates (Sequence[str]): The candidate titles.
+
+        Returns:
+            int: The position of the best fit or None if no candidate matches.
+        """
+        best_position, best_distance = None, None
+        for position, candidate in enumerate(candidates):
+            max_distance = best_fit_max_distance(candidate)
+            if best_distance is not None:
+                max_distance = min(max_distance, best_distance)
+            distance = self.distance(candidate, max_distance)
+            if distance is not None:
+                best_position, best_distance = position, distance
+                if distance == 0:
+                    break
+        return best_position
+
+    def score(self, candidates: Sequence[str], max_distance: int) -> List[Optional[int]]:
+        """Returns the distance of every candidate to the title, None for those at max_distance or further away.
+
+        Args:
+            candidates (Sequence[str]): The candidate titles.
+            max_distance (int): The exclusive bound on the distance.
+
+        Returns:
+            List[Optional[int]]: The distances by position of candidates.
+        """
+        return [self.distance(candidate, max_distance) for candidate in candidates]
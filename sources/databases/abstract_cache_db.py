@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from sources.data_processing.request_coalescing import normalise_doi
+
+
+class AbstractCache:
+    """The Database that stores the outcome of abstract scrapes by DOI, so that a re-sync does not scrape DOIs
+        again: the abstract of successful scrapes and, for scrapes that found nothing (paywalls, pages that need
+        JavaScript), a negative entry that expires after negative_ttl. Usage must always be done in combination
+        with the context pattern.
+
+    Entries map normalised DOIs (see normalise_doi, the keys of scrape coalescing) to {"abstract": Optional[str],
+        "landing_url": Optional[str], "updated": float (unix time)}.
+
+    Several instances may be open on the same file in one process (e.g. the delegator's and one of the DataFrame
+        helpers): on exit, each merges its entries into the stored ones (the latest scrape of a DOI wins) instead
+        of overwriting them.
+    """
+    document_path = Path(__file__).parent / "file_databases" / \
+                    "abstract_cache_untracked.json"
+
+    # How long (in s) a scrape that found no abstract is not repeated. Abstracts themselves do not expire.
+    negative_ttl = 30 * 24 * 3600
+
+    # Serialises the merge and write of all instances
+    _write_lock = threading.Lock()
+
+    def __init__(self, document_path: Optional[Path] = None, clock=time.time):
+        self._database_object = {}
+        self._clock = clock
+        if document_path is not None:
+            self.document_path = document_path
+
+    @staticmethod
+    def key_for(doi: str) -> str:
+        return normalise_doi(doi)
+
+    def record(self, doi: str, abstract: Optional[str], landing_url: Optional[str] = None):
+        """Stores the outcome of a scrape.
+
+        Args:
+            doi (str): The scraped DOI.
+            abstract (str): The abstract or None if the scrape found none.
+            landing_url (str, optional): The url the DOI resolved to. Defaults to None.
+        """
+        self._database_object[self.key_for(doi)] = {
+            "abstract": abstract if abstract else None,
+            "landing_url": landing_url,
+            "updated": self._clock()}
+
+    def get_entry(self, doi: str) -> Optional[dict]:
+        """Returns the stored outcome of the last scrape of a DOI.
+
+        Args:
+            doi (str): The DOI.
+
+        Returns:
+            dict: The entry ("abstract" is None for a negative entry) or None if the DOI has to be scraped, i.e.
+                it has not been scraped before or its negative entry has expired.
+        """
+        entry = self._database_object.get(self.key_for(doi))
+        if entry is None or (entry["abstract"] is None and
+                             self._clock() - entry["updated"] > self.negative_ttl):
+            return None
+        return entry
+
+    def get_landing_url(self, doi: str) -> Optional[str]:
+        """Returns the url the DOI resolved to when it was last scraped (also for expired entries)."""
+        entry = self._database_object.get(self.key_for(doi))
+        return entry["landing_url"] if entry is not None else None
+
+    def get_metrics(self) -> dict:
+        """Returns the number of stored abstracts and negative entries.
+
+        Returns:
+            dict: abstracts and negative_entries.
+        """
+        abstracts = sum(1 for entry in self._database_object.values()
+                        if entry["abstract"] is not None)
+        return {"abstracts": abstracts,
+                "negative_entries": len(self._database_object) - abstracts}
+
+    def _load(self) -> dict:
+        try:
+            with self.document_path.open("r") as f:
+                return json.load(f)
+        except Exception as e:
+            return {}
+
+    def __enter__(self):
+        self._database_object = self._load()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._database_object is None or len(self._database_object) == 0:
+            return
+        with self._write_lock:
+            for key, entry in self._load().items():
+                if key not in self._database_object or \
+                        entry["updated"] > self._database_object[key]["updated"]:
+                    self._database_object[key] = entry
+            tmp_path = self.document_path.with_suffix(".tmp")
+            with tmp_path.open("w") as f:
+                json.dump(self._database_object, f)
+            os.replace(tmp_path, self.document_path)
@@ -0,0 +1,259 @@
+import collections
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlsplit, urlencode
+
+
+@dataclass
+class CachedResponseEntry:
+    """The metadata of a cached response, its body is stored in a file named after key_hash."""
+    key_hash: str
+    host: str
+    status: int
+    stored_at: float
+    size: int
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("last-modified")
+
+
+class HTTPResponseCache:
+    """The Database that stores the HTTP responses of repository calls on disk, so that repeated syncs are served
+        locally. Usage must always be done in combination with the context pattern.
+
+    Responses are addressed by the hash of their normalised request (method, endpoint, parameters and body,
+        without credentials). Every host has its own time to live; stale responses with an ETag or Last-Modified
+        header can be revalidated with a conditional request. The total size of the stored bodies is bounded,
+        the least recently used responses are evicted first.
+    """
+    cache_directory = Path(__file__).parent / "file_databases" / \
+                      "http_response_cache_untracked"
+
+    # Parameters that identify us rather than the request
+    credential_parameters = {"apikey", "api_key", "mailto"}
+
+    def __init__(self,
+                 cache_directory: Optional[Path] = None,
+                 max_size_bytes: int = 256 * 1024 * 1024,
+                 ttl_by_host: Optional[Dict[str, float]] = None,
+                 default_ttl: float = 24 * 3600,
+                 clock=time.time):
+        """
+        Args:
+            cache_directory (Path, optional): Where bodies and the index are stored. Defaults to cache_directory.
+            max_size_bytes (int, optional): The bound on the total size of all bodies. Defaults to 256 MiB.
+            ttl_by_host (Dict[str, float], optional): The time to live (in s) of responses per host. Defaults to None.
+            default_ttl (float, optional): The time to live of responses from other hosts. Defaults to one day.
+            clock (Callable[[], float], optional): Wall clock, entries survive restarts. Defaults to time.time.
+        """
+        if cache_directory is not None:
+            self.cache_directory = cache_directory
+        self.max_size_bytes = max_size_bytes
+        self.ttl_by_host = dict(ttl_by_host or {})
+        self.default_ttl = default_ttl
+        self._clock = clock
+        # key_hash -> entry, least recently used first
+        self._entries: "collections.OrderedDict[str, CachedResponseEntry]" = \
+            collections.OrderedDict()
+        self._total_size = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    @property
+    def index_path(self) -> Path:
+        return self.cache_directory / "index.json"
+
+    @classmethod
+    def make_key(cls, method: str, url: str, params: Optional[dict] = None,
+                 data=None) -> str:
+        """Returns the hash of the normalised request: the host is lower cased, parameters (from the url and params)
+            are sorted and credentials dropped, JSON bodies are compared by their content.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The requested url.
+            params (dict, optional): The query parameters. Defaults to None.
+            data (optional): The request body. Defaults to None.
+
+        Returns:
+            str: The cache key.
+        """
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query) + [(str(key), str(value))
+                                          for key, value in (params or {}).items()]
+        query = sorted((key, value) for key, value in query
+                       if key.lower() not in cls.credential_parameters)
+        body = data if data is not None else ""
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", errors="replace")
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True)
+        except (TypeError, ValueError):
+            body = str(body)
+        normalised = "\n".join([method.upper(),
+                                parts.scheme.lower() + "://" + parts.netloc.lower()
+                                + (parts.path.rstrip("/") or "/"),
+                                urlencode(query), body])
+        return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key_hash: str) -> Path:
+        return self.cache_directory / f"{key_hash}.body"
+
+    def lookup(self, key_hash: str) -> Optional[CachedResponseEntry]:
+        """Returns the entry of a request (fresh or stale) and marks it as recently used.
+
+        Args:
+            key_hash (str): The key produced by make_key.
+
+        Returns:
+            CachedResponseEntry: The entry or None if the request has not been cached.
+        """
+        entry = self._entries.get(key_hash)
+        if entry is not None:
+            self._entries.move_to_end(key_hash)
+        return entry
+
+    def ttl_for(self, host: str) -> float:
+        return self.ttl_by_host.get(host, self.default_ttl)
+
+    def is_fresh(self, entry: CachedResponseEntry) -> bool:
+        return self._clock() - entry.stored_at < self.ttl_for(entry.host)
+
+    def read_body(self, entry: CachedResponseEntry) -> Optional[bytes]:
+        """Reads the body of an entry. Only touches the file, so it may run in an executor thread.
+
+        Returns:
+            bytes: The body or None if it could not be read (see discard).
+        """
+        try:
+            return self._body_path(entry.key_hash).read_bytes()
+        except OSError:
+            return None
+
+    def write_body(self, key_hash: str, body: bytes):
+        """Writes the body of a response atomically. Only touches the file, so it may run in an executor thread,
+            the entry must be added with add_entry afterwards.
+        """
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._body_path(key_hash).with_suffix(".tmp")
+        tmp_path.write_bytes(body)
+        os.replace(tmp_path, self._body_path(key_hash))
+
+    def store(self, key_hash: str, host: str, status: int, headers: Dict[str, str],
+              body: bytes) -> CachedResponseEntry:
+        """Stores a response (write_body and add_entry).
+
+        Args:
+            key_hash (str): The key produced by make_key.
+            host (str): The host that answered (selects the time to live).
+            status (int): The HTTP status.
+            headers (Dict[str, str]): The response headers.
+            body (bytes): The response body.
+
+        Returns:
+            CachedResponseEntry: The new entry.
+        """
+        self.write_body(key_hash, body)
+        return self.add_entry(key_hash, host, status, headers, len(body))
+
+    def add_entry(self, key_hash: str, host: str, status: int, headers: Dict[str, str],
+                  size: int) -> CachedResponseEntry:
+        """Indexes a response whose body has been written and evicts the least recently used responses while the
+            size bound is exceeded.
+
+        Returns:
+            CachedResponseEntry: The new entry.
+        """
+        if key_hash in self._entries:
+            self._total_size -= self._entries[key_hash].size
+        entry = CachedResponseEntry(
+            key_hash, host, status, self._clock(), size,
+            {key.lower(): value for key, value in headers.items()})
+        self._entries[key_hash] = entry
+        self._entries.move_to_end(key_hash)
+        self._total_size += entry.size
+        self._evict()
+        return entry
+
+    def refresh(self, entry: CachedResponseEntry):
+        """Restarts the time to live of an entry that has been revalidated (304 Not Modified)."""
+        entry.stored_at = self._clock()
+
+    def _evict(self):
+        while self._total_size > self.max_size_bytes and len(self._entries) > 1:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, key_hash: str):
+        """Removes a response from the cache."""
+        entry = self._entries.pop(key_hash, None)
+        if entry is None:
+            return
+        self._total_size -= entry.size
+        try:
+            self._body_path(key_hash).unlink()
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._total_size
+
+    @property
+    def hit_ratio(self) -> float:
+        """The share of requests answered with a locally stored body (fresh or revalidated)."""
+        requests = self.hits + self.revalidated + self.misses
+        return (self.hits + self.revalidated) / requests if requests > 0 else 0.0
+
+    def metrics(self) -> dict:
+        """Returns the cache statistics.
+
+        Returns:
+            dict: hits, revalidated, misses, hit_ratio, entries and size_bytes.
+        """
+        return {"hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "hit_ratio": self.hit_ratio,
+                "entries": len(self._entries),
+                "size_bytes": self._total_size}
+
+    def __enter__(self):
+        self._entries = collections.OrderedDict()
+        self._total_size = 0
+        try:
+            with self.index_path.open("r") as f:
+                stored = json.load(f)
+        except Exception as e:
+            stored = []
+        # The index is stored least recently used first
+        for raw_entry in stored:
+            try:
+                entry = CachedResponseEntry(**raw_entry)
+            except TypeError:
+                continue
+            if self._body_path(entry.key_hash).exists():
+                self._entries[entry.key_hash] = entry
+                self._total_size += entry.size
+        self._evict()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if len(self._entries) > 0:
+            with self.index_path.open("w") as f:
+                json.dump([asdict(entry) for entry in self._entries.values()],
+                          f)
@@ -0,0 +1,63 @@
+import json
+import time
+from pathlib import Path
+from typing import Optional
+
+
+class RepositoryRateLimits:
+    """The Database that stores the rate limits repositories reported (e.g. Crossref's x-rate-limit-* headers),
+        so that the QueryDelegator's rate limiters start from the last known limit instead of a default or a
+        probe request. Usage must always be done in combination with the context pattern.
+
+    Entries map repository identifiers to {"max_queries_per_second": float, "updated": float (unix time)}.
+    """
+    document_path = Path(__file__).parent / "file_databases" / \
+                    "repository_rate_limits_untracked.json"
+
+    # Limits older than this (in s) are not used anymore, the repository may have changed them.
+    max_age = 7 * 24 * 3600
+
+    def __init__(self, document_path: Optional[Path] = None, clock=time.time):
+        self._database_object = {}
+        self._clock = clock
+        if document_path is not None:
+            self.document_path = document_path
+
+    def record(self, repo_identifier: str, max_queries_per_second: float):
+        """Stores the limit a repository has reported.
+
+        Args:
+            repo_identifier (str): The repository.
+            max_queries_per_second (float): The reported limit.
+        """
+        self._database_object[repo_identifier] = {
+            "max_queries_per_second": max_queries_per_second,
+            "updated": self._clock()}
+
+    def get_max_queries_per_second(self, repo_identifier: str) -> Optional[float]:
+        """Returns the last limit the repository reported.
+
+        Args:
+            repo_identifier (str): The repository.
+
+        Returns:
+            float: The limit or None if there is none that is younger than max_age.
+        """
+        entry = self._database_object.get(repo_identifier)
+        if entry is None or self._clock() - entry["updated"] > self.max_age:
+            return None
+        return entry["max_queries_per_second"]
+
+    def __enter__(self):
+        try:
+            with self.document_path.open("r") as f:
+                self._database_object = json.load(f)
+        except Exception as e:
+            self._database_object = {}
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._database_object is not None \
+                and len(self._database_object) > 0:
+            with self.document_path.open("w") as f:
+                json.dump(self._database_object, f)
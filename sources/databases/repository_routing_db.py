@@ -0,0 +1,113 @@
+import json
+from pathlib import Path
+from typing import List, Optional
+
+
+class RepositoryRoutingStatistics:
+    """The Database that stores, per ISSN and per DOI prefix, how often each repository returned a usable
+        abstract and how long it took. The QueryDelegator uses it to route DoiQueries and KeywordQueries to the
+        repository with the lowest expected cost. Usage must always be done in combination with the context pattern.
+
+    Entries are keyed like "issn:0006-3207" or "prefix:10.1111" and map repository identifiers to
+        {"attempts": int, "successes": int, "total_latency": float}.
+    """
+    document_path = Path(__file__).parent / "file_databases" / \
+                    "repository_routing_statistics_untracked.json"
+
+    # Assumed latency (in s) of repositories without observations
+    default_latency = 2.0
+
+    def __init__(self, document_path: Optional[Path] = None):
+        self._database_object = {}
+        if document_path is not None:
+            self.document_path = document_path
+
+    @staticmethod
+    def keys_for(issn: Optional[str] = None, doi: Optional[str] = None) -> List[str]:
+        """Returns the statistic keys of an article, the most specific first.
+
+        Args:
+            issn (str, optional): The ISSN of the journal. Defaults to None.
+            doi (str, optional): The DOI of the article. Defaults to None.
+
+        Returns:
+            List[str]: The keys under which the article's statistics are stored.
+        """
+        keys = []
+        if issn is not None and issn != "":
+            keys.append(f"issn:{issn.strip()}")
+        if doi is not None and "/" in doi:
+            keys.append(f"prefix:{doi.strip().split('/')[0].lower()}")
+        return keys
+
+    def record(self, keys: List[str], repo_identifier: str, success: bool, latency: float):
+        """Records the outcome of a query for all given keys.
+
+        Args:
+            keys (List[str]): The keys produced by keys_for.
+            repo_identifier (str): The repository that was queried.
+            success (bool): Whether the repository returned a usable abstract.
+            latency (float): The duration of the query in seconds.
+        """
+        for key in keys:
+            entry = self._database_object.setdefault(key, {}).setdefault(
+                repo_identifier,
+                {"attempts": 0, "successes": 0, "total_latency": 0.0})
+            entry["attempts"] += 1
+            entry["successes"] += 1 if success else 0
+            entry["total_latency"] += latency
+
+    def get_statistics(self, key: str, repo_identifier: str) -> Optional[dict]:
+        return self._database_object.get(key, {}).get(repo_identifier)
+
+    def expected_cost(self, keys: List[str], repo_identifier: str) -> float:
+        """Returns the expected time spent per usable abstract when querying repo_identifier, i.e. the expected
+            latency divided by the (Laplace smoothed) success probability. Statistics of the most specific key
+            that has observations for the repository are used.
+
+        Args:
+            keys (List[str]): The keys produced by keys_for.
+            repo_identifier (str): The repository to rate.
+
+        Returns:
+            float: The expected cost, lower is better.
+        """
+        stats = next((self.get_statistics(key, repo_identifier) for key in keys
+                      if self.get_statistics(key, repo_identifier) is not None),
+                     None)
+        if stats is None or stats["attempts"] == 0:
+            return self.default_latency / 0.5
+        success_probability = (stats["successes"] + 1) / (stats["attempts"] + 2)
+        mean_latency = stats["total_latency"] / stats["attempts"]
+        return mean_latency / success_probability
+
+    def rank_repositories(self, keys: List[str], repositories: List[str]) -> List[str]:
+        """Orders repositories by their expected cost. Trying repositories in ascending order of
+            latency / success probability minimises the expected time until a usable abstract is found.
+            Ties keep the order of repositories.
+
+        Args:
+            keys (List[str]): The keys produced by keys_for.
+            repositories (List[str]): The repositories to rank in their static order of preference.
+
+        Returns:
+            List[str]: The ranked repositories.
+        """
+        if len(keys) == 0:
+            return list(repositories)
+        return sorted(repositories,
+                      key=lambda repo: self.expected_cost(keys, repo))
+
+    def __enter__(self):
+        try:
+            with self.document_path.open("r") as f:
+                self._database_object = json.load(f)
+        except Exception as e:
+            self._database_object = {}
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._database_object is not None \
+                and len(self._database_object) > 0:
+            with self.document_path.open("w") as f:
+                json.dump(self._database_object, f)
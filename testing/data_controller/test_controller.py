@@ -1,10 +1,14 @@
+import collections
 import itertools
 from datetime import date
+from queue import Full
 
 import pytest
 
+from sources.data_controller import controller
 from sources.data_controller.controller import QueryDispatcher
-from sources.data_processing.queries import ISSNTimeIntervalQuery
+from sources.data_processing.queries import ISSNTimeIntervalQuery, \
+    JournalDaterangeResponse, ArticleMetadata, Response
 from sources.databases.daterange_util import Daterange
 
 
@@ -71,3 +75,64 @@ def test_user_query_pipeline_works(sample_user_query):
                                                      print("finished\n"), 100)
 
     assert len(scraped_articles) > 0
+
+
+class RefusingPaperScraper:
+    """Answers every query at once and refuses delegations (Full) while max_unpolled responses were not polled."""
+
+    max_unpolled = 3
+
+    def __init__(self):
+        self.unpolled = collections.deque()
+        self.buffered = 0
+        self.query_ids = set()
+        self.refusals = 0
+
+    def delegate_query(self, query):
+        if len(self.unpolled) >= self.max_unpolled:
+            self.buffered = len(self.unpolled)
+            self.refusals += 1
+            raise Full
+        self.query_ids.add(query.query_id)
+        if isinstance(query, ISSNTimeIntervalQuery):
+            articles = [ArticleMetadata(title="t", authors=[], doi=f"10.1/{query.query_id}-{i}",
+                                        publication_date="2018", abstract=None, repo_identifier="test")
+                        for i in range(4)]
+            self.unpolled.append(JournalDaterangeResponse(query.query_id, articles))
+        else:
+            self.unpolled.append(Response(query.query_id, ArticleMetadata(
+                title="t", authors=[], doi=query.doi_to_query, publication_date="2018", abstract="a",
+                repo_identifier="test")))
+
+    def poll_response(self):
+        response = self.unpolled.popleft()
+        self.buffered = max(self.buffered - 1, 0)
+        self.query_ids.remove(response.query_id)
+        return response
+
+    def buffered_qsize(self):
+        return self.buffered
+
+    @property
+    def processed_all_queries(self):
+        return len(self.query_ids) == 0 and len(self.unpolled) == 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def test_refused_delegations_are_retried_after_polling(monkeypatch):
+    scrapers = []
+    monkeypatch.setattr(controller, "PaperScraper",
+                        lambda: scrapers.append(RefusingPaperScraper()) or scrapers[-1])
+    g_query_id = itertools.count()
+    queries = [ISSNTimeIntervalQuery(next(g_query_id), "555-555", date(2018, 1, 1), date(2018, 3, 7))
+               for _ in range(5)]
+
+    scraped_articles = QueryDispatcher._scrape_queries_with_paperscraper(queries, g_query_id, None, 100)
+
+    assert scrapers[0].refusals > 0
+    assert len(scraped_articles) == 20
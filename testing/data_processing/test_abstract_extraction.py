@@ -0,0 +1,173 @@
+import pytest
+
+from sources.data_processing.abstract_extraction import \
+    AbstractExtractorRegistry, StreamingAbstractExtractor, XPathExtractor, \
+    anchor_branches, clean_text, default_extractors, json_ld_abstract, meta_extractor, \
+    page_text_length, parse_html
+
+abstract = "Urban bat populations decline with artificial light at night, " \
+           "but dark corridors mitigate the effect."
+
+
+def page(head="", body=""):
+    return f"<html><head><title>Paper</title>{head}</head><body>{body}</body></html>"
+
+
+class TestParsing:
+    def test_parse_html(self):
+        tree = parse_html('<?xml version="1.0" encoding="iso-8859-1"?>'
+                          + page(body="<p>Café</p>"))
+        assert tree.xpath("//p")[0].text == "Café"
+        assert parse_html("").tag == "html"
+
+    def test_page_text_length(self):
+        tree = parse_html(page("<script>var x = 'long script';</script>",
+                               "<p>12345</p>"))
+        assert page_text_length(tree) == len("Paper12345")
+
+    def test_clean_text(self):
+        assert clean_text("  Abstract:\n  The   text ") == "The text"
+        assert clean_text("Summary The text") == "The text"
+
+
+class TestExtractors:
+    def test_meta_tags(self):
+        tree = parse_html(page(f'<meta name="DC.Description" content="{abstract}">'
+                               f'<meta name="citation_abstract" '
+                               f'content="&lt;p&gt;Abstract {abstract}&lt;/p&gt;">'))
+        assert meta_extractor("citation_abstract")(tree) == abstract
+        assert meta_extractor("dcterms.abstract", "dc.description")(tree) == abstract
+        assert meta_extractor("dcterms.abstract")(tree) is None
+
+    def test_json_ld(self):
+        tree = parse_html(page(
+            '<script type="application/ld+json">{"@graph": [{"@type": "WebPage", '
+            '"description": "A page"}, {"@type": "ScholarlyArticle", '
+            f'"description": "{abstract}"}}]}}</script>'
+            '<script type="application/ld+json">not json</script>'))
+        assert json_ld_abstract(tree) == abstract
+        assert json_ld_abstract(parse_html(page())) is None
+
+    def test_xpath_extractor_joins_paragraphs(self):
+        extractor = XPathExtractor("//div[@id='abs']/p", name="test")
+        tree = parse_html(page(body="<div id='abs'><p>First.</p>\n<p>Second.</p></div>"))
+        assert extractor(tree) == "First. Second."
+        assert extractor.name == "test"
+
+
+class TestAbstractExtractorRegistry:
+    @pytest.mark.parametrize("url, body", [
+        ("https://www.sciencedirect.com/science/article/pii/1",
+         f"<div class='abstract author' id='ab1'><h2>Abstract</h2><div>{abstract}</div></div>"),
+        ("https://link.springer.com/article/10.1007/1",
+         f"<section data-title='Abstract'><h2>Abstract</h2>"
+         f"<div class='c-article-section__content'><p>{abstract}</p></div></section>"),
+        ("https://besjournals.onlinelibrary.wiley.com/doi/10.1111/1",
+         f"<section class='article-section article-section__abstract'><h2>Abstract</h2>"
+         f"<div class='article-section__content en main'><p>{abstract}</p></div></section>"),
+        ("https://www.tandfonline.com/doi/full/10.1080/1",
+         f"<div class='abstractSection abstractInFull'><p>{abstract}</p></div>"),
+        ("https://journals.plos.org/plosone/article?id=1",
+         f"<div class='abstract toc-section'><div class='abstract-content'><p>{abstract}</p></div></div>"),
+    ])
+    def test_publisher_selectors(self, url, body):
+        registry = AbstractExtractorRegistry(fallback=None)
+        for extractor in default_extractors.extractors_for(url):
+            registry.register("example.org", extractor)
+        assert registry.extract(parse_html(page(body=body)),
+                                "https://example.org/x") == abstract
+        assert registry.hits["miss"] == 0
+
+    def test_order_and_subdomains(self):
+        registry = AbstractExtractorRegistry(
+            metadata_extractors=[meta_extractor("citation_abstract")])
+        registry.register("example.org", XPathExtractor("//p[@id='general']", name="general"))
+        registry.register("journals.example.org", XPathExtractor("//p[@id='journals']",
+                                                                 name="journals"))
+        tree = parse_html(page(f'<meta name="citation_abstract" content="{abstract}">',
+                               f"<p id='journals'>{abstract} journals</p>"
+                               f"<p id='general'>{abstract} general</p>"))
+
+        assert registry.extract(tree, "https://journals.example.org/a").endswith("journals")
+        assert registry.extract(tree, "https://www.example.org/a").endswith("general")
+        assert registry.extract(tree, "https://other.org/a") == abstract
+        assert registry.hits == {"journals": 1, "general": 1,
+                                 "meta citation_abstract": 1}
+
+    def test_short_candidates_and_fallback(self):
+        registry = AbstractExtractorRegistry(
+            metadata_extractors=[meta_extractor("citation_abstract")])
+        tree = parse_html(page('<meta name="citation_abstract" content="Too short">',
+                               f"<h2>Abstract</h2><p>{abstract}</p>"))
+        assert registry.extract(tree) == abstract
+        assert registry.extract(parse_html(page(body="<p>Nothing</p>"))) is None
+        assert registry.hits == {"fallback": 1, "miss": 1}
+
+
+class TestStreamingAbstractExtractor:
+    @staticmethod
+    def chunks(text, size):
+        data = text.encode("utf-8")
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def test_confirmed_once_element_is_closed(self):
+        registry = AbstractExtractorRegistry(fallback=None)
+        registry.register("example.org", XPathExtractor("//div[@id='abs']", name="abs"))
+        filler = "<p>" + "Filler text. " * 1000 + "</p>"
+        chunks = self.chunks(page(body=f"<div id='abs'><p>{abstract}</p></div>{filler}"),
+                             len(abstract) // 2)
+        extractor = StreamingAbstractExtractor(registry, "https://example.org/a")
+
+        fed = 0
+        while extractor.feed(chunks[fed]) is None:
+            fed += 1
+            # The abstract is never returned before its element is complete
+            assert fed < 10
+        assert extractor.abstract == abstract
+        assert extractor.parsed_bytes < len(filler)
+        assert registry.hits == {"abs": 1}
+        assert extractor.close().find("body") is not None
+
+    def test_metadata_waits_for_head_and_domain_extractors(self):
+        registry = AbstractExtractorRegistry(
+            metadata_extractors=[meta_extractor("citation_abstract"),
+                                 meta_extractor("dc.description")], fallback=None)
+        text = page(f'<meta name="dc.description" content="{abstract} (dc)">'
+                    f'<meta name="citation_abstract" content="{abstract}">',
+                    "<p>" + "Filler text. " * 1000 + "</p>")
+
+        extractor = StreamingAbstractExtractor(registry, "https://example.org/a")
+        results = [extractor.feed(chunk) for chunk in self.chunks(text, 100)]
+        # citation_abstract takes precedence, even though dc.description comes first
+        assert results[-1] == abstract
+        assert extractor.parsed_bytes < len(text)
+
+        # A domain with extractors of its own: only the complete page decides
+        registry.register("example.org", XPathExtractor("//div[@id='abs']"))
+        extractor = StreamingAbstractExtractor(registry, "https://example.org/a")
+        assert all(extractor.feed(chunk) is None for chunk in self.chunks(text, 100))
+        assert registry.extract(extractor.close(), "https://example.org/a") == abstract
+
+    def test_anchor_branches(self):
+        branches = anchor_branches("//section[@data-title='A/B']//div[@class='c'] | "
+                                   "//div[@id='abs']")
+        assert [(tag, literals) for tag, literals, _, _ in branches] == \
+               [("section", ["A/B"]), ("div", ["abs"])]
+        section = parse_html(page(body="<section data-title='A/B'><div class='c'>x</div>"
+                                       "</section>")).find(".//section")
+        _, _, is_anchor, relative = branches[0]
+        assert is_anchor(section) and [e.text for e in relative(section)] == ["x"]
+        assert not branches[1][2](section)
+        assert anchor_branches("(//meta[@name='a']/@content)[1]") is None
+        # Literals compared to text (or negated) say nothing about the attributes
+        assert anchor_branches("//section[h2='Abstract']")[0][1] is None
+        assert anchor_branches("//div[not(@id='x')]")[0][1] is None
+
+    def test_only_anchored_extractors_stream(self):
+        registry = AbstractExtractorRegistry(fallback=None)
+        registry.register("example.org", XPathExtractor("(//div[@id='abs'])[1]"))
+        text = page(body=f"<div id='abs'>{abstract}</div>" + "<p>Filler text.</p>" * 500)
+
+        extractor = StreamingAbstractExtractor(registry, "https://example.org/a")
+        assert all(extractor.feed(chunk) is None for chunk in self.chunks(text, 1000))
+        assert registry.extract(extractor.close(), "https://example.org/a") == abstract
@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from sources.data_processing.abstract_extraction import parse_html
+from sources.data_processing.abstract_webscraping import AbstractScraper, \
+    async_get_abstract_from_doi, find_redirect_url, springer_article_url
+from sources.data_processing.scrape_scheduling import DomainPolitenessScheduler
+from sources.databases.abstract_cache_db import AbstractCache
+
+filler = "<p>" + "Some text of the landing page. " * 10 + "</p>"
+large_abstract = "An abstract in the meta tags of a large page, long enough to count."
+
+
+def landing_page(abstract):
+    return f"<html><head><title>Paper</title></head><body>{filler}" \
+           f"<h2>Abstract</h2><p>{abstract}</p>{filler}</body></html>"
+
+
+class TestRedirectRules:
+    def test_springer_article_url(self):
+        assert springer_article_url("https://link.springer.com/10.1007/x") == \
+               "https://link.springer.com/article/10.1007/x"
+        assert springer_article_url(
+            "https://link.springer.com/article/10.1007/x") is None
+        assert springer_article_url("https://example.org/10.1007/x") is None
+
+    def test_find_redirect_url(self):
+        head_redirect = parse_html(
+            "<html><head><meta content='0;URL=/x?Redirect=https%3A%2F%2Fexample.org%2Fa;'>"
+            "</head><body></body></html>")
+        assert find_redirect_url(head_redirect) == "https://example.org/a"
+
+        body_redirect = parse_html(
+            "<html><head></head><body>"
+            "<input id='redirectURL' value='https%3A%2F%2Fexample.org%2Fb'>"
+            "</body></html>")
+        assert find_redirect_url(body_redirect) == "https://example.org/b"
+        assert find_redirect_url(parse_html("<html><body></body></html>")) is None
+
+
+class TestAbstractScraper:
+    @pytest.fixture
+    def server(self, event_loop):
+        requests_seen = []
+        active = [0, 0]
+
+        async def resolve(request):
+            requests_seen.append(request.path)
+            active[0] += 1
+            active[1] = max(active)
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            doi = request.match_info["doi"]
+            if doi == "redirect":
+                raise web.HTTPFound("/js-redirect")
+            if doi == "challenge":
+                return web.Response(status=503, headers={"Server": "cloudflare"})
+            raise web.HTTPFound(f"/landing/{doi}")
+
+        async def landing(request):
+            requests_seen.append(request.path)
+            if "visited" not in request.cookies:
+                # The publisher sets a session cookie on the first visit
+                resp = web.Response(text=landing_page(request.match_info["name"]),
+                                    content_type="text/html")
+                resp.set_cookie("visited", "1")
+                return resp
+            return web.Response(text=landing_page("again"),
+                                content_type="text/html")
+
+        async def large(request):
+            requests_seen.append(request.path)
+            return web.Response(
+                text=f'<html><head><meta name="citation_abstract" content="{large_abstract}">'
+                     f'</head><body>{filler * 2000}</body></html>',
+                content_type="text/html")
+
+        async def js_redirect(request):
+            requests_seen.append(request.path)
+            target = server.make_url("/landing/redirected")
+            return web.Response(
+                text=f"<html><head><script>location='?Redirect={target};'</script>"
+                     f"</head><body>Redirecting</body></html>",
+                content_type="text/html")
+
+        app = web.Application()
+        app.router.add_get("/doi/10.1/{doi}", resolve)
+        app.router.add_get("/landing/{name}", landing)
+        app.router.add_get("/js-redirect", js_redirect)
+        app.router.add_get("/large", large)
+        # A host name, aiohttp does not keep cookies of IP addresses
+        server = TestServer(app, host="localhost")
+        event_loop.run_until_complete(server.start_server())
+        server.requests_seen = requests_seen
+        server.active = active
+        yield server
+        event_loop.run_until_complete(server.close())
+
+    @pytest.fixture
+    def scraper(self, server, monkeypatch):
+        monkeypatch.setattr(AbstractScraper, "doi_resolver",
+                            str(server.make_url("/doi/")))
+        scheduler = DomainPolitenessScheduler(
+            max_concurrency=2, domain_limits={"localhost": (1000.0, 10)})
+        return AbstractScraper(challenge_fallback=False, scheduler=scheduler)
+
+    def test_redirects_are_followed(self, event_loop, server, scraper):
+        async def run():
+            async with scraper:
+                return await scraper.get_abstract("10.1/first"), \
+                       await scraper.get_abstract("10.1/redirect")
+
+        assert event_loop.run_until_complete(run()) == ("first", "again")
+        assert server.requests_seen == ["/doi/10.1/first", "/landing/first",
+                                        "/doi/10.1/redirect", "/js-redirect",
+                                        "/landing/redirected"]
+        assert scraper.fetched_pages == 3
+        # Every redirect hop is a request of its own
+        assert scraper.scheduler.requests_by_domain["localhost"] == 5
+        assert scraper.scheduler.predict_domain("10.1/other") == "localhost"
+
+    def test_challenge_without_fallback(self, event_loop, scraper):
+        async def run():
+            async with scraper:
+                return await async_get_abstract_from_doi("10.1/challenge",
+                                                         scraper)
+
+        assert event_loop.run_until_complete(run()) is None
+
+    def test_bounded_concurrency(self, event_loop, server, scraper):
+        async def run():
+            async with scraper:
+                return await asyncio.gather(
+                    *(scraper.get_abstract(f"10.1/{i}") for i in range(5)))
+
+        assert all(event_loop.run_until_complete(run()))
+        assert scraper.scraped_dois == 5
+        # At most max_concurrency DOIs are resolved at the same time
+        assert server.active[1] == 2
+
+    def test_download_stops_at_abstract(self, event_loop, server, scraper):
+        async def run():
+            async with scraper:
+                return await scraper._fetch(str(server.make_url("/large")))
+
+        url, tree, abstract = event_loop.run_until_complete(run())
+        assert abstract == large_abstract
+        assert scraper.stopped_downloads == 1
+        assert scraper.read_bytes <= scraper.stream_chunk_size
+
+    def test_cached_outcomes_are_not_scraped_again(self, event_loop, server,
+                                                   scraper, tmp_path):
+        scraper.cache = AbstractCache(tmp_path / "abstracts.json")
+
+        async def run():
+            async with scraper:
+                return [await scraper.get_abstract(doi) for doi in
+                        ["10.1/first", "10.1/challenge", "10.1/FIRST",
+                         "10.1/challenge"]]
+
+        assert event_loop.run_until_complete(run()) == ["first", None, "first",
+                                                        None]
+        assert server.requests_seen == ["/doi/10.1/first", "/landing/first",
+                                        "/doi/10.1/challenge"]
+        assert scraper.scraped_dois == 2
+        assert scraper.cache_hits == 2
+        assert scraper.cache.get_landing_url("10.1/first").endswith(
+            "/landing/first")
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from sources.data_processing.adaptive_concurrency import \
+    AdaptiveConcurrencyController
+from sources.data_processing.repositories import DataNotFoundError, \
+    RateLimitedError, RepositoryHTTPError
+
+
+class TestAdaptiveConcurrencyController:
+    @pytest.fixture
+    def changes(self):
+        return []
+
+    @pytest.fixture
+    def controller(self, changes):
+        return AdaptiveConcurrencyController("repo", initial_limit=10,
+                                             min_limit=2, max_limit=12,
+                                             on_limit_change=changes.append)
+
+    def test_additive_increase_until_ceiling(self, controller, changes):
+        # The limit grows by one per window of limit successful calls
+        for _ in range(11):
+            controller.record(0.1)
+        assert controller.limit == 11
+        for _ in range(100):
+            controller.record(0.1, DataNotFoundError())
+        assert controller.limit == 12
+        assert changes == [11, 12]
+
+    def test_multiplicative_decrease_on_429(self, controller):
+        controller.record(0.1, RateLimitedError(429))
+        assert controller.limit == 5
+        # A burst of failures from the same overload only counts once
+        controller.record(0.1, asyncio.TimeoutError())
+        assert controller.limit == 5
+
+    def test_floor(self, controller):
+        for _ in range(20):
+            for _ in range(controller.limit):
+                controller.record(0.1, RepositoryHTTPError(503))
+        assert controller.limit == 2
+
+    def test_latency_inflation_decreases(self, controller):
+        for _ in range(10):
+            controller.record(0.1)
+        limit = controller.limit
+        for _ in range(10):
+            controller.record(1.0)
+        assert controller.limit < limit
+
+    def test_unrelated_errors_are_neutral(self, controller):
+        for _ in range(20):
+            controller.record(0.1, RepositoryHTTPError(404))
+        assert controller.limit == 10
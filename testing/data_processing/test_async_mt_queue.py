@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+from queue import Empty, Full
+
+import pytest
+
+from sources.data_processing.async_mt_queue import AsyncMTQueue
+
+
+class TestAsyncMTQueue:
+    @pytest.fixture
+    def queue(self):
+        return AsyncMTQueue()
+
+    def test_fifo_order(self, queue):
+        queue.put_many(range(5))
+        assert queue.get_many(3) == [0, 1, 2]
+        assert queue.get_all_available() == [3, 4]
+        assert queue.get_nowait() is None
+
+    def test_async_get_woken_by_other_thread(self, queue, event_loop):
+        def produce():
+            time.sleep(0.05)
+            queue.put("item")
+
+        thread = threading.Thread(target=produce)
+        thread.start()
+        result = event_loop.run_until_complete(
+            asyncio.wait_for(queue.async_get(), timeout=1))
+        thread.join()
+        assert result == "item"
+
+    def test_async_get_many(self, queue, event_loop):
+        queue.put_many(range(10))
+        result = event_loop.run_until_complete(queue.async_get_many(4))
+        assert result == [0, 1, 2, 3]
+        assert queue.qsize() == 6
+
+    def test_blocking_get_times_out(self, queue):
+        with pytest.raises(Empty):
+            queue.get_blocking(timeout=0.01)
+
+    def test_bounded_put(self, event_loop):
+        queue = AsyncMTQueue(max_size=2)
+        queue.put_many([1, 2])
+        with pytest.raises(Full):
+            queue.put_nowait(3)
+
+        async def run():
+            putter = asyncio.ensure_future(queue.async_put(3))
+            await asyncio.sleep(0.01)
+            assert not putter.done()
+            assert await queue.async_get() == 1
+            await asyncio.wait_for(putter, timeout=1)
+
+        event_loop.run_until_complete(run())
+        assert queue.get_all_available() == [2, 3]
+
+    def test_cancelled_getter_passes_on_wakeup(self, queue, event_loop):
+        async def run():
+            first = asyncio.ensure_future(queue.async_get())
+            second = asyncio.ensure_future(queue.async_get())
+            await asyncio.sleep(0)
+            queue.put("item")
+            first.cancel()
+            return await asyncio.wait_for(second, timeout=1)
+
+        assert event_loop.run_until_complete(run()) == "item"
@@ -0,0 +1,111 @@
+import threading
+import time
+from queue import Full
+
+import pytest
+
+from sources.data_processing.async_mt_queue import AsyncMTQueue
+from sources.data_processing.paper_scraper_api import PaperScraper
+from sources.data_processing.queries import DoiQuery, FailedQueryResponse, \
+    JournalDaterangeResponse
+from sources.data_processing import query_delegator
+from sources.data_processing.query_delegator import QueryDelegator
+from sources.data_processing.repository_registry import RepositoryRegistry
+from sources.databases.abstract_cache_db import AbstractCache
+from sources.databases.http_response_cache_db import HTTPResponseCache
+from sources.databases.repository_rate_limit_db import RepositoryRateLimits
+from sources.databases.repository_routing_db import \
+    RepositoryRoutingStatistics
+from testing.data_processing.test_request_coalescing import CountingCore, \
+    CountingRepository
+
+
+class TestPaperScraperBackpressure:
+    def test_delegate_drains_responses_while_blocked(self):
+        ps = PaperScraper()
+        ps._delegation_queue = AsyncMTQueue(1)
+        ps._response_queue = AsyncMTQueue(1)
+        ps._delegation_queue.put(DoiQuery(0, "10.1/a"))
+        ps._all_query_ids.add(7)
+        ps._response_queue.put(FailedQueryResponse(7))
+
+        def delegator():
+            # Only takes queries once it could publish its pending response
+            while ps._response_queue.qsize() > 0:
+                time.sleep(0.01)
+            ps._delegation_queue.get_blocking()
+
+        thread = threading.Thread(target=delegator)
+        thread.start()
+        ps.delegate_query(DoiQuery(1, "10.1/b"))
+        thread.join()
+
+        assert ps.poll_response().query_id == 7
+        assert ps._delegation_queue.qsize() == 1
+
+    def test_buffer_is_bounded_without_polling(self):
+        ps = PaperScraper()
+        ps.max_buffered_articles = 2
+        ps.backpressure_poll_interval = 0.01
+        ps._delegation_queue = AsyncMTQueue(1)
+        ps._response_queue = AsyncMTQueue()
+        ps._delegation_queue.put(DoiQuery(0, "10.1/a"))
+        for i in range(5):
+            ps._all_query_ids.add(i)
+            ps._response_queue.put(FailedQueryResponse(i))
+
+        # The delegator never gets to take a query and the caller never polls
+        with pytest.raises(Full):
+            ps.delegate_query(DoiQuery(9, "10.1/b"))
+        assert len(ps._buffered_responses) == 2
+        assert 9 not in ps._all_query_ids
+        assert [r.query_id for r in ps.poll_all_available_responses()] == \
+               list(range(5))
+
+    def test_buffer_is_bounded_by_articles(self):
+        ps = PaperScraper()
+        ps.max_buffered_articles = 1500
+        ps.backpressure_poll_interval = 0.01
+        ps._delegation_queue = AsyncMTQueue(1)
+        ps._response_queue = AsyncMTQueue()
+        ps._delegation_queue.put(DoiQuery(0, "10.1/a"))
+        for i in range(5):
+            ps._all_query_ids.add(i)
+            ps._response_queue.put(JournalDaterangeResponse(i, [None] * 1000))
+
+        with pytest.raises(Full):
+            ps.delegate_query(DoiQuery(9, "10.1/b"))
+        # Two pages of 1000 articles, not max_buffered_articles pages
+        assert ps.buffered_qsize() == 2
+        ps.poll_response()
+        assert ps._buffered_articles == 1000
+
+    def test_sync_larger_than_queues(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(query_delegator, "default_registry",
+                            RepositoryRegistry([CountingRepository,
+                                                CountingCore]))
+        monkeypatch.setattr(QueryDelegator, "max_in_flight_queries", 4)
+        monkeypatch.setattr(QueryDelegator, "max_pending_queries", 4)
+        monkeypatch.setattr(RepositoryRoutingStatistics, "document_path",
+                            tmp_path / "routing.json")
+        monkeypatch.setattr(RepositoryRateLimits, "document_path",
+                            tmp_path / "limits.json")
+        monkeypatch.setattr(AbstractCache, "document_path",
+                            tmp_path / "abstracts.json")
+        monkeypatch.setattr(HTTPResponseCache, "cache_directory",
+                            tmp_path / "cache")
+
+        ps = PaperScraper()
+        ps.delegation_queue_size = 5
+        ps.response_queue_size = 5
+        largest_backlog = 0
+        with ps:
+            for i in range(60):
+                ps.delegate_query(DoiQuery(i, f"10.1/{i}"))
+                largest_backlog = max(largest_backlog, ps.delegation_qsize())
+            responses = []
+            while not ps.processed_all_queries:
+                responses.append(ps.poll_response(timeout=5))
+
+        assert sorted(r.query_id for r in responses) == list(range(60))
+        assert largest_backlog <= 5
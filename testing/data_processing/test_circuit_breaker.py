@@ -0,0 +1,82 @@
+import pytest
+
+from sources.data_processing.circuit_breaker import CircuitBreaker, \
+    CircuitState
+from sources.data_processing.queries import DoiQuery
+from sources.data_processing.query_delegator import AllCircuitsOpenError, \
+    QueryDelegator
+from sources.data_processing.async_mt_queue import AsyncMTQueue
+from sources.data_processing.repositories import CoreRepository, \
+    OpenAireRepository
+from sources.data_processing.repository_registry import RepositoryRegistry
+
+
+class TestCircuitBreaker:
+    @pytest.fixture
+    def breaker(self, clock):
+        return CircuitBreaker(window_size=10, min_calls=4,
+                              failure_rate_threshold=0.5,
+                              slow_call_duration=5, open_duration=30,
+                              clock=clock)
+
+    def test_opens_on_error_rate(self, breaker):
+        breaker.record_success(0.1)
+        breaker.record_success(0.1)
+        breaker.record_failure(0.1)
+        assert breaker.state == CircuitState.CLOSED
+        breaker.record_failure(0.1)
+        assert breaker.state == CircuitState.OPEN
+        assert not breaker.allow_request()
+        assert breaker.metrics()["rejected_calls"] == 1
+
+    def test_opens_on_slow_calls(self, breaker):
+        for _ in range(4):
+            breaker.record_success(6)
+        assert breaker.state == CircuitState.OPEN
+
+    def test_half_open_then_closed(self, breaker, clock):
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        clock.now = 31
+        assert breaker.state == CircuitState.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        breaker.record_success(0.1)
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_half_open_failure_reopens(self, breaker, clock):
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        clock.now = 31
+        assert breaker.allow_request()
+        breaker.record_failure(0.1)
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.retry_in() == 30
+        assert breaker.metrics()["times_opened"] == 2
+
+
+class TestDelegatorRouting:
+    def test_open_circuit_is_skipped(self, event_loop):
+        delegator = QueryDelegator(AsyncMTQueue(), AsyncMTQueue(),
+                                   registry=RepositoryRegistry(
+                                       [OpenAireRepository, CoreRepository]))
+        for _ in range(10):
+            delegator.record_repository_call("openaire", 0.1,
+                                             ConnectionError())
+        repo = event_loop.run_until_complete(
+            delegator.choose_repository(DoiQuery(1, "10.1/a")))
+        assert repo.get_identifier() == "CORE"
+        assert delegator.get_circuit_breaker_metrics()["openaire"][
+                   "state"] == CircuitState.OPEN
+
+    def test_all_circuits_open(self, event_loop):
+        delegator = QueryDelegator(AsyncMTQueue(), AsyncMTQueue(),
+                                   registry=RepositoryRegistry(
+                                       [OpenAireRepository, CoreRepository]))
+        for repo in ["openaire", "CORE"]:
+            for _ in range(10):
+                delegator.record_repository_call(repo, 0.1,
+                                                 ConnectionError())
+        with pytest.raises(AllCircuitsOpenError):
+            event_loop.run_until_complete(
+                delegator.choose_repository(DoiQuery(1, "10.1/a")))
@@ -1,67 +1,117 @@
 import asyncio
 import threading
 import time
+from datetime import date
 
 import pytest
 
-from sources.data_processing.async_mp_queue import AsyncMTQueue
+from sources.data_processing.async_mt_queue import AsyncMTQueue
 from sources.data_processing.queries import AbstractQuery, KeywordQuery, \
-    FailedQueryResponse, Response, DoiQuery
-from sources.data_processing.query_delegator import QueryCounter, \
-    QueryDelegator, TerminationFlag, run_delegator
-from sources.data_processing.repositories import strings_approx_equal
-
-
-class TestCounter:
-    @pytest.fixture
-    def mock_repo_interval_metadata(self):
-        return {"repoA": 1, "repoB": 1, "repoC": 2}
-
-    @pytest.fixture
-    def sample_queries(self):
-        return ["repoA"] * 3 + ["repoB"] * 5 + ["repoC"] * 1
-
+    FailedQueryResponse, Response, DoiQuery, ArticleMetadata, \
+    ISSNTimeIntervalQuery, JournalDaterangeResponse
+from sources.data_processing.query_delegator import QueryDelegator, \
+    TerminationFlag, run_delegator
+from sources.data_processing.rate_limiting import RepositoryRateLimiter
+from sources.data_processing.repositories import strings_approx_equal, \
+    CrossrefRepository, AbstractRepository, RepositoryHTTPError
+from sources.data_processing.repository_registry import RepositoryRegistry
+from sources.data_processing.retry_scheduling import RetryClassifier, \
+    RetryPolicy
+from sources.databases.abstract_cache_db import AbstractCache
+from sources.databases.http_response_cache_db import HTTPResponseCache
+from sources.databases.repository_rate_limit_db import RepositoryRateLimits
+from sources.databases.repository_routing_db import \
+    RepositoryRoutingStatistics
+
+
+class TestRateLimiter:
     @pytest.fixture
-    def mock_query_counter(self, mock_repo_interval_metadata):
-        qc = QueryCounter()
-        QueryCounter.repo_intervals = mock_repo_interval_metadata
-        return qc
-
-    def test_num_events_counted_correctly(
-            self, mock_query_counter, sample_queries
-    ):
-        for repo in sample_queries:
-            mock_query_counter.register_new_request(repo)
-        assert mock_query_counter.get_open_connections_for_repo("repoA") == 3
-        assert mock_query_counter.get_open_connections_for_repo("repoB") == 5
-        assert mock_query_counter.get_open_connections_for_repo("repoC") == 1
-        assert mock_query_counter.get_num_request_last_interval("repoA") == 3
-        assert mock_query_counter.get_num_request_last_interval("repoB") == 5
-        assert mock_query_counter.get_num_request_last_interval("repoC") == 1
-
-    def test_num_events_reduces(self, mock_query_counter, sample_queries):
-        for repo in sample_queries:
-            mock_query_counter.register_new_request(repo)
-        time.sleep(2)
-        assert mock_query_counter.get_num_request_last_interval("repoA") == 0
-
-    def test_interval_counter_is_correct(
-            self, mock_query_counter, sample_queries
-    ):
-        for repo in sample_queries:
-            mock_query_counter.register_new_request(repo)
-        time.sleep(0.9)
-        assert mock_query_counter.get_num_request_last_interval("repoA") == 3
-        time.sleep(0.2)
-        assert mock_query_counter.get_num_request_last_interval("repoA") == 0
-
-    def test_interval_count_does_not_affect_open_connections(
-            self, mock_query_counter, sample_queries
-    ):
-        for repo in sample_queries:
-            mock_query_counter.register_new_request(repo)
-        time.sleep(2)
-        assert mock_query_counter.get_open_connections_for_repo("repoA") == 3
+    def limiter(self):
+        return RepositoryRateLimiter(max_queries_per_second=10,
+                                     max_connections=2)
+
+    def test_connections_counted_correctly(self, limiter, event_loop):
+        async def run():
+            await limiter.acquire()
+            await limiter.acquire()
+            assert limiter.open_connections == 2
+            limiter.release()
+            assert limiter.open_connections == 1
+
+        event_loop.run_until_complete(run())
+
+    def test_waiter_woken_on_release(self, limiter, event_loop):
+        async def run():
+            await limiter.acquire()
+            await limiter.acquire()
+            waiter = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0.05)
+            assert not waiter.done()
+            limiter.release()
+            await asyncio.wait_for(waiter, timeout=0.5)
+            assert limiter.open_connections == 2
+
+        event_loop.run_until_complete(run())
+
+    def test_requests_per_second_respected(self, event_loop):
+        limiter = RepositoryRateLimiter(max_queries_per_second=20,
+                                        max_connections=100)
+
+        async def run():
+            start = time.monotonic()
+            for _ in range(40):
+                await limiter.acquire()
+                limiter.release()
+            return time.monotonic() - start
+
+        # 20 burst tokens, then 20 more refilled at 20 per second
+        elapsed = event_loop.run_until_complete(run())
+        assert 0.9 < elapsed < 1.5
+
+    def test_cancelled_waiter_does_not_leak_slot(self, limiter, event_loop):
+        async def run():
+            await limiter.acquire()
+            await limiter.acquire()
+            waiter = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            limiter.release()
+            await asyncio.sleep(0)
+            assert limiter.open_connections == 1
+
+        event_loop.run_until_complete(run())
+
+    def test_reported_limit_is_applied(self, limiter, tmp_path):
+        rate_limits = RepositoryRateLimits(tmp_path / "limits.json")
+        delegator = QueryDelegator(AsyncMTQueue(), AsyncMTQueue(),
+                                   rate_limits=rate_limits)
+        delegator._rate_limiters["crossref"] = limiter
+        repo = CrossrefRepository()
+        delegator.apply_reported_rate_limit(repo)
+        assert limiter.max_queries_per_second == 10
+        repo.reported_max_queries_per_second = 50
+        delegator.apply_reported_rate_limit(repo)
+        assert limiter.max_queries_per_second == 50
+        assert rate_limits.get_max_queries_per_second("crossref") == 50
+
+    def test_limiter_starts_from_stored_limit(self, tmp_path, monkeypatch,
+                                              event_loop):
+        # Nothing learned yet: no probe request, the default is used
+        monkeypatch.setattr(CrossrefRepository, "_calculated", None)
+        rate_limits = RepositoryRateLimits(tmp_path / "limits.json")
+        delegator = QueryDelegator(AsyncMTQueue(), AsyncMTQueue(),
+                                   rate_limits=rate_limits)
+        limiter = event_loop.run_until_complete(
+            delegator.get_rate_limiter("crossref"))
+        assert limiter.max_queries_per_second == \
+               QueryDelegator.default_max_queries_per_second
+
+        rate_limits.record("crossref", 50)
+        delegator = QueryDelegator(AsyncMTQueue(), AsyncMTQueue(),
+                                   rate_limits=rate_limits)
+        limiter = event_loop.run_until_complete(
+            delegator.get_rate_limiter("crossref"))
+        assert limiter.max_queries_per_second == 50
 
 
 class TestDelegator:
@@ -249,4 +299,119 @@ class TestBugs:
         for ip in weird_doi_query:
             delegator._query_delegation_queue.put(ip)
 
-        event_loop.run_until_complete(delegator.process_queries())
\ No newline at end of file
+        event_loop.run_until_complete(delegator.process_queries())
+
+class PagingRepository(AbstractRepository):
+    """Serves five articles in pages of two, the second page fails once with a 503."""
+    requested_cursors = []
+    query_costs = {ISSNTimeIntervalQuery: 1.0}
+
+    @staticmethod
+    def get_identifier():
+        return "crossref"
+
+    @property
+    def api_endpoint(self):
+        return "http://localhost"
+
+    @property
+    def max_queries_per_second(self):
+        return 100
+
+    async def execute_query(self, query, session=None):
+        PagingRepository.requested_cursors.append(query.cursor)
+        if PagingRepository.requested_cursors.count("2") == 1 \
+                and query.cursor == "2":
+            raise RepositoryHTTPError(503)
+        start = 0 if query.cursor == "*" else int(query.cursor)
+        articles = [ArticleMetadata(f"T{i}", ["A"], f"10.1/{i}", "2020", None,
+                                    "crossref")
+                    for i in range(start, min(5, start + 2))]
+        next_cursor = str(start + 2) if start + 2 < 5 else None
+        return JournalDaterangeResponse(query.query_id, articles, next_cursor)
+
+
+class TestDelegatorPaging:
+    def test_pages_are_streamed(self, event_loop, tmp_path):
+        PagingRepository.requested_cursors = []
+        delegator = QueryDelegator(
+            AsyncMTQueue(), AsyncMTQueue(),
+            RepositoryRoutingStatistics(tmp_path / "routing.json"),
+            registry=RepositoryRegistry([PagingRepository]))
+        delegator._retry_classifier = RetryClassifier(
+            transient_policy=RetryPolicy(base_delay=0.01, max_delay=0.01))
+        delegator._query_delegation_queue.put_many(
+            [ISSNTimeIntervalQuery(1, "1234-5678", date(2020, 1, 1),
+                                   date(2020, 6, 1)),
+             TerminationFlag()])
+
+        event_loop.run_until_complete(delegator.process_queries())
+
+        pages = delegator._response_queue.get_all_available()
+        assert [len(page.all_articles) for page in pages] == [2, 2, 1]
+        assert [page.final for page in pages] == [False, False, True]
+        # The failed page is retried from its own cursor
+        assert PagingRepository.requested_cursors == ["*", "2", "2", "4"]
+
+
+class ScrapeNeedingRepository(AbstractRepository):
+    """Answers DoiQueries right away; DOIs of the 10.2 prefix come without abstract."""
+    query_costs = {DoiQuery: 1.0}
+
+    @staticmethod
+    def get_identifier():
+        return "openaire"
+
+    @property
+    def api_endpoint(self):
+        return "http://localhost"
+
+    @property
+    def max_queries_per_second(self):
+        return 1000
+
+    async def execute_query(self, query, session=None):
+        abstract = None if query.doi_to_query.startswith("10.2/") else "Abstract"
+        return Response(query.query_id,
+                        ArticleMetadata("Title", ["A"], query.doi_to_query,
+                                        "2020", abstract, "openaire"))
+
+
+class TestScrapesOutsideInFlightBudget:
+    def test_waiting_scrapes_do_not_block_queries(self, event_loop, tmp_path):
+        delegator = QueryDelegator(
+            AsyncMTQueue(), AsyncMTQueue(),
+            RepositoryRoutingStatistics(tmp_path / "routing.json"),
+            HTTPResponseCache(tmp_path / "cache"),
+            RepositoryRateLimits(tmp_path / "limits.json"),
+            registry=RepositoryRegistry([ScrapeNeedingRepository]),
+            abstract_cache=AbstractCache(tmp_path / "abstracts.json"))
+        delegator.max_in_flight_queries = 2
+        publisher_slot = asyncio.Event()
+
+        async def slow_scrape(doi):
+            # Waiting for a slot of a busy publisher
+            await publisher_slot.wait()
+            return "Scraped"
+
+        delegator.scrape_abstract = slow_scrape
+
+        async def run():
+            processing = asyncio.create_task(delegator.process_queries())
+            delegator._query_delegation_queue.put_many(
+                [DoiQuery(i, f"10.2/{i}") for i in range(4)] + [DoiQuery(4, "10.1/a")])
+            # The query without scrape is answered while all scrapes wait
+            while True:
+                responses = delegator._response_queue.get_all_available()
+                if len(responses) > 0:
+                    break
+                await asyncio.sleep(0.01)
+            publisher_slot.set()
+            delegator._query_delegation_queue.put(TerminationFlag())
+            await processing
+            return responses + delegator._response_queue.get_all_available()
+
+        responses = event_loop.run_until_complete(asyncio.wait_for(run(), 5))
+        assert responses[0].query_id == 4
+        assert sorted(response.metadata.abstract for response in responses[1:]) == \
+               ["Scraped"] * 4
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from sources.data_processing.json_streaming import JsonArrayStreamParser
+from sources.data_processing.response_caching import CachedStreamReader
+from sources.data_processing.response_decoding import ResponseDecodingError
+
+
+def chunked(raw, size):
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+class TestJsonArrayStreamParser:
+    @pytest.fixture
+    def document(self):
+        items = [{"title": ['Brackets ]} and "quotes" {['],
+                  "abstract": "Ünïcode \\ backslash – dash",
+                  "author": [{"given": "A", "family": "B"}], "n": i}
+                 for i in range(25)]
+        return {"status": "ok",
+                "message": {"facets": {"items": [1, 2]},
+                            "next-cursor": 'DnF1ZXJ5VGhlbkZldGNo\\"',
+                            "items": items, "items-per-page": 25,
+                            "query": {"items": [{"x": 1}]}}}
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 64, 100000])
+    @pytest.mark.parametrize("indent", [None, 2])
+    def test_yields_items_and_keeps_the_rest(self, document, chunk_size, indent):
+        raw = json.dumps(document, indent=indent, ensure_ascii=False).encode("utf-8")
+        parser = JsonArrayStreamParser(("message", "items"))
+        items = list(parser.iter_items(chunked(raw, chunk_size)))
+        assert items == document["message"]["items"]
+        document["message"]["items"] = []
+        assert parser.document == document
+
+    def test_items_are_yielded_while_feeding(self, document):
+        raw = json.dumps(document).encode("utf-8")
+        parser = JsonArrayStreamParser(("message", "items"))
+        first_item_end = raw.index(b'"n": 0}') + len(b'"n": 0}')
+        assert parser.feed(raw[:first_item_end - 1]) == []
+        assert parser.feed(raw[first_item_end - 1:first_item_end]) == \
+               [document["message"]["items"][0]]
+
+    def test_empty_and_missing_array(self):
+        parser = JsonArrayStreamParser(("message", "items"))
+        assert list(parser.iter_items([b'{"message": {"items": [ ]}}'])) == []
+        assert parser.document == {"message": {"items": []}}
+        parser = JsonArrayStreamParser(("message", "items"))
+        assert list(parser.iter_items([b'{"message": {"total": 0}}'])) == []
+        assert parser.document == {"message": {"total": 0}}
+
+    def test_incomplete_or_malformed(self):
+        parser = JsonArrayStreamParser(("message", "items"))
+        with pytest.raises(ResponseDecodingError):
+            list(parser.iter_items([b'{"message": {"items": [{"a": 1}, {"b"']))
+        parser = JsonArrayStreamParser(("message", "items"))
+        with pytest.raises(ResponseDecodingError):
+            list(parser.iter_items([b'{"message": {"items": [{"a": 1 2}]}}']))
+
+    def test_async_iter_items(self, event_loop):
+        parser = JsonArrayStreamParser(("items",))
+        reader = CachedStreamReader(b'{"items": [{"a": 1}, {"a": 2}], "n": 2}')
+
+        async def run():
+            return [item async for item in
+                    parser.async_iter_items(reader.iter_chunked(5))]
+
+        assert event_loop.run_until_complete(run()) == [{"a": 1}, {"a": 2}]
+        assert parser.document == {"items": [], "n": 2}
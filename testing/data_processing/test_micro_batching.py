@@ -0,0 +1,138 @@
+import asyncio
+
+from sources.data_processing.async_mt_queue import AsyncMTQueue
+from sources.data_processing.micro_batching import MicroBatcher
+from sources.data_processing.queries import ArticleMetadata, DoiQuery, \
+    FailedQueryResponse, Response
+from sources.data_processing.query_delegator import QueryDelegator, \
+    TerminationFlag
+from sources.data_processing.repositories import AbstractRepository, \
+    match_metadata_to_doi_queries
+from sources.data_processing.repository_registry import RepositoryRegistry
+from sources.databases.repository_routing_db import \
+    RepositoryRoutingStatistics
+
+
+def metadata(doi, abstract="Abstract", repo_identifier="openaire"):
+    return ArticleMetadata(title="Title", authors=["A"], doi=doi,
+                           publication_date="2020", abstract=abstract,
+                           repo_identifier=repo_identifier)
+
+
+class BulkOpenAire(AbstractRepository):
+    """Knows every DOI except 10.1/missing and answers up to ten at once."""
+    max_doi_batch_size = 10
+    batches = []
+    query_costs = {DoiQuery: 1.0}
+
+    @staticmethod
+    def get_identifier():
+        return "openaire"
+
+    @property
+    def api_endpoint(self):
+        return "http://localhost"
+
+    @property
+    def max_queries_per_second(self):
+        return 100
+
+    async def execute_query(self, query, session=None):
+        raise AssertionError("DoiQueries must be batched")
+
+    async def execute_doi_batch(self, doi_queries, session=None):
+        BulkOpenAire.batches.append([query.query_id for query in doi_queries])
+        return match_metadata_to_doi_queries(
+            doi_queries, [metadata(query.doi_to_query.upper())
+                          for query in doi_queries
+                          if query.doi_to_query != "10.1/missing"])
+
+
+class SingleCore(AbstractRepository):
+    calls = 0
+    query_costs = {DoiQuery: 2.0}
+
+    @staticmethod
+    def get_identifier():
+        return "CORE"
+
+    @property
+    def api_endpoint(self):
+        return "http://localhost"
+
+    @property
+    def max_queries_per_second(self):
+        return 100
+
+    async def execute_query(self, query, session=None):
+        SingleCore.calls += 1
+        return Response(query.query_id,
+                        metadata(query.doi_to_query, repo_identifier="CORE"))
+
+
+class TestMicroBatcher:
+    def test_flush_by_size_and_delay(self, event_loop):
+        batches = []
+
+        async def process(items):
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(process, max_batch_size=3, max_delay=0.05)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+        assert event_loop.run_until_complete(run()) == [0, 2, 4, 6, 8]
+        assert batches == [[0, 1, 2], [3, 4]]
+        assert batcher.flushed_batches == 2
+
+    def test_errors_reach_all_submitters(self, event_loop):
+        async def process(items):
+            raise ValueError("bulk request failed")
+
+        batcher = MicroBatcher(process, max_batch_size=2, max_delay=0.01)
+
+        async def run():
+            return await asyncio.gather(batcher.submit(1), batcher.submit(2),
+                                        return_exceptions=True)
+
+        results = event_loop.run_until_complete(run())
+        assert all(isinstance(result, ValueError) for result in results)
+
+
+class TestMatchMetadata:
+    def test_split_by_doi(self):
+        doi_queries = [DoiQuery(1, "10.1/A"), DoiQuery(2, "10.1/b"),
+                       DoiQuery(3, "10.1/c")]
+        responses = match_metadata_to_doi_queries(
+            doi_queries, [metadata("10.1/a", abstract=None), metadata("10.1/a"),
+                          metadata("https://doi.org/10.1/B")])
+        assert sorted(responses) == [1, 2]
+        assert responses[1].metadata.abstract == "Abstract"
+        assert responses[2].query_id == 2
+
+
+class TestDelegatorBatching:
+    def test_doi_queries_share_requests(self, event_loop, tmp_path):
+        BulkOpenAire.batches = []
+        SingleCore.calls = 0
+        delegator = QueryDelegator(
+            AsyncMTQueue(), AsyncMTQueue(),
+            RepositoryRoutingStatistics(tmp_path / "routing.json"),
+            registry=RepositoryRegistry([BulkOpenAire, SingleCore]))
+        doi_queries = [DoiQuery(i, f"10.1/{i}") for i in range(19)] + \
+                      [DoiQuery(19, "10.1/missing")]
+        delegator._query_delegation_queue.put_many(
+            doi_queries + [TerminationFlag()])
+
+        event_loop.run_until_complete(delegator.process_queries())
+
+        responses = delegator._response_queue.get_all_available()
+        assert sorted(r.query_id for r in responses) == list(range(20))
+        assert not any(isinstance(r, FailedQueryResponse) for r in responses)
+        assert len(BulkOpenAire.batches) == 2
+        # The miss fell through to CORE
+        assert SingleCore.calls == 1
+        assert delegator.get_batching_metrics() == \
+               {"openaire": {"requests": 2, "queries": 20}}
@@ -2,6 +2,7 @@ from datetime import date
 
 import pytest
 
+from sources.data_processing.async_mt_queue import AsyncMTQueue
 from sources.data_processing.paper_scraper_api import PaperScraper
 from sources.data_processing.queries import ISSNTimeIntervalQuery, \
     KeywordQuery, FailedQueryResponse, JournalDaterangeResponse, Response
@@ -54,3 +55,21 @@ class TestPaperScraper:
         assert isinstance(results[0], JournalDaterangeResponse)
         assert isinstance(results[1], Response)
         assert isinstance(results[2], FailedQueryResponse)
+
+
+class TestPaperScraperPaging:
+    def test_partial_responses_keep_query_open(self):
+        ps = PaperScraper()
+        ps._delegation_queue = AsyncMTQueue()
+        ps._response_queue = AsyncMTQueue()
+        ps.delegate_query(ISSNTimeIntervalQuery(5, "1234-5678",
+                                                date(2020, 1, 1),
+                                                date(2020, 6, 1)))
+
+        ps._response_queue.put(JournalDaterangeResponse(5, [], "next"))
+        assert not ps.poll_response().final
+        assert not ps.processed_all_queries
+
+        ps._response_queue.put(JournalDaterangeResponse(5, []))
+        assert len(ps.poll_all_available_responses()) == 1
+        assert ps.processed_all_queries
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+
+from sources.data_processing.queries import DoiQuery, ISSNTimeIntervalQuery, \
+    JournalData
+from sources.data_processing.query_scheduling import FairPriorityScheduler, \
+    default_query_priority
+
+
+def doi_query(query_id, issn, sync_id=None):
+    query = DoiQuery(query_id, f"10.1/{query_id}")
+    query.add_journal_data(JournalData("J", "1", "1", "2020", issn))
+    query.set_sync_id(sync_id)
+    return query
+
+
+def interval_query(query_id, issn):
+    return ISSNTimeIntervalQuery(query_id, issn, date(2020, 1, 1),
+                                 date(2020, 6, 1))
+
+
+class TestFairPriorityScheduler:
+    @pytest.fixture
+    def scheduler(self):
+        return FairPriorityScheduler()
+
+    def test_follow_up_queries_first(self, scheduler):
+        scheduler.push(interval_query(1, "A"))
+        scheduler.push(interval_query(2, "B"))
+        scheduler.push(doi_query(3, "A"))
+        assert scheduler.pop().query_id == 3
+        assert len(scheduler) == 2
+
+    def test_retries_after_fresh_queries(self, scheduler):
+        retried = doi_query(1, "A")
+        retried.store_scheduling_information("openaire")
+        assert default_query_priority(retried) > \
+               default_query_priority(doi_query(2, "A"))
+        scheduler.push(retried)
+        scheduler.push(doi_query(2, "A"))
+        assert [scheduler.pop().query_id for _ in range(2)] == [2, 1]
+
+    def test_round_robin_across_journals(self, scheduler):
+        for i in range(4):
+            scheduler.push(doi_query(i, "huge"))
+        scheduler.push(doi_query(10, "small"))
+        order = [scheduler.pop().query_id for _ in range(5)]
+        assert order[:2] == [0, 10]
+        assert scheduler.pop() is None
+
+    def test_round_robin_across_syncs(self, scheduler):
+        for i in range(3):
+            scheduler.push(doi_query(i, "A", sync_id="first"))
+        scheduler.push(doi_query(10, "A", sync_id="second"))
+        assert [scheduler.pop().query_id for _ in range(2)] == [0, 10]
+
+    def test_pending_by_level(self, scheduler):
+        scheduler.push(doi_query(1, "A"))
+        scheduler.push(interval_query(2, "A"))
+        assert sorted(scheduler.pending_by_level().values()) == [1, 1]
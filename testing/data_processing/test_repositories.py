@@ -3,15 +3,25 @@ from datetime import date
 
 import aiohttp
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 
 from sources.data_processing import queries, repositories
+from sources.data_processing.json_streaming import JsonArrayStreamParser
 from sources.data_processing.queries import KeywordQuery, \
     ISSNTimeIntervalQuery
 from sources.data_processing.repositories import (
     OpenAireRepository,
     DataNotFoundError,
     CrossrefRepository,
+    CrossrefClient,
+    CoreRepository,
+    OpenAlexRepository,
+    RateLimitedError,
+    parse_rate_limit_headers,
 )
+from sources.data_processing.response_caching import CachingSession
+from sources.databases.http_response_cache_db import HTTPResponseCache
 
 
 class TestCrossref:
@@ -232,3 +242,328 @@ class TestOpenAire:
                     title_that_does_not_exist_query, oa_repo
                 )
             )
+
+
+crossref_work = {"title": ["Local Title"], "author": [{"given": "A. ", "family": "Aye"}],
+                 "DOI": "10.1/a", "ISSN": ["1234-5678"],
+                 "issued": {"date-parts": [[2020, 1, 2]]},
+                 "abstract": "<jats:p>Abstract</jats:p>"}
+
+
+class TestCrossrefClient:
+    rate_limit_headers = {"x-rate-limit-limit": "50",
+                          "x-rate-limit-interval": "1s"}
+
+    @pytest.fixture
+    def server(self, event_loop):
+        requests_seen = []
+
+        async def work(request):
+            requests_seen.append(request)
+            doi = request.match_info["prefix"] + "/" + request.match_info["suffix"]
+            if doi == "10.1/missing":
+                return web.json_response({}, status=404)
+            if doi == "10.1/limited":
+                return web.json_response({}, status=429,
+                                         headers={"Retry-After": "3"})
+            return web.json_response({"message": crossref_work},
+                                     headers=self.rate_limit_headers)
+
+        async def journal_works(request):
+            requests_seen.append(request)
+            if request.match_info["issn"] == "streamed":
+                # The rest of the page is only sent once the first work has been consumed
+                resp = web.StreamResponse(headers={"Content-Type": "application/json"})
+                await resp.prepare(request)
+                await resp.write(b'{"message": {"items": [{"DOI": "10.1/0"}, ')
+                await server.first_work_consumed.wait()
+                await resp.write(b'{"DOI": "10.1/1"}], "next-cursor": "2"}}')
+                await resp.write_eof()
+                return resp
+            # Five works, served in pages of "rows" works
+            rows = int(request.query["rows"])
+            start = 0 if request.query.get("cursor", "*") == "*" \
+                else int(request.query["cursor"])
+            items = [dict(crossref_work, DOI=f"10.1/{i}")
+                     for i in range(start, min(5, start + rows))]
+            return web.json_response(
+                {"message": {"items": items, "next-cursor": str(start + rows)}},
+                headers=self.rate_limit_headers)
+
+        async def works(request):
+            requests_seen.append(request)
+            dois = [entry.split(":", 1)[1]
+                    for entry in request.query["filter"].split(",")]
+            items = [dict(crossref_work, DOI=doi.upper()) for doi in dois
+                     if doi != "10.1/missing"]
+            return web.json_response({"message": {"items": items}},
+                                     headers=self.rate_limit_headers)
+
+        app = web.Application()
+        app.router.add_get("/works", works)
+        app.router.add_get("/works/{prefix}/{suffix}", work)
+        app.router.add_get("/journals/{issn}/works", journal_works)
+        server = TestServer(app)
+        event_loop.run_until_complete(server.start_server())
+        server.requests_seen = requests_seen
+        server.first_work_consumed = asyncio.Event()
+        yield server
+        event_loop.run_until_complete(server.close())
+
+    def run_client(self, event_loop, server, call, on_rate_limit=None):
+        async def run():
+            async with aiohttp.ClientSession() as session:
+                client = CrossrefClient(session, on_rate_limit=on_rate_limit)
+                client.base_url = str(server.make_url("")).rstrip("/")
+                return await call(client)
+
+        return event_loop.run_until_complete(run())
+
+    def test_parse_rate_limit_headers(self):
+        assert parse_rate_limit_headers(self.rate_limit_headers) == 50
+        assert parse_rate_limit_headers({"x-rate-limit-limit": "50",
+                                         "x-rate-limit-interval": "2s"}) == 25
+        assert parse_rate_limit_headers({}) is None
+        assert parse_rate_limit_headers({"x-rate-limit-limit": "x",
+                                         "x-rate-limit-interval": "1s"}) is None
+
+    def test_journal_works_params_and_rate_limit(self, event_loop, server):
+        limits = []
+        response = self.run_client(
+            event_loop, server,
+            lambda client: client.journal_works(
+                "1234-5678", select=["DOI", "title"],
+                filter={"from-pub-date": "2020-01-01",
+                        "until-pub-date": "2020-06-01"},
+                limit=1000),
+            limits.append)
+
+        assert response["message"]["items"][0]["DOI"] == "10.1/0"
+        assert limits == [50]
+        query = server.requests_seen[0].query
+        assert query["select"] == "DOI,title"
+        assert query["filter"] == \
+               "from-pub-date:2020-01-01,until-pub-date:2020-06-01"
+        assert query["rows"] == "1000"
+
+    def test_journal_works_stream_through_caching_session(self, event_loop,
+                                                          server, tmp_path):
+        async def run():
+            async with aiohttp.ClientSession() as client_session:
+                session = CachingSession(client_session,
+                                         HTTPResponseCache(tmp_path))
+                client = CrossrefClient(session)
+                client.base_url = str(server.make_url("")).rstrip("/")
+                parser = JsonArrayStreamParser(("message", "items"))
+                dois = []
+                async for work in client.iter_journal_works(parser, "streamed",
+                                                            cursor="*"):
+                    dois.append(work["DOI"])
+                    server.first_work_consumed.set()
+                return dois, parser.document["message"]["next-cursor"]
+
+        # A buffered response would wait for the end of the page forever
+        assert event_loop.run_until_complete(asyncio.wait_for(run(), 5)) == \
+               (["10.1/0", "10.1/1"], "2")
+
+    def test_work_errors(self, event_loop, server):
+        with pytest.raises(DataNotFoundError):
+            self.run_client(event_loop, server,
+                            lambda client: client.work("10.1/missing"))
+        with pytest.raises(RateLimitedError) as e:
+            self.run_client(event_loop, server,
+                            lambda client: client.work("10.1/limited"))
+        assert e.value.retry_after == 3
+
+    def test_repository_doi_query(self, event_loop, server, monkeypatch):
+        monkeypatch.setattr(CrossrefClient, "base_url",
+                            str(server.make_url("")).rstrip("/"))
+        monkeypatch.setattr(CrossrefRepository, "_calculated", None)
+        repo = CrossrefRepository()
+
+        async def run():
+            async with aiohttp.ClientSession() as session:
+                return await repo.execute_query(
+                    queries.DoiQuery(1, "10.1/a"), session)
+
+        response = event_loop.run_until_complete(run())
+        assert response.metadata.title == "Local Title"
+        assert response.metadata.abstract == "Abstract"
+        assert repo.reported_max_queries_per_second == 50
+
+    def test_journal_query_pages(self, event_loop, server, monkeypatch):
+        monkeypatch.setattr(CrossrefClient, "base_url",
+                            str(server.make_url("")).rstrip("/"))
+        monkeypatch.setattr(CrossrefRepository, "journal_page_size", 2)
+        repo = CrossrefRepository()
+        query = ISSNTimeIntervalQuery(1, "1234-5678", date(2020, 1, 1),
+                                      date(2020, 6, 1))
+
+        async def run():
+            pages = []
+            async with aiohttp.ClientSession() as session:
+                while len(pages) == 0 or not pages[-1].final:
+                    pages.append(await repo.execute_query(query, session))
+                    if not pages[-1].final:
+                        query.advance_to_page(pages[-1].next_cursor)
+            return pages
+
+        pages = event_loop.run_until_complete(run())
+        assert [len(page.all_articles) for page in pages] == [2, 2, 1]
+        assert [page.final for page in pages] == [False, False, True]
+        assert [request.query["cursor"] for request in server.requests_seen] \
+               == ["*", "2", "4"]
+
+    def test_doi_batch(self, event_loop, server, monkeypatch):
+        monkeypatch.setattr(CrossrefClient, "base_url",
+                            str(server.make_url("")).rstrip("/"))
+        monkeypatch.setattr(CrossrefRepository, "_calculated", None)
+        repo = CrossrefRepository()
+
+        async def run():
+            async with aiohttp.ClientSession() as session:
+                return await repo.execute_doi_batch(
+                    [queries.DoiQuery(1, "10.1/a"),
+                     queries.DoiQuery(2, "10.1/missing"),
+                     queries.DoiQuery(3, "10.1/b")], session)
+
+        responses = event_loop.run_until_complete(run())
+        assert sorted(responses) == [1, 3]
+        assert responses[3].metadata.doi == "10.1/B"
+        assert server.requests_seen[0].query["filter"] == \
+               "doi:10.1/a,doi:10.1/missing,doi:10.1/b"
+
+
+class TestCoreBatch:
+    @pytest.fixture
+    def server(self, event_loop):
+        bodies = []
+
+        async def search(request):
+            body = await request.json()
+            bodies.append(body)
+            # Answer by position, queries mentioning "missing" find nothing
+            return web.json_response([
+                {"status": "Not found"} if "missing" in element["query"]
+                else {"status": "OK",
+                      "data": [{"title": element["query"], "authors": ["A"],
+                                "doi": "10.1/x", "year": 2020,
+                                "description": "Abstract"}]}
+                for element in body])
+
+        app = web.Application()
+        app.router.add_post("/search", search)
+        server = TestServer(app)
+        event_loop.run_until_complete(server.start_server())
+        server.bodies = bodies
+        yield server
+        event_loop.run_until_complete(server.close())
+
+    def test_batch_is_mapped_by_position(self, event_loop, server,
+                                         monkeypatch):
+        monkeypatch.setattr(CoreRepository, "api_endpoint",
+                            property(lambda self: str(server.make_url("/search"))))
+        repo = CoreRepository()
+        batch = [KeywordQuery(1, title="First"),
+                 queries.DoiQuery(2, "10.1/missing"),
+                 queries.DoiQuery(3, "10.1/b")]
+
+        async def run():
+            async with aiohttp.ClientSession() as session:
+                return await repo.execute_batch(batch, session), \
+                       await repo.execute_doi_batch(batch[1:], session)
+
+        results, doi_responses = event_loop.run_until_complete(run())
+        assert len(server.bodies[0]) == 3
+        assert results[0].metadata.title == 'title:"First" AND year:[* TO *]'
+        assert isinstance(results[1], DataNotFoundError)
+        assert results[2].query_id == 3
+        assert sorted(doi_responses) == [3]
+
+    def test_batch_limit(self, event_loop):
+        with pytest.raises(ValueError):
+            event_loop.run_until_complete(CoreRepository().execute_batch(
+                [queries.DoiQuery(i, "10.1/a") for i in range(101)]))
+
+
+class TestOpenAlex:
+    @pytest.fixture
+    def server(self, event_loop):
+        filters = []
+
+        def work(doi, title, abstract_inverted_index=None):
+            return {"doi": "https://doi.org/" + doi, "title": title,
+                    "publication_date": "2020-01-01",
+                    "authorships": [{"author": {"display_name": "A. Aye"}}],
+                    "abstract_inverted_index": abstract_inverted_index,
+                    "biblio": {"volume": "3", "issue": "1"},
+                    "primary_location": {"source": {
+                        "display_name": "Journal", "issn_l": "1234-5678",
+                        "host_organization_name": "Publisher"}}}
+
+        works = [work("10.1/a", "Bats in Cities",
+                      {"Bats": [0], "like": [1, 3], "cities": [2], "too": [4]}),
+                 work("10.1/b", "Birds of Prey", {"Birds": [0]})]
+
+        async def search(request):
+            filter_value = request.query["filter"]
+            filters.append(filter_value)
+            if filter_value.startswith("doi:"):
+                dois = filter_value[len("doi:"):].lower().split("|")
+                results = [w for w in works if w["doi"][len("https://doi.org/"):] in dois]
+            else:
+                results = [w for w in works
+                           if w["title"].lower() in filter_value.lower()]
+            return web.json_response({"results": results})
+
+        app = web.Application()
+        app.router.add_get("/works", search)
+        server = TestServer(app)
+        event_loop.run_until_complete(server.start_server())
+        server.filters = filters
+        yield server
+        event_loop.run_until_complete(server.close())
+
+    @pytest.fixture
+    def openalex_repo(self, server, monkeypatch):
+        monkeypatch.setattr(OpenAlexRepository, "api_endpoint",
+                            property(lambda self: str(server.make_url("/works"))))
+        return OpenAlexRepository()
+
+    def test_reconstruct_abstract(self):
+        assert OpenAlexRepository.reconstruct_abstract(
+            {"b": [1], "a": [0, 2]}) == "a b a"
+        assert OpenAlexRepository.reconstruct_abstract(None) is None
+
+    def test_doi_batch(self, event_loop, server, openalex_repo):
+        batch = [queries.DoiQuery(1, "10.1/A"),
+                 queries.DoiQuery(2, "10.1/missing"),
+                 queries.DoiQuery(3, "10.1/b")]
+
+        responses = event_loop.run_until_complete(
+            openalex_repo.execute_doi_batch(batch))
+
+        assert server.filters == ["doi:10.1/A|10.1/missing|10.1/b"]
+        assert sorted(responses) == [1, 3]
+        metadata = responses[1].metadata
+        assert metadata.doi == "10.1/a"
+        assert metadata.abstract == "Bats like cities like too"
+        assert metadata.authors == ["A. Aye"]
+        assert metadata.issn == "1234-5678"
+        assert metadata.journal_volume == "3"
+        assert metadata.repo_identifier == "openalex"
+
+    def test_queries(self, event_loop, server, openalex_repo):
+        response = event_loop.run_until_complete(openalex_repo.execute_query(
+            KeywordQuery(1, title="Birds of Prey:")))
+        assert server.filters[-1] == "title.search:Birds of Prey "
+        assert response.metadata.doi == "10.1/b"
+
+        response = event_loop.run_until_complete(openalex_repo.execute_query(
+            KeywordQuery(2, doi="10.1/a")))
+        assert response.query_id == 2
+        assert response.metadata.title == "Bats in Cities"
+
+        with pytest.raises(DataNotFoundError):
+            event_loop.run_until_complete(openalex_repo.execute_query(
+                queries.DoiQuery(3, "10.1/missing")))
@@ -0,0 +1,55 @@
+import pytest
+
+from sources.data_processing.queries import DoiQuery, ISSNTimeIntervalQuery, \
+    KeywordQuery
+from sources.data_processing.repositories import AbstractRepository, \
+    CoreRepository, CrossrefRepository, OpenAireRepository, OpenAlexRepository
+from sources.data_processing.repository_registry import RepositoryRegistry, \
+    default_registry
+
+
+def repository(identifier, query_costs, max_connections=10):
+    return type(identifier, (AbstractRepository,), {
+        "get_identifier": staticmethod(lambda: identifier),
+        "api_endpoint": f"http://{identifier}.example.org/api",
+        "max_queries_per_second": 10,
+        "query_costs": query_costs,
+        "max_connections": max_connections,
+        "execute_query": lambda self, query, session=None: None})
+
+
+class TestRepositoryRegistry:
+    @pytest.fixture
+    def registry(self):
+        return RepositoryRegistry([
+            repository("first", {DoiQuery: 2.0, KeywordQuery: 1.0}),
+            repository("second", {DoiQuery: 1.0}, max_connections=3),
+            repository("third", {DoiQuery: 2.0, ISSNTimeIntervalQuery: 1.0})])
+
+    def test_routing_by_cost(self, registry):
+        assert registry.repositories_for(DoiQuery) == ["second", "first", "third"]
+        assert registry.repositories_for(KeywordQuery) == ["first"]
+        assert registry.repositories_for(ISSNTimeIntervalQuery) == ["third"]
+        assert registry.query_cost("second", KeywordQuery) is None
+
+    def test_register_and_unregister(self, registry):
+        registry.register(repository("first", {KeywordQuery: 5.0}))
+        registry.unregister("second")
+        registry.unregister("unknown")
+
+        assert list(registry) == ["first", "third"]
+        assert registry.repositories_for(DoiQuery) == ["third"]
+        assert "second" not in registry
+
+    def test_declared_limits(self, registry):
+        assert registry.max_connections("second") == 3
+        assert registry.connection_bounds("first") == (2, 40)
+        assert registry.cache_ttl_by_host()["second.example.org"] == 24 * 3600
+
+    def test_default_registry(self):
+        for repo_class in (OpenAireRepository, CrossrefRepository,
+                           CoreRepository, OpenAlexRepository):
+            assert default_registry[repo_class.get_identifier()] is repo_class
+        assert default_registry.repositories_for(DoiQuery)[0] == "openalex"
+        assert default_registry.repositories_for(ISSNTimeIntervalQuery) == \
+               ["crossref"]
@@ -0,0 +1,129 @@
+import asyncio
+
+from sources.data_processing.async_mt_queue import AsyncMTQueue
+from sources.data_processing.queries import ArticleMetadata, DoiQuery, \
+    FailedQueryResponse, JournalData, KeywordQuery, Response
+from sources.data_processing.query_delegator import QueryDelegator, \
+    TerminationFlag
+from sources.data_processing.repositories import AbstractRepository
+from sources.data_processing.repository_registry import RepositoryRegistry
+from sources.data_processing.request_coalescing import QueryCoalescer, \
+    SingleFlight, coalescing_key, normalise_doi
+from sources.databases.repository_routing_db import \
+    RepositoryRoutingStatistics
+
+
+class CountingRepository(AbstractRepository):
+    calls = 0
+    query_costs = {DoiQuery: 1.0}
+
+    @staticmethod
+    def get_identifier():
+        return "openaire"
+
+    @property
+    def api_endpoint(self):
+        return "http://localhost"
+
+    @property
+    def max_queries_per_second(self):
+        return 100
+
+    async def execute_query(self, query, session=None):
+        CountingRepository.calls += 1
+        await asyncio.sleep(0.05)
+        return Response(query.query_id,
+                        ArticleMetadata(title="Title", authors=["A"],
+                                        doi=query.doi_to_query,
+                                        publication_date="2020",
+                                        abstract="Abstract",
+                                        repo_identifier="openaire"))
+
+
+class CountingCore(CountingRepository):
+    query_costs = {DoiQuery: 2.0}
+
+    @staticmethod
+    def get_identifier():
+        return "CORE"
+
+
+class TestCoalescingKeys:
+    def test_normalise_doi(self):
+        assert normalise_doi(" https://doi.org/10.1111/ABC ") == "10.1111/abc"
+        assert normalise_doi("doi:10.1111/abc") == "10.1111/abc"
+
+    def test_keys(self):
+        assert coalescing_key(DoiQuery(1, "10.1/A")) == \
+               coalescing_key(KeywordQuery(2, doi="https://doi.org/10.1/a"))
+        assert coalescing_key(KeywordQuery(3, title="A Title!",
+                                           authors=["B. Bee", "A. Aye"])) == \
+               coalescing_key(KeywordQuery(4, title="a title",
+                                           authors=["A. Aye", "B. Bee"]))
+        assert coalescing_key(KeywordQuery(5)) is None
+
+
+class TestQueryCoalescer:
+    def test_followers_receive_copies(self):
+        coalescer = QueryCoalescer()
+        leader = DoiQuery(1, "10.1/a")
+        follower = DoiQuery(2, "10.1/A")
+        follower.add_journal_data(JournalData("Journal", "1", "2", "2020",
+                                              "1234-5678"))
+        assert coalescer.admit(leader)
+        assert not coalescer.admit(follower)
+        # A leader coming back after a retry is still executed
+        assert coalescer.admit(leader)
+
+        metadata = ArticleMetadata("T", ["A"], "10.1/a", "2020", "Abs", "r")
+        responses = coalescer.complete(leader, Response(1, metadata))
+        assert [r.query_id for r in responses] == [2]
+        assert responses[0].metadata.issn == "1234-5678"
+        assert metadata.issn is None
+        assert coalescer.coalesced_queries == 1
+        assert coalescer.in_flight() == 0
+
+    def test_failure_is_fanned_out(self):
+        coalescer = QueryCoalescer()
+        coalescer.admit(DoiQuery(1, "10.1/a"))
+        coalescer.admit(DoiQuery(2, "10.1/a"))
+        responses = coalescer.complete(DoiQuery(1, "10.1/a"),
+                                       FailedQueryResponse(1))
+        assert isinstance(responses[0], FailedQueryResponse)
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_result(self, event_loop):
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(
+                *(flight.do("key", work) for _ in range(3)))
+
+        assert event_loop.run_until_complete(run()) == ["result"] * 3
+        assert len(calls) == 1
+        assert flight.coalesced_calls == 2
+
+
+class TestDelegatorCoalescing:
+    def test_duplicate_dois_hit_repository_once(self, event_loop, tmp_path):
+        CountingRepository.calls = 0
+        delegator = QueryDelegator(
+            AsyncMTQueue(), AsyncMTQueue(),
+            RepositoryRoutingStatistics(tmp_path / "routing.json"),
+            registry=RepositoryRegistry([CountingRepository, CountingCore]))
+        delegator._query_delegation_queue.put_many(
+            [DoiQuery(i, "10.1/a") for i in range(5)] + [TerminationFlag()])
+
+        event_loop.run_until_complete(delegator.process_queries())
+
+        responses = delegator._response_queue.get_all_available()
+        assert sorted(r.query_id for r in responses) == list(range(5))
+        assert CountingRepository.calls == 1
+        assert delegator.get_coalescing_metrics()["coalesced_queries"] == 4
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from sources.data_processing.async_mt_queue import AsyncMTQueue
+from sources.data_processing.queries import ArticleMetadata, DoiQuery, Response
+from sources.data_processing.query_delegator import QueryDelegator, \
+    TerminationFlag
+from sources.data_processing.repositories import AbstractRepository
+from sources.data_processing.repository_registry import RepositoryRegistry
+from sources.data_processing.request_hedging import HedgingPolicy, \
+    LatencyWindow, race_with_hedge
+from sources.databases.repository_routing_db import \
+    RepositoryRoutingStatistics
+
+
+class DelayedRepository(AbstractRepository):
+    identifier = None
+    delay = 0.0
+    cancelled = 0
+
+    @classmethod
+    def get_identifier(cls):
+        return cls.identifier
+
+    @property
+    def api_endpoint(self):
+        return "http://localhost"
+
+    @property
+    def max_queries_per_second(self):
+        return 100
+
+    async def execute_query(self, query, session=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            type(self).cancelled += 1
+            raise
+        return Response(query.query_id,
+                        ArticleMetadata(title="Title", authors=["A"],
+                                        doi=query.doi_to_query,
+                                        publication_date="2020",
+                                        abstract="Abstract",
+                                        repo_identifier=self.identifier))
+
+
+class SlowOpenAire(DelayedRepository):
+    identifier = "openaire"
+    delay = 2.0
+    query_costs = {DoiQuery: 1.0}
+
+
+class FastCore(DelayedRepository):
+    identifier = "CORE"
+    delay = 0.01
+    query_costs = {DoiQuery: 2.0}
+
+
+class TestLatencyWindow:
+    def test_percentile(self):
+        window = LatencyWindow(window_size=100)
+        assert window.percentile(0.9) is None
+        for latency in range(1, 101):
+            window.record(latency / 100)
+        assert window.percentile(0.95) == 0.95
+        assert window.percentile(1.0) == 1.0
+
+    def test_policy_needs_samples(self):
+        window = LatencyWindow()
+        policy = HedgingPolicy(enabled=True, min_samples=3, min_delay=0.1)
+        window.record(0.01)
+        assert policy.hedge_delay(window) is None
+        window.record(0.01)
+        window.record(0.01)
+        assert policy.hedge_delay(window) == 0.1
+        assert HedgingPolicy().hedge_delay(window) is None
+
+
+class TestRaceWithHedge:
+    def test_slow_primary_loses(self, event_loop):
+        cancelled = []
+
+        async def call(name, delay):
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            return name
+
+        outcomes = event_loop.run_until_complete(race_with_hedge(
+            call("primary", 1.0), lambda: call("hedge", 0.01), 0.05,
+            lambda outcome: True))
+        assert outcomes == ["hedge"]
+        assert cancelled == ["primary"]
+
+    def test_fast_primary_is_not_hedged(self, event_loop):
+        hedges = []
+
+        async def primary():
+            return "invalid"
+
+        outcomes = event_loop.run_until_complete(race_with_hedge(
+            primary(), lambda: hedges.append(1), 0.05,
+            lambda outcome: outcome != "invalid"))
+        assert outcomes == ["invalid"]
+        assert hedges == []
+
+
+class TestDelegatorHedging:
+    @pytest.fixture
+    def delegator(self, tmp_path):
+        delegator = QueryDelegator(
+            AsyncMTQueue(), AsyncMTQueue(),
+            RepositoryRoutingStatistics(tmp_path / "routing.json"),
+            registry=RepositoryRegistry([SlowOpenAire, FastCore]))
+        delegator.hedging_policy = HedgingPolicy(enabled=True, min_samples=5)
+        for _ in range(5):
+            delegator.get_latency_window("openaire").record(0.05)
+        return delegator
+
+    def test_hedge_answers_slow_doi_query(self, delegator, event_loop):
+        SlowOpenAire.cancelled = 0
+        delegator._query_delegation_queue.put_many(
+            [DoiQuery(1, "10.1/a"), TerminationFlag()])
+
+        event_loop.run_until_complete(
+            asyncio.wait_for(delegator.process_queries(), 1.5))
+
+        response = delegator._response_queue.get_nowait()
+        assert response.metadata.repo_identifier == "CORE"
+        assert SlowOpenAire.cancelled == 1
+        assert delegator.get_hedging_metrics() == {"hedged_requests": 1,
+                                                   "hedges_won": 1}
+        # Both the hedge and the cancelled primary gave their slots back
+        assert all(limiter.open_connections == 0
+                   for limiter in delegator._rate_limiters.values())
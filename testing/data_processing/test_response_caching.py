@@ -0,0 +1,144 @@
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from sources.data_processing.response_caching import CachingSession
+from sources.databases.http_response_cache_db import HTTPResponseCache
+
+
+class TestCachingSession:
+    @pytest.fixture
+    def server(self, event_loop):
+        requests_seen = []
+
+        async def versioned(request):
+            requests_seen.append(request)
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304, headers={"X-Rate-Limit-Limit": "50"})
+            return web.json_response({"version": 1}, headers={"ETag": '"v1"'})
+
+        async def search(request):
+            requests_seen.append(request)
+            return web.json_response(await request.json())
+
+        async def missing(request):
+            requests_seen.append(request)
+            return web.json_response({}, status=404)
+
+        async def pages(request):
+            # Deep paging: cursors are only valid in the generation that issued them
+            requests_seen.append(request)
+            cursor, rows = request.query["cursor"], int(request.query["rows"])
+            if cursor == "*":
+                page = 0
+            else:
+                generation, page = map(int, cursor.split("-"))
+                if generation != server.generation:
+                    return web.json_response({"message": "cursor expired"}, status=400)
+            items = list(range(3))[page * rows:(page + 1) * rows]
+            message = {"total-results": 3, "items": items}
+            if (page + 1) * rows < 3:
+                message["next-cursor"] = f"{server.generation}-{page + 1}"
+            return web.json_response({"message": message})
+
+        app = web.Application()
+        app.router.add_get("/pages", pages)
+        app.router.add_get("/versioned", versioned)
+        app.router.add_post("/search", search)
+        app.router.add_get("/missing", missing)
+        server = TestServer(app)
+        event_loop.run_until_complete(server.start_server())
+        server.requests_seen = requests_seen
+        server.generation = 0
+        yield server
+        event_loop.run_until_complete(server.close())
+
+    @pytest.fixture
+    def cache(self, tmp_path, clock):
+        return HTTPResponseCache(tmp_path, default_ttl=60, clock=clock)
+
+    def fetch(self, event_loop, cache, method, url, **kwargs):
+        async def run():
+            async with aiohttp.ClientSession() as client_session:
+                session = CachingSession(client_session, cache)
+                async with session.request(method, url, **kwargs) as resp:
+                    # Responses that are not stored are the live aiohttp responses
+                    return resp.status, resp.headers, await resp.text(), \
+                           getattr(resp, "from_cache", False)
+
+        return event_loop.run_until_complete(run())
+
+    def test_fresh_responses_are_served_locally(self, server, cache,
+                                                event_loop):
+        url = server.make_url("/versioned")
+        first = self.fetch(event_loop, cache, "GET", url, params={"mailto": "a"})
+        second = self.fetch(event_loop, cache, "GET", url, params={"mailto": "b"})
+        assert first[2] == second[2] == '{"version": 1}'
+        assert (first[3], second[3]) == (False, True)
+        assert len(server.requests_seen) == 1
+        assert cache.hit_ratio == 0.5
+
+    def test_stale_responses_are_revalidated(self, server, cache, clock,
+                                             event_loop):
+        url = server.make_url("/versioned")
+        self.fetch(event_loop, cache, "GET", url)
+        clock.now += 120
+        status, headers, text, from_cache = self.fetch(event_loop, cache,
+                                                       "GET", url)
+        assert (status, text, from_cache) == (200, '{"version": 1}', True)
+        assert headers["X-Rate-Limit-Limit"] == "50"
+        assert server.requests_seen[-1].headers["If-None-Match"] == '"v1"'
+        assert cache.metrics()["revalidated"] == 1
+        # The revalidation restarted the time to live
+        self.fetch(event_loop, cache, "GET", url)
+        assert len(server.requests_seen) == 2
+
+    def test_searches_are_keyed_by_body(self, server, cache, event_loop):
+        url = server.make_url("/search")
+        self.fetch(event_loop, cache, "POST", url, data='[{"q": 1}]')
+        self.fetch(event_loop, cache, "POST", url, data='[{"q": 2}]')
+        _, _, text, from_cache = self.fetch(event_loop, cache, "POST", url,
+                                            data='[{"q": 1}]')
+        assert text == '[{"q": 1}]' and from_cache
+        assert len(server.requests_seen) == 2
+
+    def test_errors_are_not_stored(self, server, cache, event_loop):
+        url = server.make_url("/missing")
+        assert self.fetch(event_loop, cache, "GET", url)[0] == 404
+        assert self.fetch(event_loop, cache, "GET", url)[0] == 404
+        assert len(server.requests_seen) == 2
+        assert len(cache) == 0
+
+    def test_paged_requests_are_not_stored(self, server, cache, event_loop):
+        def fetch_all_pages():
+            items, cursor = [], "*"
+            while cursor is not None:
+                status, _, text, _ = self.fetch(
+                    event_loop, cache, "GET", server.make_url("/pages"),
+                    params={"cursor": cursor, "rows": 1})
+                assert status == 200
+                message = json.loads(text)["message"]
+                items += message["items"]
+                cursor = message.get("next-cursor")
+            return items
+
+        assert fetch_all_pages() == [0, 1, 2]
+        # Had the pages been stored, a replay after the middle page was evicted would follow the expired cursor
+        # of the stored first page
+        assert len(cache) == 0
+        server.generation += 1
+        assert fetch_all_pages() == [0, 1, 2]
+        assert len(server.requests_seen) == 6
+
+    def test_single_page_intervals_are_stored(self, server, cache, event_loop):
+        url = server.make_url("/pages")
+        params = {"cursor": "*", "rows": 10}
+        first = self.fetch(event_loop, cache, "GET", url, params=params)
+        second = self.fetch(event_loop, cache, "GET", url, params=params)
+        assert json.loads(first[2])["message"]["items"] == [0, 1, 2]
+        assert first[2] == second[2]
+        assert (first[3], second[3]) == (False, True)
+        assert len(server.requests_seen) == 1
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from sources.data_processing import response_decoding
+from sources.data_processing.response_caching import CachedResponse
+from sources.data_processing.response_decoding import ResponseDecodingError, \
+    decode_json, read_json, repair_openaire_json
+
+
+class TestDecodeJson:
+    @pytest.fixture(params=["orjson", "json"])
+    def backend(self, request, monkeypatch):
+        if request.param == "json":
+            monkeypatch.setattr(response_decoding, "loads", json.loads)
+        elif response_decoding.orjson is None:
+            pytest.skip("orjson is not installed")
+        return request.param
+
+    def test_decodes_bytes(self, backend):
+        body = '{"title": "Über Fledermäuse", "n": [1, 2]}'.encode("utf-8")
+        assert decode_json(body, "application/json; charset=utf-8") == \
+               {"title": "Über Fledermäuse", "n": [1, 2]}
+        assert decode_json(b"[]", "application/vnd.api+json") == []
+        assert decode_json(b"[]") == []
+
+    def test_rejects_other_content_types(self, backend):
+        with pytest.raises(ResponseDecodingError) as e:
+            decode_json(b"<html>Service unavailable</html>",
+                        "text/html; charset=utf-8")
+        assert e.value.content_type == "text/html; charset=utf-8"
+
+    def test_malformed_json_is_an_error(self, backend):
+        with pytest.raises(ResponseDecodingError):
+            decode_json(b'{"abstract": "\\alpha"}', "application/json")
+        # Not even the repair turns garbage into a document
+        with pytest.raises(ResponseDecodingError):
+            decode_json(b"abstract: text", "application/json",
+                        repair_openaire_json)
+
+    def test_openaire_repair(self, backend):
+        body = b'{"abstract": "\\alpha \\\\ \\u00e9 \\"q\\" line\nbreak",\n"n": 1}'
+        assert decode_json(body, "application/json", repair_openaire_json) == \
+               {"abstract": '\\alpha \\ é "q" line\nbreak', "n": 1}
+
+    def test_read_json(self, event_loop):
+        resp = CachedResponse(200, {"Content-Type": "application/json"},
+                              b'{"a": 1}')
+        assert event_loop.run_until_complete(read_json(resp)) == {"a": 1}
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from sources.data_processing.queries import DoiQuery
+from sources.data_processing.repositories import DataNotFoundError, \
+    RateLimitedError, RepositoryHTTPError, parse_retry_after
+from sources.data_processing.retry_scheduling import RetryClassifier, \
+    RetryDecision, RetryPolicy, RetryScheduler
+
+
+class TestRetryPolicy:
+    def test_delay_is_bounded(self):
+        policy = RetryPolicy(base_delay=1, max_delay=5)
+        for attempt in range(10):
+            assert 0 <= policy.compute_delay(attempt) <= 5
+
+    def test_retry_after_is_honoured(self):
+        policy = RetryPolicy(base_delay=1, max_delay=5)
+        assert policy.compute_delay(0, retry_after=10) >= 10
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("3") == 3.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("nonsense") is None
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+class TestRetryClassifier:
+    @pytest.fixture
+    def classifier(self):
+        return RetryClassifier(
+            rate_limit_policy=RetryPolicy(max_retries=2),
+            transient_policy=RetryPolicy(max_retries=1))
+
+    def test_data_not_found_falls_through(self, classifier):
+        decision, delay = classifier.classify(DataNotFoundError(),
+                                              DoiQuery(1, "10.1/a"))
+        assert decision == RetryDecision.FALLTHROUGH
+        assert delay == 0
+
+    def test_rate_limit_is_retried_until_cap(self, classifier):
+        query = DoiQuery(1, "10.1/a")
+        error = RateLimitedError(429, retry_after=1)
+        for _ in range(2):
+            decision, delay = classifier.classify(error, query)
+            assert decision == RetryDecision.RETRY_LATER
+            assert delay >= 1
+            query.register_retry("openaire")
+        assert classifier.classify(error, query)[0] == \
+               RetryDecision.FALLTHROUGH
+
+    def test_server_and_client_errors(self, classifier):
+        query = DoiQuery(1, "10.1/a")
+        assert classifier.classify(RepositoryHTTPError(503), query)[0] == \
+               RetryDecision.RETRY_LATER
+        assert classifier.classify(RepositoryHTTPError(400), query)[0] == \
+               RetryDecision.FALLTHROUGH
+
+    def test_register_retry_frees_repository(self):
+        query = DoiQuery(1, "10.1/a")
+        query.store_scheduling_information("openaire")
+        query.register_retry("openaire")
+        assert "openaire" not in query.get_scheduling_information()
+        assert query.retry_count == 1
+
+
+class TestRetryScheduler:
+    def test_queries_resubmitted_in_due_order(self, event_loop):
+        resubmitted = []
+        scheduler = RetryScheduler(resubmitted.append)
+        first, second = DoiQuery(1, "10.1/a"), DoiQuery(2, "10.1/b")
+
+        async def run():
+            scheduler.schedule(second, 0.1)
+            scheduler.schedule(first, 0.05)
+            assert len(scheduler) == 2
+            await asyncio.sleep(0.01)
+            assert resubmitted == []
+            await asyncio.wait_for(scheduler.wait_until_empty(), timeout=1)
+
+        event_loop.run_until_complete(run())
+        assert resubmitted == [first, second]
+
+    def test_cancel_all(self, event_loop):
+        resubmitted = []
+        scheduler = RetryScheduler(resubmitted.append)
+
+        async def run():
+            scheduler.schedule(DoiQuery(1, "10.1/a"), 0.05)
+            scheduler.cancel_all()
+            await asyncio.sleep(0.1)
+
+        event_loop.run_until_complete(run())
+        assert resubmitted == []
+        assert len(scheduler) == 0
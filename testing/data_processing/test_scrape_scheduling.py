@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+
+from sources.data_processing.scrape_scheduling import \
+    DomainPolitenessScheduler, doi_prefix, domain_of
+
+
+class TestDomains:
+    def test_doi_prefix_and_domain(self):
+        assert doi_prefix("https://doi.org/10.1016/J.X") == "10.1016"
+        assert domain_of("https://www.sciencedirect.com/science/x") == \
+               "sciencedirect.com"
+        assert domain_of("https://link.springer.com/x") == "link.springer.com"
+        assert domain_of("not a url") is None
+
+    def test_landing_domains_are_learned_per_prefix(self):
+        scheduler = DomainPolitenessScheduler()
+        assert scheduler.predict_domain("10.1016/a") is None
+        scheduler.record_landing("10.1016/a", "https://www.sciencedirect.com/a")
+        assert scheduler.predict_domain("10.1016/b") == "sciencedirect.com"
+        assert scheduler.get_metrics()["sciencedirect.com"]["prefixes"] == \
+               ["10.1016"]
+
+
+class TestDomainPolitenessScheduler:
+    def test_limits_per_domain(self):
+        scheduler = DomainPolitenessScheduler(domain_limits={"a.org": (5.0, 3)})
+        assert scheduler.get_limiter("a.org").max_connections == 3
+        assert scheduler.get_limiter("b.org").max_queries_per_second == \
+               DomainPolitenessScheduler.default_max_requests_per_second
+        assert scheduler.get_limiter("a.org") is scheduler.get_limiter("a.org")
+
+    def test_requests_are_spaced_per_domain(self, event_loop):
+        scheduler = DomainPolitenessScheduler(
+            domain_limits={"a.org": (20.0, 5), "b.org": (20.0, 5)})
+
+        async def request(url):
+            async with scheduler.request_slot(url):
+                return time.monotonic()
+
+        async def run():
+            return await asyncio.gather(
+                *(request(f"https://{domain}/{i}")
+                  for i in range(3) for domain in ["a.org", "b.org"]))
+
+        start = time.monotonic()
+        times = event_loop.run_until_complete(run())
+        # The domains are requested in parallel, each at most every 0.05 s
+        assert max(times) - start == pytest.approx(0.1, abs=0.05)
+        assert scheduler.requests_by_domain == {"a.org": 3, "b.org": 3}
+
+    def test_busy_domain_does_not_block_others(self, event_loop):
+        scheduler = DomainPolitenessScheduler(
+            max_concurrency=2, domain_limits={"slow.org": (100.0, 1)})
+        scheduler.record_landing("10.1/x", "https://slow.org/x")
+        scheduler.record_landing("10.2/x", "https://fast.org/x")
+        finished = []
+
+        async def scrape(doi):
+            async with scheduler.doi_slot(doi):
+                await asyncio.sleep(0.05)
+            finished.append(doi)
+
+        async def run():
+            await asyncio.gather(*(scrape(f"10.1/{i}") for i in range(3)),
+                                 scrape("10.2/a"))
+
+        event_loop.run_until_complete(run())
+        # 10.2/a takes the second global slot instead of waiting behind 10.1
+        assert finished.index("10.2/a") <= 1
@@ -0,0 +1,87 @@
+import random
+
+import jellyfish
+import pytest
+
+from sources.data_processing.queries import ArticleMetadata
+from sources.data_processing.repositories import \
+    get_metadata_best_fit_by_title, strings_approx_equal
+from sources.data_processing.title_matching import TitleMatcher
+
+
+def reference_best_fit(titles, real_title):
+    """The previous implementation of get_metadata_best_fit_by_title."""
+    distances = [jellyfish.damerau_levenshtein_distance(
+        title.strip().lower(), real_title.strip().lower()) for title in titles]
+    candidates = [(i, d) for i, d in enumerate(distances)
+                  if d < 2 + len(titles[i]) // 20]
+    return min(candidates, key=lambda pair: pair[1])[0] if candidates else None
+
+
+def reference_approx_equal(fst, snd):
+    dist = jellyfish.damerau_levenshtein_distance(fst.strip().lower(),
+                                                  snd.strip().lower())
+    return dist < 2 + (len(fst) + len(snd)) // 40
+
+
+def mutate(title, rng, edits):
+    chars = list(title)
+    for _ in range(edits):
+        position = rng.randrange(len(chars))
+        operation = rng.choice(["substitute", "insert", "delete", "swap"])
+        if operation == "substitute":
+            chars[position] = rng.choice("abcde XY")
+        elif operation == "insert":
+            chars.insert(position, rng.choice("abcde XY"))
+        elif operation == "delete" and len(chars) > 1:
+            del chars[position]
+        elif position + 1 < len(chars):
+            chars[position], chars[position + 1] = \
+                chars[position + 1], chars[position]
+    return "".join(chars)
+
+
+class TestTitleMatcher:
+    @pytest.fixture
+    def titles(self):
+        rng = random.Random(1)
+        words = ["bats", "Forest", "restoration", "of", "the", "habitat",
+                 "species", "in", "a"]
+        return [" ".join(rng.choices(words, k=rng.randint(2, 12)))
+                for _ in range(40)]
+
+    def test_agrees_with_full_distance(self, titles):
+        rng = random.Random(2)
+        for title in titles:
+            candidates = [mutate(title, rng, rng.randint(0, 6))
+                          for _ in range(6)] + rng.sample(titles, 4)
+            matcher = TitleMatcher(title)
+            assert matcher.best_fit(candidates) == \
+                   reference_best_fit(candidates, title)
+            for candidate in candidates:
+                assert matcher.approx_equal(candidate) == \
+                       reference_approx_equal(title, candidate)
+
+    def test_prefilters_skip_distances(self):
+        matcher = TitleMatcher("Restoration of bat habitats")
+        assert matcher.score(["restoration of bat habitats ",
+                              "A completely different, much longer title",
+                              "zzzzzzzzzzzzzzzzzzzzzzzzzz"], 3) == [0, None, None]
+        assert matcher.computed_distances == 1
+
+    def test_ties_go_to_first_candidate(self):
+        assert TitleMatcher("bat habitat").best_fit(
+            ["bat habitats", "bat habitatx", "Bat Habitat"]) == 2
+        assert TitleMatcher("bat habitat").best_fit(
+            ["bat habitats", "bat habitatx"]) == 0
+
+    def test_repository_helpers(self):
+        metadata = [ArticleMetadata(title=title, authors=[], doi=None,
+                                    publication_date=None, abstract=None,
+                                    repo_identifier="CORE")
+                    for title in ["Bats in forests",
+                                  "Restoration of bat habitats"]]
+        assert get_metadata_best_fit_by_title(
+            metadata, "restoration of bat habitat") is metadata[1]
+        assert get_metadata_best_fit_by_title(metadata, "Fish") is None
+        assert strings_approx_equal("Bats in Forests ", "bats in forest")
@@ -2,12 +2,16 @@ from datetime import date
 
 import pytest
 
+from sources.databases.abstract_cache_db import AbstractCache
 from sources.databases.article_data_db import ArticleRepositoryAPI
 from sources.databases.daterange_util import Daterange
 from sources.databases.db_definitions import DBArticleMetadata
+from sources.databases.http_response_cache_db import HTTPResponseCache
 from sources.databases.internal_databases import SQLiteDB
 from sources.databases.journal_name_issn_database import JournalNameIssnDatabase
 from sources.databases.prev_query_information_db import PrevQueryInformation
+from sources.databases.repository_rate_limit_db import RepositoryRateLimits
+from sources.databases.repository_routing_db import RepositoryRoutingStatistics
 from sources.frontend.user_queries import ResultFilter
 
 
@@ -30,6 +34,132 @@ class TestPrevQueryInformationDatabase:
             assert pqi.get_journal_dateranges("555666666-555") == {drA, drB}
 
 
+class TestHTTPResponseCache:
+    def test_key_normalisation(self):
+        key = HTTPResponseCache.make_key
+        assert key("get", "https://API.example.org/works/",
+                   {"rows": 5, "mailto": "me@example.org", "query": "bats"}) == \
+               key("GET", "https://api.example.org/works?query=bats",
+                   {"rows": "5"})
+        assert key("POST", "https://api.example.org/search",
+                   data='[{"a": 1, "b": 2}]') == \
+               key("POST", "https://api.example.org/search",
+                   data='[{"b": 2, "a": 1}]')
+        assert key("GET", "https://api.example.org/works", {"rows": 5}) != \
+               key("GET", "https://api.example.org/works", {"rows": 6})
+
+    def test_ttl_by_host(self, tmp_path, clock):
+        cache = HTTPResponseCache(tmp_path, ttl_by_host={"slow.org": 100},
+                                  default_ttl=10, clock=clock)
+        slow = cache.store("a", "slow.org", 200, {"ETag": '"1"'}, b"body")
+        other = cache.store("b", "other.org", 200, {}, b"body")
+        clock.now += 50
+        assert cache.is_fresh(slow) and not cache.is_fresh(other)
+        assert slow.etag == '"1"' and other.etag is None
+        cache.refresh(other)
+        assert cache.is_fresh(other)
+
+    def test_lru_eviction(self, tmp_path, clock):
+        cache = HTTPResponseCache(tmp_path, max_size_bytes=10, clock=clock)
+        cache.store("a", "host", 200, {}, b"aaaa")
+        cache.store("b", "host", 200, {}, b"bbbb")
+        cache.lookup("a")
+        cache.store("c", "host", 200, {}, b"cccc")
+        assert cache.lookup("b") is None
+        assert cache.read_body(cache.lookup("a")) == b"aaaa"
+        assert cache.size_bytes == 8
+        assert not (tmp_path / "b.body").exists()
+
+    def test_index_persists(self, tmp_path, clock):
+        with HTTPResponseCache(tmp_path, clock=clock) as cache:
+            cache.store("a", "host", 200, {"Last-Modified": "yesterday"}, b"a")
+        with HTTPResponseCache(tmp_path, clock=clock) as cache:
+            entry = cache.lookup("a")
+            assert entry.last_modified == "yesterday"
+            assert cache.read_body(entry) == b"a"
+
+
+class TestRepositoryRateLimits:
+    def test_limits_persist_until_too_old(self, tmp_path, clock):
+        with RepositoryRateLimits(tmp_path / "limits.json", clock) as limits:
+            assert limits.get_max_queries_per_second("crossref") is None
+            limits.record("crossref", 50)
+        with RepositoryRateLimits(tmp_path / "limits.json", clock) as limits:
+            assert limits.get_max_queries_per_second("crossref") == 50
+            clock.now += RepositoryRateLimits.max_age + 1
+            assert limits.get_max_queries_per_second("crossref") is None
+
+
+class TestAbstractCache:
+    def test_doi_normalisation(self, tmp_path):
+        cache = AbstractCache(tmp_path / "abstracts.json")
+        cache.record("https://doi.org/10.1111/REC.12476", "An abstract",
+                     "https://example.org/landing")
+        assert cache.get_entry("10.1111/rec.12476")["abstract"] == "An abstract"
+        assert cache.get_entry("doi:10.1111/Rec.12476") is not None
+        assert cache.get_landing_url("10.1111/rec.12476") == \
+               "https://example.org/landing"
+
+    def test_negative_entries_expire(self, tmp_path, clock):
+        with AbstractCache(tmp_path / "abstracts.json", clock) as cache:
+            cache.record("10.1/paywalled", "", "https://example.org/login")
+            cache.record("10.1/open", "An abstract")
+        with AbstractCache(tmp_path / "abstracts.json", clock) as cache:
+            assert cache.get_entry("10.1/paywalled")["abstract"] is None
+            assert cache.get_metrics() == {"abstracts": 1, "negative_entries": 1}
+            clock.now += AbstractCache.negative_ttl + 1
+            assert cache.get_entry("10.1/paywalled") is None
+            # The landing url outlives the negative entry, abstracts never expire
+            assert cache.get_landing_url("10.1/paywalled") == \
+                   "https://example.org/login"
+            assert cache.get_entry("10.1/open")["abstract"] == "An abstract"
+
+    def test_open_instances_merge(self, tmp_path, clock):
+        with AbstractCache(tmp_path / "abstracts.json", clock) as first, \
+                AbstractCache(tmp_path / "abstracts.json", clock) as second:
+            first.record("10.1/a", "Abstract a")
+            first.record("10.1/both", None)
+            clock.now += 1
+            second.record("10.1/b", "Abstract b")
+            second.record("10.1/both", "Abstract found later")
+        with AbstractCache(tmp_path / "abstracts.json", clock) as cache:
+            assert [cache.get_entry(doi)["abstract"] for doi in
+                    ["10.1/a", "10.1/b", "10.1/both"]] == \
+                   ["Abstract a", "Abstract b", "Abstract found later"]
+
+
+class TestRepositoryRoutingStatistics:
+    @pytest.fixture
+    def document_path(self, tmp_path):
+        return tmp_path / "routing.json"
+
+    def test_keys(self):
+        assert RepositoryRoutingStatistics.keys_for(
+            "0006-3207", "10.1111/rec.12476") == ["issn:0006-3207",
+                                                  "prefix:10.1111"]
+        assert RepositoryRoutingStatistics.keys_for(None, None) == []
+
+    def test_ranking_prefers_successful_repository(self, document_path):
+        keys = RepositoryRoutingStatistics.keys_for("0006-3207",
+                                                    "10.1111/rec.12476")
+        with RepositoryRoutingStatistics(document_path) as stats:
+            assert stats.rank_repositories(keys, ["openaire", "CORE"]) == \
+                   ["openaire", "CORE"]
+            for _ in range(5):
+                stats.record(keys, "openaire", False, 1.0)
+                stats.record(keys, "CORE", True, 1.5)
+            assert stats.rank_repositories(keys, ["openaire", "CORE"]) == \
+                   ["CORE", "openaire"]
+
+    def test_statistics_persist(self, document_path):
+        with RepositoryRoutingStatistics(document_path) as stats:
+            stats.record(["prefix:10.1111"], "CORE", True, 0.5)
+
+        with RepositoryRoutingStatistics(document_path) as stats:
+            assert stats.get_statistics("prefix:10.1111", "CORE") == \
+                   {"attempts": 1, "successes": 1, "total_latency": 0.5}
+
+
 class TestJournalNameISSNDatabase:
     @pytest.fixture
     def entries(self):